@@ -0,0 +1,187 @@
+import random
+import threading
+import time
+from collections import deque
+from datetime import date, datetime, timedelta
+from typing import Any, Dict, List, Optional
+
+FIRST_NAMES = ["Thomas", "Kate", "John", "Sayid", "Claire", "Hugo", "Jin", "Sun", "Desmond", "Juliet",
+               "Ana", "Ben", "Charlie", "Penny", "Rose", "Bernard", "Miles", "Daniel", "Richard", "Frank"]
+LAST_NAMES = ["Anderson", "Austen", "Locke", "Jarrah", "Littleton", "Reyes", "Kwon", "Hume", "Burke",
+              "Cortez", "Linus", "Pace", "Widmore", "Nadler", "Straume", "Faraday", "Alpert", "Lapidus"]
+FUNDS = [("1001", "General Fund"), ("1002", "Missions Fund"), ("1003", "Building Fund"), ("1004", "Youth")]
+METHODS = ["Check", "Cash", "Credit/Debit Online", "ACH"]
+ROLES = ["Greeter", "Usher", "Nursery", "Sound", "Coffee", "Parking"]
+
+# Profile field IDs used in person details
+EMAIL_FIELD = "929778337"
+PHONE_FIELD = "929778338"
+ADDRESS_FIELD = "929778339"
+
+
+class BreezeError(Exception):
+    pass
+
+
+class FakeBreezeApi:
+    """
+    In-process stand-in for BreezeApi returning realistic payloads.
+
+    Every call sleeps for `latency` seconds (plus up to `jitter` seconds at random)
+    to simulate the Breeze round trip. When `rate_limit` is set, calls beyond that
+    many per second raise BreezeError the way a throttled Breeze account does.
+    Payloads are generated from `seed`, so runs are repeatable.
+    """
+
+    def __init__(self, people: int = 1000, events: int = 40, contributions: int = 5000,
+                 latency: float = 0.05, jitter: float = 0.02, rate_limit: Optional[float] = None,
+                 seed: int = 1):
+        self.latency = latency
+        self.jitter = jitter
+        self.rate_limit = rate_limit
+        self.calls = 0
+        self.throttled = 0
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self._recent: deque = deque()
+        self.people = [self._person(i) for i in range(people)]
+        self.events = [self._event(i) for i in range(events)]
+        self.contributions = [self._contribution(i) for i in range(contributions)]
+
+    # Payload generation
+
+    def _person(self, i: int) -> Dict[str, Any]:
+        first, last = self._random.choice(FIRST_NAMES), self._random.choice(LAST_NAMES)
+        person_id = str(157857 + i)
+        return {
+            "id": person_id,
+            "first_name": first,
+            "force_first_name": first,
+            "last_name": last,
+            "nick_name": "",
+            "middle_name": "",
+            "path": "img/profiles/generic/blue.jpg",
+            "details": {
+                EMAIL_FIELD: [{"address": f"{first}.{last}{i}@example.org".lower(), "is_primary": "1",
+                               "allow_bulk": "1", "is_private": "0"}],
+                PHONE_FIELD: [{"phone_number": f"555-{i % 1000:03d}-{self._random.randint(0, 9999):04d}",
+                               "phone_type": "mobile", "do_not_text": "0", "is_private": "0"}],
+                ADDRESS_FIELD: [{"street_address": f"{self._random.randint(1, 9999)} Oceanic Way",
+                                 "city": "Springfield", "state": "IL", "zip": "62701", "is_primary": "1"}],
+                "birthdate": f"{self._random.randint(1940, 2015)}-0{self._random.randint(1, 9)}-1{self._random.randint(0, 9)}",
+                "family": [{"id": str(self._random.randint(1, 10 ** 6)), "person_id": person_id,
+                            "role_name": "Head of Household"}],
+            },
+        }
+
+    def _event(self, i: int) -> Dict[str, Any]:
+        start = datetime.combine(date.today(), datetime.min.time()) + timedelta(days=i % 30, hours=9)
+        return {
+            "id": str(93210000 + i),
+            "oid": "1512",
+            "event_id": str(400000 + i % 8),
+            "name": ["Sunday Service", "Youth Group", "Bible Study", "Choir"][i % 4],
+            "category_id": "0",
+            "settings_id": str(500 + i % 8),
+            "start_datetime": start.strftime("%Y-%m-%d %H:%M:%S"),
+            "end_datetime": (start + timedelta(hours=1)).strftime("%Y-%m-%d %H:%M:%S"),
+            "created_on": "2021-03-09 13:04:02",
+        }
+
+    def _contribution(self, i: int) -> Dict[str, Any]:
+        person = self._random.choice(self.people) if self.people else {"id": "0", "first_name": "", "last_name": ""}
+        fund_id, fund_name = self._random.choice(FUNDS)
+        amount = f"{self._random.randint(5, 500)}.00"
+        given = date(date.today().year, 1, 1) + timedelta(days=i % 365)
+        return {
+            "id": str(60000000 + i),
+            "oid": "1512",
+            "first_name": person["first_name"],
+            "last_name": person["last_name"],
+            "person_id": person["id"],
+            "date": given.isoformat(),
+            "paid_date": given.isoformat(),
+            "method": self._random.choice(METHODS),
+            "amount": amount,
+            "funds": [{"id": str(70000000 + i), "fund_id": fund_id, "name": fund_name, "amount": amount}],
+        }
+
+    # Simulated round trip
+
+    def _round_trip(self) -> None:
+        with self._lock:
+            self.calls += 1
+            if self.rate_limit:
+                now = time.monotonic()
+                while self._recent and now - self._recent[0] > 1.0:
+                    self._recent.popleft()
+                if len(self._recent) >= self.rate_limit:
+                    self.throttled += 1
+                    raise BreezeError("Rate limit exceeded")
+                self._recent.append(now)
+        time.sleep(self.latency + self._random.random() * self.jitter)
+
+    # BreezeApi methods
+
+    def get_people(self, limit=None, offset=None, details=False) -> List[Dict[str, Any]]:
+        self._round_trip()
+        start = offset or 0
+        people = self.people[start:start + limit] if limit else self.people[start:]
+        if details:
+            return people
+        return [{k: p[k] for k in ("id", "first_name", "last_name", "path")} for p in people]
+
+    def get_person_details(self, person_id) -> Dict[str, Any]:
+        self._round_trip()
+        for person in self.people:
+            if person["id"] == person_id:
+                return person
+        raise BreezeError("Person not found")
+
+    def get_profile_fields(self) -> List[Dict[str, Any]]:
+        self._round_trip()
+        return [{"id": "1", "name": "Main", "fields": [
+            {"field_id": EMAIL_FIELD, "name": "Email", "field_type": "email"},
+            {"field_id": PHONE_FIELD, "name": "Phone", "field_type": "phone"},
+            {"field_id": ADDRESS_FIELD, "name": "Address", "field_type": "address"},
+        ]}]
+
+    def get_events(self, start_date=None, end_date=None) -> List[Dict[str, Any]]:
+        self._round_trip()
+        return self.events
+
+    def event_check_in(self, person_id, event_instance_id) -> bool:
+        self._round_trip()
+        return True
+
+    def event_check_out(self, person_id, event_instance_id) -> bool:
+        self._round_trip()
+        return True
+
+    def list_contributions(self, start_date=None, end_date=None, person_id=None, include_family=False,
+                           amount_min=None, amount_max=None, method_ids=None, fund_ids=None,
+                           envelope_number=None, batches=None, forms=None) -> List[Dict[str, Any]]:
+        self._round_trip()
+        contributions = self.contributions
+        if start_date:
+            contributions = [c for c in contributions if c["date"] >= start_date]
+        if end_date:
+            contributions = [c for c in contributions if c["date"] <= end_date]
+        if person_id:
+            contributions = [c for c in contributions if c["person_id"] == person_id]
+        return contributions
+
+    def add_contribution(self, **kwargs) -> str:
+        self._round_trip()
+        return str(self._random.randint(10 ** 7, 10 ** 8))
+
+    def list_volunteers(self, instance_id) -> List[Dict[str, Any]]:
+        self._round_trip()
+        rng = random.Random(instance_id)
+        return [{"id": str(i), "person_id": p["id"], "role_ids": [str(rng.randint(1, len(ROLES)))]}
+                for i, p in enumerate(rng.sample(self.people, min(12, len(self.people))))]
+
+    def list_volunteer_roles(self, instance_id, show_quantity=False) -> List[Dict[str, Any]]:
+        self._round_trip()
+        return [{"id": str(i + 1), "name": name, "quantity": 2 if show_quantity else None}
+                for i, name in enumerate(ROLES)]
@@ -0,0 +1,225 @@
+"""
+Offline load benchmark for the Breeze ChMS API service.
+
+Drives the FastAPI app in-process with concurrent requests across the people,
+events, contributions and volunteers routes while a FakeBreezeApi stands in for
+Breeze. Reports p50/p95/p99 latency per route, throughput and memory, saves the
+results under bench/results/ and compares them with the previous run of the
+same scenario.
+
+Usage:
+    python -m bench.run --requests 2000 --concurrency 20 --latency 0.05
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import resource
+import subprocess
+import sys
+import time
+import tracemalloc
+from collections import defaultdict
+from datetime import date, datetime
+from typing import Any, Dict, List, Optional
+
+import httpx
+
+from .fake_breeze import FakeBreezeApi
+
+RESULTS_DIR = os.path.join(os.path.dirname(__file__), "results")
+# A change of more than this fraction in p95 latency or throughput is reported as a regression
+REGRESSION_THRESHOLD = 0.10
+
+
+def load_app(fake: FakeBreezeApi):
+    """Import the service with placeholder credentials and point it at the fake."""
+    os.environ.setdefault('breeze_url', 'https://bench.breezechms.com')
+    os.environ.setdefault('api_key', 'bench')
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    import main
+    main.tenant_pool.client(main.tenants.DEFAULT_TENANT).api = fake
+    return main.app
+
+
+def build_workload(fake: FakeBreezeApi) -> List[Dict[str, Any]]:
+    """Weighted mix of read requests, roughly matching production traffic."""
+    year = date.today().year
+    person_ids = [p["id"] for p in fake.people[:50]]
+    instance_ids = [e["id"] for e in fake.events[:10]]
+    workload = [
+        {"route": "/people/", "url": "/people/", "weight": 4},
+        {"route": "/people/?details=true", "url": "/people/?details=true", "weight": 1},
+        {"route": "/events/", "url": "/events/", "weight": 3},
+        {"route": "/contributions/", "url": f"/contributions/?start_date={year}-01-01&end_date={year}-12-31", "weight": 1},
+    ]
+    workload += [{"route": "/people/{person_id}", "url": f"/people/{pid}", "weight": 4 / len(person_ids)} for pid in person_ids]
+    workload += [{"route": "/volunteers/{instance_id}", "url": f"/volunteers/{iid}", "weight": 2 / len(instance_ids)} for iid in instance_ids]
+    workload += [{"route": "/volunteers/{instance_id}/roles", "url": f"/volunteers/{iid}/roles", "weight": 1 / len(instance_ids)} for iid in instance_ids]
+    return workload
+
+
+def percentile(sorted_values: List[float], fraction: float) -> float:
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, int(round(fraction * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+def summarize(latencies: List[float]) -> Dict[str, float]:
+    values = sorted(latencies)
+    return {
+        "count": len(values),
+        "p50_ms": percentile(values, 0.50) * 1000,
+        "p95_ms": percentile(values, 0.95) * 1000,
+        "p99_ms": percentile(values, 0.99) * 1000,
+        "max_ms": (values[-1] if values else 0.0) * 1000,
+    }
+
+
+async def drive(app, workload: List[Dict[str, Any]], total: int, concurrency: int, seed: int) -> Dict[str, Any]:
+    rng = random.Random(seed)
+    plan = rng.choices(workload, weights=[w["weight"] for w in workload], k=total)
+    latencies: Dict[str, List[float]] = defaultdict(list)
+    statuses: Dict[str, int] = defaultdict(int)
+    response_bytes = 0
+    queue: asyncio.Queue = asyncio.Queue()
+    for item in plan:
+        queue.put_nowait(item)
+
+    async def worker(client: httpx.AsyncClient):
+        nonlocal response_bytes
+        while True:
+            try:
+                item = queue.get_nowait()
+            except asyncio.QueueEmpty:
+                return
+            start = time.perf_counter()
+            response = await client.get(item["url"])
+            latencies[item["route"]].append(time.perf_counter() - start)
+            statuses[str(response.status_code)] += 1
+            response_bytes += len(response.content)
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        started = time.perf_counter()
+        await asyncio.gather(*(worker(client) for _ in range(concurrency)))
+        elapsed = time.perf_counter() - started
+
+    all_latencies = [value for values in latencies.values() for value in values]
+    return {
+        "elapsed_s": elapsed,
+        "throughput_rps": total / elapsed if elapsed else 0.0,
+        "overall": summarize(all_latencies),
+        "routes": {route: summarize(values) for route, values in sorted(latencies.items())},
+        "statuses": dict(statuses),
+        "response_bytes": response_bytes,
+    }
+
+
+def git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              check=True, cwd=os.path.dirname(__file__)).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def scenario_key(config: Dict[str, Any]) -> str:
+    return json.dumps({k: v for k, v in config.items() if k != "label"}, sort_keys=True)
+
+
+def previous_result(config: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    """Most recent stored result run with the same scenario settings."""
+    if not os.path.isdir(RESULTS_DIR):
+        return None
+    key = scenario_key(config)
+    for name in sorted(os.listdir(RESULTS_DIR), reverse=True):
+        with open(os.path.join(RESULTS_DIR, name)) as f:
+            result = json.load(f)
+        if scenario_key(result["config"]) == key:
+            return result
+    return None
+
+
+def compare(current: Dict[str, Any], previous: Dict[str, Any]) -> List[str]:
+    """Describe p95 latency and throughput changes beyond the regression threshold."""
+    findings = []
+    before, after = previous["results"]["throughput_rps"], current["results"]["throughput_rps"]
+    if before and (before - after) / before > REGRESSION_THRESHOLD:
+        findings.append(f"throughput {before:.1f} -> {after:.1f} req/s")
+    for route, stats in current["results"]["routes"].items():
+        old = previous["results"]["routes"].get(route)
+        if old and old["p95_ms"] and (stats["p95_ms"] - old["p95_ms"]) / old["p95_ms"] > REGRESSION_THRESHOLD:
+            findings.append(f"{route} p95 {old['p95_ms']:.1f} -> {stats['p95_ms']:.1f} ms")
+    return findings
+
+
+def report(result: Dict[str, Any]) -> None:
+    results = result["results"]
+    print(f"commit {result['commit']}  {results['overall']['count']} requests in {results['elapsed_s']:.2f}s "
+          f"= {results['throughput_rps']:.1f} req/s")
+    print(f"{'route':40} {'count':>6} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9}")
+    for route, stats in list(results["routes"].items()) + [("overall", results["overall"])]:
+        print(f"{route:40} {stats['count']:>6} {stats['p50_ms']:>9.1f} {stats['p95_ms']:>9.1f} {stats['p99_ms']:>9.1f}")
+    print(f"statuses {results['statuses']}  upstream calls {results['upstream_calls']} "
+          f"(throttled {results['upstream_throttled']})")
+    memory = results["memory"]
+    print(f"max RSS {memory['max_rss_mb']:.1f} MB" +
+          (f"  traced peak {memory['traced_peak_mb']:.1f} MB" if "traced_peak_mb" in memory else ""))
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0].strip())
+    parser.add_argument("--requests", type=int, default=2000, help="total requests to send")
+    parser.add_argument("--concurrency", type=int, default=20, help="concurrent clients")
+    parser.add_argument("--people", type=int, default=1000, help="people in the fake directory")
+    parser.add_argument("--latency", type=float, default=0.05, help="simulated Breeze latency in seconds")
+    parser.add_argument("--jitter", type=float, default=0.02, help="random extra latency in seconds")
+    parser.add_argument("--rate-limit", type=float, default=None, help="upstream calls allowed per second")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--trace-memory", action="store_true", help="record peak Python allocations (slower)")
+    parser.add_argument("--label", default="", help="free-form note stored with the result")
+    parser.add_argument("--no-save", action="store_true", help="do not write the result file")
+    args = parser.parse_args(argv)
+
+    config = {
+        "requests": args.requests, "concurrency": args.concurrency, "people": args.people,
+        "latency": args.latency, "jitter": args.jitter, "rate_limit": args.rate_limit,
+        "seed": args.seed, "trace_memory": args.trace_memory, "label": args.label,
+    }
+    fake = FakeBreezeApi(people=args.people, latency=args.latency, jitter=args.jitter,
+                         rate_limit=args.rate_limit, seed=args.seed)
+    app = load_app(fake)
+
+    if args.trace_memory:
+        tracemalloc.start()
+    results = asyncio.run(drive(app, build_workload(fake), args.requests, args.concurrency, args.seed))
+    results["memory"] = {"max_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024}
+    if args.trace_memory:
+        results["memory"]["traced_peak_mb"] = tracemalloc.get_traced_memory()[1] / 2 ** 20
+        tracemalloc.stop()
+    results["upstream_calls"] = fake.calls
+    results["upstream_throttled"] = fake.throttled
+
+    result = {"commit": git_commit(), "created_at": datetime.now().isoformat(timespec="seconds"),
+              "config": config, "results": results}
+    report(result)
+
+    previous = previous_result(config)
+    if previous:
+        findings = compare(result, previous)
+        print(f"compared with {previous['commit']} ({previous['created_at']}): " +
+              ("; ".join(findings) if findings else "no regressions"))
+
+    if not args.no_save:
+        os.makedirs(RESULTS_DIR, exist_ok=True)
+        stamp = result["created_at"].replace(":", "")
+        with open(os.path.join(RESULTS_DIR, f"{stamp}-{result['commit'] or 'nocommit'}.json"), "w") as f:
+            json.dump(result, f, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
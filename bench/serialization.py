@@ -0,0 +1,88 @@
+"""
+Serialization benchmark for the trusted upstream JSON fast path.
+
+For large generated lists of people, events, form entries and volunteer roles,
+checks that the fast path (compiled projection + orjson) produces the same JSON
+as FastAPI's response_model validation and serialization, then compares the CPU
+time each takes.
+
+Usage:
+    python -m bench.serialization --size 10000 --repeat 5
+"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+from typing import Any, Callable, Dict, List, Optional
+
+from fastapi.responses import JSONResponse, ORJSONResponse
+from fastapi.routing import serialize_response
+from fastapi.utils import create_response_field
+
+from .fake_breeze import FakeBreezeApi
+
+
+def load_models():
+    os.environ.setdefault('breeze_url', 'https://bench.breezechms.com')
+    os.environ.setdefault('api_key', 'bench')
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    import main
+    from services.serialization import compile_projection
+    return main, compile_projection
+
+
+def payloads(size: int) -> Dict[str, List[Dict[str, Any]]]:
+    fake = FakeBreezeApi(people=size, events=size, contributions=0, latency=0, jitter=0)
+    return {
+        "Person": fake.people,
+        "Event": fake.events,
+        "FormEntry": [{"id": str(i), "form_id": "15326", "created_on": "2021-03-09 13:04:02", "person_id": None,
+                       "response": {"45": {"first_name": "Zoe", "last_name": "Washburne"},
+                                    "46": f"zoe{i}@example.org", "47": "Red"}} for i in range(size)],
+        "VolunteerRole": [{"id": str(i), "name": f"Role {i}", "quantity": str(i % 5)} for i in range(size)],
+    }
+
+
+def cpu_time(func: Callable[[], bytes], repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.process_time()
+        func()
+        best = min(best, time.process_time() - start)
+    return best
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0].strip())
+    parser.add_argument("--size", type=int, default=10000, help="records per list")
+    parser.add_argument("--repeat", type=int, default=5, help="runs per measurement (best is kept)")
+    args = parser.parse_args(argv)
+
+    app_module, compile_projection = load_models()
+    failures = 0
+    print(f"{'model':15} {'records':>8} {'pydantic ms':>12} {'fast ms':>9} {'speedup':>8}")
+    for name, items in payloads(args.size).items():
+        model = getattr(app_module, name)
+        field = create_response_field(name="Response", type_=List[model])
+
+        def validated() -> bytes:
+            content = asyncio.run(serialize_response(field=field, response_content=items))
+            return JSONResponse(content).body
+
+        def fast() -> bytes:
+            project = compile_projection(model)
+            return ORJSONResponse([project(item) for item in items]).body
+
+        if json.loads(validated()) != json.loads(fast()):
+            failures += 1
+            print(f"{name}: fast path output differs from response_model output")
+            continue
+        slow_s, fast_s = cpu_time(validated, args.repeat), cpu_time(fast, args.repeat)
+        print(f"{name:15} {len(items):>8} {slow_s * 1000:>12.1f} {fast_s * 1000:>9.1f} {slow_s / fast_s:>7.1f}x")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
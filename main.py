@@ -1,20 +1,153 @@
-from fastapi import FastAPI, HTTPException, APIRouter
+from fastapi import FastAPI, HTTPException, APIRouter, Depends, Header, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import FileResponse, JSONResponse, ORJSONResponse, PlainTextResponse, Response, StreamingResponse
 from pydantic import BaseModel
-from typing import List, Optional, Dict, Any, Union
-from pyBreezeChMS.breeze.breeze import BreezeApi
+from typing import List, Optional, Dict, Any, Union, Literal
+from contextlib import asynccontextmanager
+import asyncio
 import os
+import sys
+import orjson
 from dotenv import load_dotenv
-from datetime import datetime
+from datetime import date, datetime, timedelta
+from services.cache import cache
+from services.routing import InstrumentedRoute
+from services import admission, attendance, batch, checkin_queue, circuit, compression, contributions, dedup, field_validation, form_export, http_cache, idempotency, metrics, profiling, serialization, snapshot, statements, tenants, tracing, warmup, workers
 
 # Load environment variables
 load_dotenv()
 
-# Initialize Breeze API
-breeze_api = BreezeApi(
-    breeze_url=os.getenv('breeze_url'),
-    api_key=os.getenv('api_key')
+# Attendance counts and trends kept locally (None unless attendance_store is enabled)
+attendance_store = attendance.open_store()
+
+# Initialize one Breeze API client per tenant; breeze_api calls the current request's tenant
+tenant_pool = tenants.TenantPool(
+    tenants.load_tenant_configs(),
+    hooks=[metrics.observe_upstream, tracing.trace_upstream] + ([attendance_store.hook] if attendance_store else []),
 )
+breeze_api = tenants.TenantProxy(tenant_pool)
+metrics.track_rate_limiters(tenant_pool.limiters)
+metrics.track_circuit_breakers(tenant_pool.breakers)
+
+# Per-client quotas, per-route-class concurrency caps and upstream wait budgets for inbound requests
+admission_controller = admission.open_controller()
+metrics.track_admission(admission_controller)
+
+# Trace and profile work done inside endpoint functions
+InstrumentedRoute.endpoint_wrappers = [tracing.endpoint_span, profiling.profile_endpoint]
+
+# Configure tracing (disabled unless trace_exporter is set)
+tracing.setup_tracing()
+
+# Token required by /admin endpoints and for on-demand profiling
+admin_token = os.getenv('admin_token')
+profile_store = profiling.ProfileStore(os.getenv('profile_dir', 'profiles'))
+
+# Results of writes sent with an Idempotency-Key
+idempotency_store = idempotency.open_store()
+
+def warm_up_jobs():
+    """Cache entries preloaded for each tenant at startup: profile fields, tag folders, this week's events and their volunteer roles"""
+    if not sync_leader.is_leader:
+        # Followers were already seeded from the leader's snapshots when they were mapped; only the leader warms from Breeze
+        return []
+
+    def preload(source):
+        def job():
+            cache.get_or_load(*source)
+        return job
+
+    def events_and_roles():
+        today = date.today()
+        start = today - timedelta(days=today.weekday())
+        events = cache.get_or_load(*events_source(start.isoformat(), (start + timedelta(days=6)).isoformat()))
+        now = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        return [(f"volunteer_roles:{event['id']}", preload(volunteer_roles_source(str(event["id"]), False)))
+                for event in events or [] if (event.get("start_datetime") or "") >= now]
+
+    return [
+        ("profile_fields", preload(profile_fields_source())),
+        ("tag_folders", preload(tag_folders_source())),
+        ("events", events_and_roles),
+    ]
+
+# Cache warm-up run at startup; /ready reports 503 until it finishes (skipped when warmup=false)
+cache_warm_up = warmup.WarmUp(
+    warm_up_jobs,
+    concurrency=int(os.getenv('warmup_concurrency', 4)),
+    timeout=float(os.getenv('warmup_timeout', 60)),
+)
+WARM_UP_ENABLED = os.getenv('warmup', 'true').lower() in ('1', 'true', 'yes')
+
+# Contributions cached locally for pledge progress, one ledger per tenant
+contribution_ledgers = contributions.ContributionLedgers()
+
+# Year-end giving statement jobs and their zip archives, kept under statement_dir
+statement_jobs = statements.open_jobs()
+
+# Check-ins acknowledged locally and sent to Breeze in the background (None unless checkin_queue is enabled)
+checkins = checkin_queue.open_queue()
+
+def seed_from_snapshot(snap: snapshot.Snapshot):
+    """Serve the directory, households and tags from a mapped snapshot until the next sync replaces it"""
+    # Outlive the leader's next rewrite, which reseeds them; misses are reloaded from the snapshot anyway
+    ttl = 2 * snapshot_sync.interval
+    people = cache.set(people_source(None, None, True)[0], snap.people(details=True), ttl)
+    cache.set(people_source(None, None, False)[0], snap.people(details=False), ttl)
+    cache.set(households_source(people)[0], snap.households, ttl)
+    cache.set(tag_folders_source()[0], snap.tag_folders, ttl)
+    cache.set(tags_source(None)[0], snap.tags, ttl)
+    if snap.profile_fields is not None:
+        cache.set(profile_fields_source()[0], snap.profile_fields, ttl)
+    # Event lists are filtered from the new snapshot on their next read
+    cache.invalidate("events")
+
+def mapped_snapshot() -> Optional[snapshot.Snapshot]:
+    """The current tenant's snapshot, which directory reads are served from instead of Breeze once one is mapped"""
+    return snapshot_sync.current() if snapshot_sync is not None else None
+
+def invalidate_snapshot():
+    """Read the current tenant's directory and events from Breeze after a write, until a newer snapshot is mapped"""
+    if snapshot_sync is not None:
+        snapshot_sync.invalidate()
+
+# With several workers (workers=N), one of them runs the background jobs that talk to Breeze and the others serve
+# reads from the snapshots it writes; snapshots are then kept in ./snapshots unless snapshot_dir says otherwise
+sync_leader = workers.open_leader(os.getenv('snapshot_dir', 'snapshots'))
+
+# Directory snapshots mapped by every worker at startup and rewritten by a background sync (None unless snapshot_dir is set)
+snapshot_sync = snapshot.open_sync(seed_from_snapshot, sync_leader,
+                                   default_dir='snapshots' if workers.WORKERS > 1 else None)
+
+def start_sync_jobs():
+    """Background jobs run by one worker only: sending queued check-ins and backfilling attendance"""
+    if checkins is not None:
+        checkins.start(tenant_pool.client)
+    if attendance_store is not None:
+        attendance_store.start(
+            tenant_pool.names,
+            tenant_pool.client,
+            days=int(os.getenv('attendance_backfill_days', 365)),
+            interval=float(os.getenv('attendance_backfill_interval', 3600)),
+        )
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    sync_leader.start(start_sync_jobs)
+    if snapshot_sync is not None:
+        snapshot_sync.load(tenant_pool.names)
+        snapshot_sync.start(tenant_pool.names, tenant_pool.client)
+    warm_up_task = asyncio.create_task(cache_warm_up.run(tenant_pool.names)) if WARM_UP_ENABLED else None
+    yield
+    if warm_up_task is not None:
+        warm_up_task.cancel()
+    if checkins is not None:
+        checkins.stop()
+    if attendance_store is not None:
+        attendance_store.stop()
+    if snapshot_sync is not None:
+        snapshot_sync.stop()
+    sync_leader.stop()
 
 app = FastAPI(
     title="Breeze ChMS API",
@@ -23,8 +156,12 @@ app = FastAPI(
     This API wrapper allows churches to build custom functionality integrated with Breeze ChMS.
     """,
     version="1.0.0",
+    lifespan=lifespan,
 )
 
+# Shed requests over their client's quota or their route class's concurrency cap (innermost, so rejections still get CORS headers)
+app.add_middleware(admission.AdmissionMiddleware, controller=admission_controller)
+
 # Enable CORS
 app.add_middleware(
     CORSMiddleware,
@@ -34,6 +171,31 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Compress large text responses (cached reads are served precompressed)
+app.add_middleware(compression.CompressionMiddleware)
+
+# Profile requests on demand (X-Profile header) or at the configured sample rate
+app.add_middleware(
+    profiling.ProfilingMiddleware,
+    store=profile_store,
+    admin_token=admin_token,
+    sample_rate=float(os.getenv('profile_sample_rate', 0)),
+    default_mode=os.getenv('profile_mode', 'cprofile'),
+)
+
+# Record request latency for /metrics
+app.add_middleware(metrics.MetricsMiddleware)
+
+# Open a trace span per request
+app.add_middleware(tracing.TracingMiddleware)
+
+# Select the tenant from the /t/{tenant} path prefix or X-Breeze-Tenant header
+app.add_middleware(
+    tenants.TenantMiddleware,
+    tenants=tenant_pool.names,
+    default=os.getenv('default_tenant', tenants.DEFAULT_TENANT),
+)
+
 # Models
 class Person(BaseModel):
     id: str
@@ -87,15 +249,152 @@ class Volunteer(BaseModel):
     person_id: str
     role_ids: Optional[List[str]] = None
 
+class BatchItem(BaseModel):
+    id: Optional[str] = None
+    method: Literal["GET"] = "GET"
+    path: str
+    headers: Optional[Dict[str, str]] = None
+
+class BatchRequest(BaseModel):
+    requests: List[BatchItem]
+
+class PersonImportValidation(BaseModel):
+    rows: List[Dict[str, Any]]
+
 # Create routers with tags
-people_router = APIRouter(prefix="/people", tags=["People"])
-events_router = APIRouter(prefix="/events", tags=["Events"])
-contributions_router = APIRouter(prefix="/contributions", tags=["Contributions"])
-campaigns_router = APIRouter(prefix="/campaigns", tags=["Campaigns"])
-tags_router = APIRouter(prefix="/tags", tags=["Tags"])
-forms_router = APIRouter(prefix="/forms", tags=["Forms"])
-volunteers_router = APIRouter(prefix="/volunteers", tags=["Volunteers"])
-profile_router = APIRouter(prefix="/profile", tags=["Profile"])
+people_router = APIRouter(prefix="/people", tags=["People"], route_class=InstrumentedRoute)
+events_router = APIRouter(prefix="/events", tags=["Events"], route_class=InstrumentedRoute)
+contributions_router = APIRouter(prefix="/contributions", tags=["Contributions"], route_class=InstrumentedRoute)
+campaigns_router = APIRouter(prefix="/campaigns", tags=["Campaigns"], route_class=InstrumentedRoute)
+tags_router = APIRouter(prefix="/tags", tags=["Tags"], route_class=InstrumentedRoute)
+forms_router = APIRouter(prefix="/forms", tags=["Forms"], route_class=InstrumentedRoute)
+volunteers_router = APIRouter(prefix="/volunteers", tags=["Volunteers"], route_class=InstrumentedRoute)
+profile_router = APIRouter(prefix="/profile", tags=["Profile"], route_class=InstrumentedRoute)
+admin_router = APIRouter(prefix="/admin", tags=["Admin"], route_class=InstrumentedRoute)
+
+def upstream_error(e: Exception, status_code: int = 500, detail: Optional[str] = None) -> HTTPException:
+    """Map an exception raised while calling Breeze to the HTTP error returned to the client"""
+    if isinstance(e, HTTPException):
+        return e
+    if isinstance(e, tenants.Overloaded):
+        admission_controller.shed()
+        return HTTPException(status_code=503, detail=str(e), headers={"Retry-After": str(max(1, round(e.retry_after)))})
+    if isinstance(e, tenants.RateLimitExceeded):
+        return HTTPException(status_code=429, detail=str(e), headers={"Retry-After": str(max(1, round(e.retry_after)))})
+    if isinstance(e, circuit.CircuitOpen):
+        return HTTPException(status_code=503, detail=str(e), headers={"Retry-After": str(max(1, round(e.retry_after)))})
+    if isinstance(e, tenants.UnknownTenant):
+        return HTTPException(status_code=404, detail=str(e))
+    if isinstance(e, field_validation.InvalidFields):
+        return HTTPException(status_code=422, detail=[{"loc": ["query", "fields_json", *error["loc"]], "msg": error["msg"]}
+                                                      for error in e.errors])
+    if isinstance(e, statements.StatementError):
+        return HTTPException(status_code=e.status_code, detail=str(e))
+    if isinstance(e, idempotency.IdempotencyError):
+        return HTTPException(status_code=e.status_code, detail=str(e))
+    return HTTPException(status_code=status_code, detail=detail or str(e))
+
+def require_admin(x_admin_token: Optional[str] = Header(None)):
+    """Dependency rejecting requests without the configured admin token"""
+    if not profiling.is_admin(x_admin_token, admin_token):
+        raise HTTPException(status_code=403, detail="Admin token required")
+
+def idempotent(key: Optional[str], response: Response, operation: str, params: Any, write):
+    """Run a write once per Idempotency-Key, replaying the stored result for repeats of the same request"""
+    if not key:
+        return write()
+    result, replayed = idempotency_store.run((tenants.current_tenant.get(), operation), key, params, write)
+    if replayed:
+        response.headers[idempotency.REPLAYED_HEADER] = "true"
+    return result
+
+# Cached upstream reads: each *_source returns the cache key and loader for one read
+def people_source(limit: Optional[int], offset: Optional[int], details: bool):
+    def load():
+        snap = mapped_snapshot()
+        if snap is None:
+            return breeze_api.get_people(limit=limit, offset=offset, details=details)
+        people = snap.people(details=details)
+        if limit is None and not offset:
+            return people
+        start = offset or 0
+        return people[start:start + limit if limit is not None else None]
+    return ("people", limit, offset, details), load
+
+def households_source(people):
+    def load():
+        snap = mapped_snapshot()
+        if snap is not None and snap.households is not None:
+            return snap.households
+        return snapshot.build_households(people.value)
+    return ("households", people.version), load
+
+def person_source(person_id: str):
+    return ("person", person_id), lambda: breeze_api.get_person_details(person_id)
+
+def profile_fields_source():
+    def load():
+        snap = mapped_snapshot()
+        if snap is not None and snap.profile_fields is not None:
+            return snap.profile_fields
+        return breeze_api.get_profile_fields()
+    return ("profile_fields",), load
+
+def events_source(start_date: Optional[str], end_date: Optional[str]):
+    def load():
+        if snapshot_sync is not None and start_date and end_date:
+            events = snapshot_sync.events(start_date, end_date)
+            if events is not None:
+                return events
+        return breeze_api.get_events(start_date, end_date)
+    return ("events", start_date, end_date), load
+
+def form_fields_source(form_id: str):
+    return ("form_fields", form_id), lambda: breeze_api.list_form_fields(form_id)
+
+def campaigns_source():
+    return ("campaigns",), breeze_api.list_campaigns
+
+def pledges_source(campaign_id: str):
+    return ("pledges", campaign_id), lambda: breeze_api.list_pledges(campaign_id)
+
+def tag_folders_source():
+    def load():
+        snap = mapped_snapshot()
+        return snap.tag_folders if snap is not None else breeze_api.get_tag_folders()
+    return ("tag_folders",), load
+
+def tags_source(folder: Optional[str]):
+    def load():
+        snap = mapped_snapshot()
+        # Snapshots hold the tags of every folder, so only unfiltered reads are served from them
+        if snap is not None and folder is None:
+            return snap.tags
+        return breeze_api.get_tags(folder)
+    return ("tags", folder), load
+
+def volunteer_roles_source(instance_id: str, show_quantity: bool):
+    return ("volunteer_roles", instance_id, show_quantity), lambda: breeze_api.list_volunteer_roles(instance_id, show_quantity)
+
+def get_form_fields_cached(form_id: str) -> List[Dict]:
+    """Return the field schema for a form, served from cache when possible."""
+    return cache.get_or_load(*form_fields_source(form_id))
+
+def profile_field_aliases():
+    """Return the profile field name aliases for fields= and the schema version they came from."""
+    entry = cache.get_or_load_entry(*profile_fields_source())
+    return serialization.profile_field_aliases(entry.value), entry.version
+
+def fields_schema():
+    """Return the profile field schema compiled into validators, rebuilt whenever the schema changes."""
+    entry = cache.get_or_load_entry(*profile_fields_source())
+    return cache.get_or_load(("fields_schema", entry.version), lambda: field_validation.FieldsSchema(entry.value))
+
+# Validate fields_json against the profile field schema before writes are sent to Breeze
+VALIDATE_FIELDS = os.getenv('validate_fields', 'true').lower() in ('1', 'true', 'yes')
+
+# Person keys returned without details=true; selecting anything else needs details
+BASIC_PERSON_FIELDS = {"id", "first_name", "last_name", "path"}
 
 # Root endpoint
 @app.get("/")
@@ -103,9 +402,68 @@ async def root():
     """Root endpoint to verify API is running"""
     return {"message": "Breeze ChMS API is running"}
 
+# Readiness endpoint
+@app.get("/ready")
+async def ready():
+    """Readiness probe: 200 once the startup cache warm-up has finished, 503 while it is running"""
+    if WARM_UP_ENABLED and not cache_warm_up.ready:
+        return JSONResponse(cache_warm_up.status(), status_code=503)
+    return cache_warm_up.status() if WARM_UP_ENABLED else {"status": "ready"}
+
+# Batch endpoint
+BATCH_MAX_REQUESTS = int(os.getenv('batch_max_requests', 20))
+BATCH_CONCURRENCY = int(os.getenv('batch_concurrency', 10))
+
+@app.post("/batch")
+async def run_batch(request: Request, body: BatchRequest):
+    """
+    Run several read requests in one round trip.
+
+    Each sub-request is served in-process by the normal route, concurrently with
+    the others and for the same tenant, so they share the cache and any loads
+    already in flight.
+
+    Parameters:
+    - **requests**: Sub-requests, each with an optional `id`, `method` (GET only),
+        `path` including any query string (e.g. `/people/123?fields=first_name`;
+        not `/batch` or a tenant-prefixed `/t/...` path)
+        and optional `headers` (e.g. `If-None-Match`)
+
+    Example body:
+    ```json
+    {"requests": [{"id": "me", "path": "/people/123"}, {"id": "events", "path": "/events/"}]}
+    ```
+
+    Returns:
+        Results in request order, each with the sub-request `id`, its `status` code,
+        response `headers` and JSON `body`
+    """
+    if len(body.requests) > BATCH_MAX_REQUESTS:
+        raise HTTPException(status_code=422, detail=f"A batch can contain at most {BATCH_MAX_REQUESTS} requests")
+    for item in body.requests:
+        path = item.path.split("?")[0]
+        # Sub-requests run for the outer request's tenant; a /t/<tenant>/ path would switch it
+        if not path.startswith("/") or path.rstrip("/") == "/batch" or path.startswith(tenants.TENANT_PATH_PREFIX):
+            raise HTTPException(status_code=422, detail=f"Invalid batch path: {item.path}")
+    results = await batch.run(app, request.scope, [item.model_dump() for item in body.requests], BATCH_CONCURRENCY)
+    return ORJSONResponse(results)
+
+# Metrics endpoint
+@app.get("/metrics", include_in_schema=False)
+async def get_metrics():
+    """Prometheus metrics: request and upstream latency, upstream errors, cache lookups"""
+    body, content_type = metrics.render()
+    return Response(content=body, media_type=content_type)
+
 # People endpoints
 @people_router.get("/", response_model=List[Person])
-async def get_people(limit: Optional[int] = None, offset: Optional[int] = None, details: bool = False):
+def get_people(
+    request: Request,
+    limit: Optional[int] = None,
+    offset: Optional[int] = None,
+    details: bool = False,
+    fields: Optional[str] = None
+):
     """
     List people from your database.
 
@@ -113,6 +471,13 @@ async def get_people(limit: Optional[int] = None, offset: Optional[int] = None,
     - **limit**: Number of people to return. If None, will return all people
     - **offset**: Number of people to skip before beginning to return results. Can be used with limit for pagination
     - **details**: Option to return all information (slower) or just names
+    - **fields**: Comma-separated fields to return instead of the default ones. Nested values
+        use dotted paths (`details.929778337.address`) and profile fields can be named
+        directly (`email.address`, `phone.phone_number`). Selecting a profile field
+        implies details=true. Each person is returned as a flat object keyed by path.
+
+    Responses carry an ETag; send it back in If-None-Match to get 304 Not Modified
+    while the cached list is unchanged.
 
     Returns:
         JSON response. For example:
@@ -134,28 +499,102 @@ async def get_people(limit: Optional[int] = None, offset: Optional[int] = None,
         ```
     """
     try:
-        return breeze_api.get_people(limit=limit, offset=offset, details=details)
+        selected = serialization.parse_fields(fields)
+        if selected is None:
+            return http_cache.conditional_json(
+                request, *people_source(limit, offset, details),
+                render=lambda people: serialization.render_list(people, Person),
+            )
+        details = details or any(f.split(".")[0] not in BASIC_PERSON_FIELDS for f in selected)
+        aliases, schema_version = profile_field_aliases() if details else (None, None)
+        return http_cache.conditional_json(
+            request, *people_source(limit, offset, details),
+            render=lambda people: serialization.render_selection(people, selected, aliases),
+            variant=(selected, schema_version),
+        )
+    except Exception as e:
+        raise upstream_error(e)
+
+@people_router.get("/duplicates", response_model=List[Dict])
+def find_duplicate_people(min_score: float = 0.5, limit: int = 100):
+    """
+    Suggest people records that are probably duplicates of each other.
+
+    Works on a local snapshot of the directory (one bulk get_people call, cached).
+    People are grouped into blocks by phonetic last name and first initial,
+    normalized email and phone number, and only pairs within a block are scored,
+    in parallel for large directories. Results are cached until the snapshot changes.
+
+    Parameters:
+    - **min_score**: Lowest score (0 to 1) to suggest
+    - **limit**: Maximum number of suggestions to return
+
+    Returns:
+        Merge suggestions, best first, each with its score, the reasons, the
+        person to keep and the one to merge into it
+    """
+    try:
+        people = cache.get_or_load_entry(*people_source(None, None, True))
+        aliases, schema_version = profile_field_aliases()
+
+        def build():
+            select = serialization.compile_selector(dedup.CONTACT_FIELDS, aliases)
+            records = [dedup.person_record(person, select(person)) for person in people.value]
+            matches = dedup.find_duplicates(records, min_score, workers=int(os.getenv('dedup_workers', 0)) or None)
+            return dedup.merge_suggestions(records, matches, {str(p["id"]): p for p in people.value})
+
+        return cache.get_or_load(("duplicates", people.version, schema_version, min_score), build)[:limit]
+    except Exception as e:
+        raise upstream_error(e)
+
+@people_router.get("/households", response_model=List[Dict])
+def get_households(request: Request):
+    """
+    List households, built from the family members in people's details.
+
+    Returns:
+        Households, each with its family `id` and `members` (`person_id` and `role`)
+    """
+    try:
+        people = cache.get_or_load_entry(*people_source(None, None, True))
+        return http_cache.conditional_json(request, *households_source(people), render=orjson.dumps)
     except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+        raise upstream_error(e)
 
 @people_router.get("/{person_id}", response_model=Dict)
-async def get_person_details(person_id: str):
+def get_person_details(request: Request, person_id: str, fields: Optional[str] = None):
     """
     Retrieve the details for a specific person by their ID.
 
     Parameters:
     - **person_id**: Unique ID for a person in Breeze database
+    - **fields**: Comma-separated fields to return, as for the people list
+        (e.g. `first_name,last_name,email.address`)
 
     Returns:
         JSON response with person details
     """
     try:
-        return breeze_api.get_person_details(person_id)
+        selected = serialization.parse_fields(fields)
+        if selected is None:
+            return http_cache.conditional_json(request, *person_source(person_id), render=orjson.dumps)
+        aliases, schema_version = profile_field_aliases()
+        return http_cache.conditional_json(
+            request, *person_source(person_id),
+            render=lambda person: serialization.render_selection(person, selected, aliases),
+            variant=(selected, schema_version),
+        )
     except Exception as e:
-        raise HTTPException(status_code=404, detail=f"Person not found: {str(e)}")
+        raise upstream_error(e, status_code=404, detail=f"Person not found: {str(e)}")
 
 @people_router.post("/", response_model=Dict)
-async def add_person(first_name: str, last_name: str, fields_json: Optional[str] = None):
+def add_person(
+    response: Response,
+    first_name: str,
+    last_name: str,
+    fields_json: Optional[str] = None,
+    idempotency_key: Optional[str] = Header(None),
+):
     """
     Add a new person to the database.
 
@@ -164,6 +603,7 @@ async def add_person(first_name: str, last_name: str, fields_json: Optional[str]
     - **last_name**: The last name of the person
     - **fields_json**: Optional JSON string representing an array of fields to update.
         Each array element must contain field id, field type, response, and in some cases, more information.
+    - **Idempotency-Key** (header): Repeats with the same key return the first result instead of adding the person again
 
     Example fields_json:
     ```json
@@ -181,18 +621,51 @@ async def add_person(first_name: str, last_name: str, fields_json: Optional[str]
     ```
 
     Note: Use get_profile_fields() to get field information or get_person_details() 
-    to see fields that already exist for a person.
+    to see fields that already exist for a person. fields_json is checked against
+    the profile fields first; invalid fields are rejected with 422 before Breeze is called.
 
     Returns:
         JSON response equivalent to get_person_details()
     """
+    def write():
+        person = breeze_api.add_person(first_name, last_name, fields_json)
+        cache.invalidate("people")
+        invalidate_snapshot()
+        return person
+
+    try:
+        if VALIDATE_FIELDS:
+            fields_schema().validate(fields_json)
+        return idempotent(idempotency_key, response, "add_person",
+                          {"first_name": first_name, "last_name": last_name, "fields_json": fields_json}, write)
+    except Exception as e:
+        raise upstream_error(e)
+
+@people_router.post("/validate")
+def validate_people(body: PersonImportValidation):
+    """
+    Check person import rows before importing them.
+
+    Each row is checked like a POST /people request: first and last name are
+    required and fields_json must match the profile field schema. Nothing is
+    sent to Breeze apart from loading the (cached) profile fields.
+
+    Parameters:
+    - **rows**: Rows with `first_name`, `last_name` and optional `fields_json`
+        (a JSON string as for POST /people, or the array itself)
+
+    Returns:
+        The number of valid and invalid rows and, for each invalid row, its
+        index and errors (`loc` within the row, `msg`)
+    """
     try:
-        return breeze_api.add_person(first_name, last_name, fields_json)
+        invalid = fields_schema().validate_rows(body.rows)
+        return {"valid": len(body.rows) - len(invalid), "invalid": len(invalid), "errors": invalid}
     except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+        raise upstream_error(e)
 
 @people_router.put("/{person_id}", response_model=Dict)
-async def update_person(person_id: str, fields_json: str):
+def update_person(person_id: str, fields_json: str):
     """
     Updates the details for a specific person in the database.
 
@@ -219,18 +692,28 @@ async def update_person(person_id: str, fields_json: str):
 
     Note: Use get_profile_fields() to get field information or
     use get_person_details() to see fields that already exist for a specific person.
+    fields_json is checked against the profile fields first; invalid fields are
+    rejected with 422 before Breeze is called. Empty values, which clear a
+    field, are passed on as they are.
 
     Returns:
         JSON response equivalent to get_person_details(person_id)
     """
     try:
-        return breeze_api.update_person(person_id, fields_json)
+        if VALIDATE_FIELDS:
+            # Updates may clear a field, so empty values are let through to Breeze
+            fields_schema().validate(fields_json, allow_empty=True)
+        person = breeze_api.update_person(person_id, fields_json)
+        cache.invalidate("people")
+        invalidate_snapshot()
+        cache.delete(("person", person_id))
+        return person
     except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+        raise upstream_error(e)
 
 # Profile endpoints
 @profile_router.get("/fields", response_model=List[Dict])
-async def get_profile_fields():
+def get_profile_fields(request: Request):
     """
     List profile fields from your database.
 
@@ -252,30 +735,41 @@ async def get_profile_fields():
         ```
     """
     try:
-        return breeze_api.get_profile_fields()
+        return http_cache.conditional_json(request, *profile_fields_source(), render=orjson.dumps)
     except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+        raise upstream_error(e)
 
 # Events endpoints
 @events_router.get("/", response_model=List[Event])
-async def get_events(start_date: Optional[str] = None, end_date: Optional[str] = None):
+def get_events(
+    request: Request,
+    start_date: Optional[str] = None,
+    end_date: Optional[str] = None,
+    fields: Optional[str] = None
+):
     """
     Retrieve all events for a given date range.
 
     Parameters:
     - **start_date**: Start date (defaults to first day of current month)
     - **end_date**: End date (defaults to last day of current month)
+    - **fields**: Comma-separated fields to return instead of the default ones (e.g. `id,name,start_datetime`)
 
     Returns:
         JSON response with list of events
     """
     try:
-        return breeze_api.get_events(start_date, end_date)
+        selected = serialization.parse_fields(fields)
+        if selected is None:
+            render = lambda events: serialization.render_list(events, Event)
+        else:
+            render = lambda events: serialization.render_selection(events, selected)
+        return http_cache.conditional_json(request, *events_source(start_date, end_date), render=render, variant=(selected,))
     except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+        raise upstream_error(e)
 
 @events_router.post("/", response_model=Dict)
-async def add_event(
+def add_event(
     name: str,
     start_date: str,
     end_date: Optional[str] = None,
@@ -300,32 +794,58 @@ async def add_event(
         JSON response with created event details
     """
     try:
-        return breeze_api.add_event(name, start_date, end_date, all_day, description, category_id, event_id)
+        event = breeze_api.add_event(name, start_date, end_date, all_day, description, category_id, event_id)
+        cache.invalidate("events")
+        invalidate_snapshot()
+        return event
     except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+        raise upstream_error(e)
 
 @events_router.post("/{event_instance_id}/check-in/{person_id}")
-async def event_check_in(person_id: str, event_instance_id: str):
+def event_check_in(
+    response: Response,
+    person_id: str,
+    event_instance_id: str,
+    idempotency_key: Optional[str] = Header(None),
+):
     """
     Check in a person to an event.
 
+    With checkin_queue enabled the check-in is stored locally and acknowledged
+    with 202 straight away, then sent to Breeze in the background. Repeated
+    check-ins of the same person into the same instance are only sent once.
+
     Parameters:
     - **person_id**: ID for a person in Breeze database
     - **event_instance_id**: ID for event instance to check into
+    - **Idempotency-Key** (header): Repeats with the same key return the first result without checking in again
 
     Returns:
-        JSON response confirming check-in
+        JSON response confirming check-in, or the queue id when queued
     """
-    try:
+    def write():
+        if checkins is not None:
+            return checkins.check_in(person_id, event_instance_id)
         return breeze_api.event_check_in(person_id, event_instance_id)
+
+    try:
+        result = idempotent(idempotency_key, response, "event_check_in",
+                            {"person_id": person_id, "event_instance_id": event_instance_id}, write)
+        if checkins is not None:
+            response.status_code = 202
+        return result
     except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+        raise upstream_error(e)
 
 @events_router.delete("/{event_instance_id}/check-out/{person_id}")
-async def event_check_out(person_id: str, event_instance_id: str):
+def event_check_out(person_id: str, event_instance_id: str):
     """
     Remove the attendance for a person checked into an event.
 
+    With checkin_queue enabled, a check-in still waiting in the queue is
+    cancelled instead of being sent, and a check-out of one being sent is
+    queued behind it.
+
     Parameters:
     - **person_id**: Breeze ID for a person in Breeze database
     - **event_instance_id**: ID for event instance to check out (delete)
@@ -334,13 +854,60 @@ async def event_check_out(person_id: str, event_instance_id: str):
         True if check-out succeeds; False if check-out fails
     """
     try:
+        if checkins is not None:
+            return checkins.check_out(person_id, event_instance_id,
+                                      lambda: breeze_api.event_check_out(person_id, event_instance_id))
         return breeze_api.event_check_out(person_id, event_instance_id)
     except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+        raise upstream_error(e)
+
+@events_router.get("/{event_instance_id}/attendance")
+def get_instance_attendance(event_instance_id: str):
+    """
+    Get the attendance count of an event instance from the local attendance store.
+
+    Parameters:
+    - **event_instance_id**: ID for the event instance
+
+    Returns:
+        JSON response with the instance ID and its attendance count
+    """
+    if attendance_store is None:
+        raise HTTPException(status_code=404, detail="Attendance store is not enabled")
+    return {"instance_id": event_instance_id, "attendance": attendance_store.instance_count(event_instance_id)}
+
+@events_router.get("/series/{event_id}/attendance")
+def get_series_attendance(
+    event_id: str,
+    period: Literal["week", "month"] = "week",
+    start_date: Optional[str] = None,
+    end_date: Optional[str] = None
+):
+    """
+    Get attendance trends for an event series from precomputed aggregates.
+
+    Parameters:
+    - **event_id**: ID of the event series (the `event_id` shared by its instances)
+    - **period**: Group by `week` (starting Monday) or `month`
+    - **start_date**: Earliest date to include (YYYY-MM-DD)
+    - **end_date**: Latest date to include (YYYY-MM-DD)
+
+    Returns:
+        List of periods with their number of instances, total attendance and
+        first-time attendees (people attending the series for the first time)
+    """
+    if attendance_store is None:
+        raise HTTPException(status_code=404, detail="Attendance store is not enabled")
+    try:
+        start_date = start_date and date.fromisoformat(start_date[:10]).isoformat()
+        end_date = end_date and date.fromisoformat(end_date[:10]).isoformat()
+    except ValueError:
+        raise HTTPException(status_code=422, detail="Dates must be in YYYY-MM-DD format")
+    return attendance_store.series_trend(event_id, period, start_date, end_date)
 
 # Contributions endpoints
 @contributions_router.post("/", response_model=str)
-async def add_contribution(contribution: Contribution):
+def add_contribution(response: Response, contribution: Contribution, idempotency_key: Optional[str] = Header(None)):
     """
     Add a contribution to Breeze.
 
@@ -356,6 +923,7 @@ async def add_contribution(contribution: Contribution):
     - **group**: For creating new batch with grouped contributions
     - **batch_number**: Batch number for import
     - **batch_name**: Name of the batch
+    - **Idempotency-Key** (header): Repeats with the same key return the first payment ID instead of recording the gift twice
 
     Example funds_json:
     ```json
@@ -375,8 +943,8 @@ async def add_contribution(contribution: Contribution):
     Returns:
         Payment ID
     """
-    try:
-        return breeze_api.add_contribution(
+    def write():
+        payment_id = breeze_api.add_contribution(
             date=contribution.date,
             name=contribution.name,
             person_id=contribution.person_id,
@@ -389,11 +957,84 @@ async def add_contribution(contribution: Contribution):
             batch_number=contribution.batch_number,
             batch_name=contribution.batch_name
         )
+        contribution_ledgers.ledger().invalidate()
+        return payment_id
+
+    try:
+        return idempotent(idempotency_key, response, "add_contribution", contribution.model_dump(), write)
+    except Exception as e:
+        raise upstream_error(e)
+
+def statement_donors():
+    """Names and mailing addresses of everyone in the directory, for giving statements"""
+    people = cache.get_or_load(*people_source(None, None, True))
+    aliases, _ = profile_field_aliases()
+    return statements.donor_directory(people, serialization.compile_selector(statements.ADDRESS_FIELDS, aliases))
+
+@contributions_router.post("/statements", status_code=202)
+def start_giving_statements(year: int, format: Literal["html", "csv", "both"] = "html"):
+    """
+    Start generating year-end giving statements for every donor.
+
+    The job runs in the background: the year's contributions are fetched in one
+    call and grouped by donor, and each donor's statement is rendered (in
+    parallel for large churches) and written into a zip archive along with a
+    summary.csv of every donor's total per fund.
+
+    Parameters:
+    - **year**: Calendar year of the statements
+    - **format**: `html` (printable), `csv` (one row per gift and fund) or `both`
+
+    Returns:
+        The job, with its `id` for checking progress and downloading the archive
+    """
+    formats = statements.FORMATS if format == "both" else (format,)
+    try:
+        return statement_jobs.start(
+            year, formats,
+            fetch=lambda start, end: breeze_api.list_contributions(start_date=start, end_date=end),
+            people=statement_donors,
+        )
+    except Exception as e:
+        raise upstream_error(e)
+
+@contributions_router.get("/statements/{job_id}")
+def get_giving_statements(job_id: str):
+    """
+    Check the progress of a giving statement job.
+
+    Parameters:
+    - **job_id**: ID returned when the job was started
+
+    Returns:
+        The job's `state` (queued, fetching, rendering, done or failed), the number
+        of `donors` and how many have been `rendered`, and the `error` if it failed
+    """
+    try:
+        return statement_jobs.status(job_id)
+    except Exception as e:
+        raise upstream_error(e)
+
+@contributions_router.get("/statements/{job_id}/download")
+def download_giving_statements(job_id: str):
+    """
+    Download the statements of a finished job as a zip archive.
+
+    Parameters:
+    - **job_id**: ID returned when the job was started
+
+    Returns:
+        Zip archive with html/ and/or csv/ folders holding one statement per donor, and summary.csv
+    """
+    try:
+        path = statement_jobs.archive(job_id)
+        year = statement_jobs.status(job_id)["year"]
     except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+        raise upstream_error(e)
+    return FileResponse(path, media_type="application/zip", filename=f"giving-statements-{year}.zip")
 
 @contributions_router.get("/", response_model=List[Dict])
-async def list_contributions(
+def list_contributions(
     start_date: str,
     end_date: str,
     person_id: Optional[str] = None,
@@ -404,7 +1045,8 @@ async def list_contributions(
     fund_ids: Optional[List[str]] = None,
     envelope_number: Optional[str] = None,
     batches: Optional[List[str]] = None,
-    forms: Optional[List[str]] = None
+    forms: Optional[List[str]] = None,
+    fields: Optional[str] = None
 ):
     """
     Retrieve a list of contributions based on various filters.
@@ -421,12 +1063,13 @@ async def list_contributions(
     - **envelope_number**: Envelope number
     - **batches**: List of batch numbers
     - **forms**: List of form IDs
+    - **fields**: Comma-separated fields to return (e.g. `person_id,date,amount,funds.0.name`)
 
     Returns:
         List of matching contributions
     """
     try:
-        return breeze_api.list_contributions(
+        contributions = breeze_api.list_contributions(
             start_date=start_date,
             end_date=end_date,
             person_id=person_id,
@@ -439,12 +1082,125 @@ async def list_contributions(
             batches=batches,
             forms=forms
         )
+        selected = serialization.parse_fields(fields)
+        if selected is None:
+            return contributions
+        return serialization.select_response(contributions, selected)
+    except Exception as e:
+        raise upstream_error(e)
+
+# Campaigns endpoints
+@campaigns_router.get("/", response_model=List[Dict])
+def list_campaigns(request: Request):
+    """
+    List all campaigns.
+
+    Returns:
+        List of campaigns
+    """
+    try:
+        return http_cache.conditional_json(request, *campaigns_source(), render=orjson.dumps)
+    except Exception as e:
+        raise upstream_error(e)
+
+@campaigns_router.get("/{campaign_id}/pledges")
+def list_pledges(request: Request, campaign_id: str):
+    """
+    List pledges within a campaign.
+
+    Parameters:
+    - **campaign_id**: ID number of a campaign
+
+    Returns:
+        List of pledges
+    """
+    try:
+        return http_cache.conditional_json(request, *pledges_source(campaign_id), render=orjson.dumps)
+    except Exception as e:
+        raise upstream_error(e)
+
+@campaigns_router.get("/{campaign_id}/progress")
+def get_campaign_progress(
+    campaign_id: str,
+    start_date: Optional[str] = None,
+    end_date: Optional[str] = None,
+    fund_ids: Optional[str] = None
+):
+    """
+    Compare what each pledger pledged with what they have given.
+
+    Contributions are read from a local ledger that is loaded in bulk and then
+    refreshed incrementally, so this costs at most a few upstream calls however
+    many people pledged.
+
+    Parameters:
+    - **campaign_id**: ID number of a campaign
+    - **start_date**: Count gifts on or after this date (YYYY-MM-DD; defaults to the campaign start)
+    - **end_date**: Count gifts on or before this date (YYYY-MM-DD; defaults to the campaign end, or today)
+    - **fund_ids**: Comma-separated fund IDs to count gifts to (defaults to all funds)
+
+    Returns:
+        Total pledged, given, remaining and percent fulfilled, and the same for each pledger
+    """
+    try:
+        campaign, pledges = contributions.pledge_list(cache.get_or_load(*pledges_source(campaign_id)))
+        start = start_date or campaign.get("campaign_start_date") or min(
+            (p["start_date"] for p in pledges if p.get("start_date")), default=None)
+        end = end_date or campaign.get("campaign_end_date") or date.today().isoformat()
+        if not start:
+            raise HTTPException(status_code=422, detail="start_date is required for campaigns without a start date")
+        try:
+            start, end = date.fromisoformat(start[:10]).isoformat(), date.fromisoformat(end[:10]).isoformat()
+        except ValueError:
+            raise HTTPException(status_code=422, detail="Dates must be in YYYY-MM-DD format")
+
+        ledger = contribution_ledgers.ledger()
+        ledger.ensure(breeze_api, start, end)
+        funds = [f.strip() for f in fund_ids.split(",") if f.strip()] if fund_ids else None
+        given = ledger.given({str(p.get("person_id")) for p in pledges}, start, end, funds)
+        return {
+            "campaign_id": campaign_id,
+            "name": campaign.get("name"),
+            "start_date": start,
+            "end_date": end,
+            **contributions.pledge_progress(pledges, given),
+        }
+    except Exception as e:
+        raise upstream_error(e)
+
+# Tags endpoints
+@tags_router.get("/", response_model=List[Dict])
+def get_tags(request: Request, folder: Optional[str] = None):
+    """
+    List all tags, optionally filtered by folder.
+
+    Parameters:
+    - **folder**: If set, only return tags in this folder ID
+
+    Returns:
+        List of tags
+    """
+    try:
+        return http_cache.conditional_json(request, *tags_source(folder), render=orjson.dumps)
+    except Exception as e:
+        raise upstream_error(e)
+
+@tags_router.get("/folders", response_model=List[Dict])
+def get_tag_folders(request: Request):
+    """
+    List all tag folders.
+
+    Returns:
+        List of tag folders
+    """
+    try:
+        return http_cache.conditional_json(request, *tag_folders_source(), render=orjson.dumps)
     except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+        raise upstream_error(e)
 
 # Forms endpoints
 @forms_router.get("/{form_id}/entries", response_model=List[FormEntry])
-async def list_form_entries(form_id: str, details: bool = False):
+def list_form_entries(form_id: str, details: bool = False):
     """
     Get entries for a specific form.
 
@@ -477,12 +1233,12 @@ async def list_form_entries(form_id: str, details: bool = False):
         ```
     """
     try:
-        return breeze_api.list_form_entries(form_id, details)
+        return serialization.list_response(breeze_api.list_form_entries(form_id, details), FormEntry)
     except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+        raise upstream_error(e)
 
 @forms_router.get("/{form_id}/fields", response_model=List[FormField])
-async def list_form_fields(form_id: str):
+def list_form_fields(request: Request, form_id: str):
     """
     List all fields for a specific form.
     
@@ -493,12 +1249,53 @@ async def list_form_fields(form_id: str):
         List of form fields with their properties
     """
     try:
-        return breeze_api.list_form_fields(form_id)
+        return http_cache.conditional_json(
+            request, *form_fields_source(form_id),
+            render=lambda fields: serialization.render_list(fields, FormField),
+        )
+    except Exception as e:
+        raise upstream_error(e)
+
+@forms_router.get("/{form_id}/export")
+def export_form_entries(form_id: str, format: Literal["csv", "parquet"] = "csv", details: bool = False):
+    """
+    Export the entries of a form as a table with one column per form field.
+
+    Responses are pivoted against the cached field schema from list_form_fields,
+    so each column is headed by the field name. Rows are streamed as they are
+    converted rather than building the whole table in memory.
+
+    Parameters:
+    - **form_id**: The ID of the form
+    - **format**: `csv` or `parquet` (Parquet requires the optional pyarrow package)
+    - **details**: Option to return all information (slower) or just names
+
+    Returns:
+        Streamed CSV or Parquet file with the columns id, created_on, person_id
+        followed by one column per form field
+    """
+    if format == "parquet" and not form_export.parquet_available():
+        raise HTTPException(status_code=501, detail="Parquet export requires the pyarrow package")
+    try:
+        columns = form_export.field_columns(get_form_fields_cached(form_id))
+        entries = form_export.drain(breeze_api.list_form_entries(form_id, details))
     except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+        raise upstream_error(e)
+
+    if format == "parquet":
+        body = form_export.stream_parquet(entries, columns)
+        media_type = "application/vnd.apache.parquet"
+    else:
+        body = form_export.stream_csv(entries, columns)
+        media_type = "text/csv"
+    return StreamingResponse(
+        body,
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="form-{form_id}.{format}"'},
+    )
 
 @forms_router.delete("/entries/{entry_id}")
-async def remove_form_entry(entry_id: str):
+def remove_form_entry(entry_id: str):
     """
     Remove a specific form entry.
     
@@ -511,11 +1308,11 @@ async def remove_form_entry(entry_id: str):
     try:
         return breeze_api.remove_form_entry(entry_id)
     except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+        raise upstream_error(e)
 
 # Volunteers endpoints
 @volunteers_router.get("/{instance_id}", response_model=List[Volunteer])
-async def list_volunteers(instance_id: str):
+def list_volunteers(instance_id: str):
     """
     List all volunteers for a specific instance.
     
@@ -526,12 +1323,12 @@ async def list_volunteers(instance_id: str):
         List of volunteers and their roles
     """
     try:
-        return breeze_api.list_volunteers(instance_id)
+        return serialization.list_response(breeze_api.list_volunteers(instance_id), Volunteer)
     except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+        raise upstream_error(e)
 
 @volunteers_router.post("/{instance_id}")
-async def add_volunteer(instance_id: str, person_id: str):
+def add_volunteer(instance_id: str, person_id: str):
     """
     Add a volunteer to a specific instance.
     
@@ -545,10 +1342,10 @@ async def add_volunteer(instance_id: str, person_id: str):
     try:
         return breeze_api.add_volunteer(instance_id, person_id)
     except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+        raise upstream_error(e)
 
 @volunteers_router.delete("/{instance_id}/{person_id}")
-async def remove_volunteer(instance_id: str, person_id: str):
+def remove_volunteer(instance_id: str, person_id: str):
     """
     Remove a volunteer from a specific instance.
     
@@ -562,10 +1359,10 @@ async def remove_volunteer(instance_id: str, person_id: str):
     try:
         return breeze_api.remove_volunteer(instance_id, person_id)
     except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+        raise upstream_error(e)
 
 @volunteers_router.put("/{instance_id}/{person_id}")
-async def update_volunteer(instance_id: str, person_id: str, role_ids_json: str):
+def update_volunteer(instance_id: str, person_id: str, role_ids_json: str):
     """
     Update a volunteer's roles for a specific instance.
     
@@ -580,10 +1377,10 @@ async def update_volunteer(instance_id: str, person_id: str, role_ids_json: str)
     try:
         return breeze_api.update_volunteer(instance_id, person_id, role_ids_json)
     except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+        raise upstream_error(e)
 
 @volunteers_router.get("/{instance_id}/roles", response_model=List[VolunteerRole])
-async def list_volunteer_roles(instance_id: str, show_quantity: bool = False):
+def list_volunteer_roles(request: Request, instance_id: str, show_quantity: bool = False):
     """
     List all volunteer roles for a specific instance.
     
@@ -595,12 +1392,15 @@ async def list_volunteer_roles(instance_id: str, show_quantity: bool = False):
         List of volunteer roles
     """
     try:
-        return breeze_api.list_volunteer_roles(instance_id, show_quantity)
+        return http_cache.conditional_json(
+            request, *volunteer_roles_source(instance_id, show_quantity),
+            render=lambda roles: serialization.render_list(roles, VolunteerRole),
+        )
     except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+        raise upstream_error(e)
 
 @volunteers_router.post("/{instance_id}/roles")
-async def add_volunteer_role(instance_id: str, name: str, quantity: int = 1):
+def add_volunteer_role(instance_id: str, name: str, quantity: int = 1):
     """
     Add a new volunteer role to a specific instance.
     
@@ -613,12 +1413,14 @@ async def add_volunteer_role(instance_id: str, name: str, quantity: int = 1):
         Created role information
     """
     try:
-        return breeze_api.add_volunteer_role(instance_id, name, quantity)
+        role = breeze_api.add_volunteer_role(instance_id, name, quantity)
+        cache.invalidate("volunteer_roles")
+        return role
     except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+        raise upstream_error(e)
 
 @volunteers_router.delete("/{instance_id}/roles/{role_id}")
-async def remove_volunteer_role(instance_id: str, role_id: str):
+def remove_volunteer_role(instance_id: str, role_id: str):
     """
     Remove a volunteer role from a specific instance.
     
@@ -630,9 +1432,83 @@ async def remove_volunteer_role(instance_id: str, role_id: str):
         Success or failure message
     """
     try:
-        return breeze_api.remove_volunteer_role(instance_id, role_id)
+        result = breeze_api.remove_volunteer_role(instance_id, role_id)
+        cache.invalidate("volunteer_roles")
+        return result
     except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+        raise upstream_error(e)
+
+# Admin endpoints
+@admin_router.get("/profiles", dependencies=[Depends(require_admin)])
+def list_profiles():
+    """
+    List stored request profiles, newest first.
+
+    Profiles are recorded when a request sends `X-Profile: cprofile` (deterministic)
+    or `X-Profile: sample` (stack sampling) with a valid `X-Admin-Token`, or at
+    random when profile_sample_rate is set. The profile ID is returned in the
+    `X-Profile-Id` response header.
+
+    Returns:
+        List of profile summaries with id, mode, method, path, status and duration
+    """
+    return profile_store.list()
+
+@admin_router.get("/profiles/{profile_id}", dependencies=[Depends(require_admin)])
+def get_profile(profile_id: str, format: Literal["raw", "text"] = "raw"):
+    """
+    Download a stored request profile.
+
+    Parameters:
+    - **profile_id**: ID from the `X-Profile-Id` response header
+    - **format**: `raw` for the .pstats dump or .collapsed stacks file, `text` for a
+        readable summary of the top functions by cumulative time (cProfile only)
+
+    Returns:
+        The profile file, or a plain text summary
+    """
+    meta = profile_store.get(profile_id)
+    if meta is None:
+        raise HTTPException(status_code=404, detail="Profile not found")
+    suffix = profiling.FILE_SUFFIXES[meta["mode"]]
+    path = profile_store.path(profile_id, suffix)
+    if format == "text" and meta["mode"] == "cprofile":
+        return PlainTextResponse(profiling.pstats_summary(path))
+    return FileResponse(path, filename=f"{profile_id}.{suffix}")
+
+@admin_router.get("/checkins", dependencies=[Depends(require_admin)])
+def get_checkin_queue(state: str = checkin_queue.FAILED, limit: int = 100):
+    """
+    Inspect the check-in queue.
+
+    Parameters:
+    - **state**: Which items to list: pending, sending, done, failed, cancelled or checked_out
+    - **limit**: Maximum number of items to list
+
+    Returns:
+        Item counts by tenant and state, and the oldest items in the requested state
+        with their attempts and last error
+    """
+    if checkins is None:
+        raise HTTPException(status_code=404, detail="Check-in queue is not enabled")
+    if state not in checkin_queue.STATES:
+        raise HTTPException(status_code=422, detail=f"state must be one of {', '.join(checkin_queue.STATES)}")
+    return {"backlog": checkins.backlog(), "items": checkins.items(state, limit)}
+
+@admin_router.post("/checkins/{checkin_id}/retry", dependencies=[Depends(require_admin)])
+def retry_checkin(checkin_id: int):
+    """
+    Put a failed check-in back in the queue.
+
+    Parameters:
+    - **checkin_id**: Queue id of the failed item
+
+    Returns:
+        True once the item is queued again
+    """
+    if checkins is None or not checkins.retry(checkin_id):
+        raise HTTPException(status_code=404, detail="Failed check-in not found")
+    return True
 
 # Include all routers
 app.include_router(people_router)
@@ -643,7 +1519,14 @@ app.include_router(tags_router)
 app.include_router(forms_router)
 app.include_router(volunteers_router)
 app.include_router(profile_router)
+app.include_router(admin_router)
 
 if __name__ == "__main__":
     import uvicorn
-    uvicorn.run(app, host="0.0.0.0", port=8000)
+    if workers.WORKERS > 1:
+        # Hand over to the uvicorn command: worker processes are spawned and would run this file again as
+        # __mp_main__ on top of importing main:app, registering everything twice
+        os.execvp(sys.executable, [sys.executable, "-m", "uvicorn", "main:app", "--host", "0.0.0.0", "--port", "8000",
+                                   "--workers", str(workers.WORKERS)])
+    else:
+        uvicorn.run(app, host="0.0.0.0", port=8000)
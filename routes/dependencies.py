@@ -1,12 +1,8 @@
-from pyBreezeChMS.breeze.breeze import BreezeApi
-import os
+from services.tenants import TenantPool, TenantProxy, load_tenant_configs
 from dotenv import load_dotenv
 
 # Load environment variables
 load_dotenv()
 
-# Initialize Breeze API
-breeze_api = BreezeApi(
-    breeze_url=os.getenv('breeze_url'),
-    api_key=os.getenv('api_key')
-)
+# Initialize one Breeze API client per tenant; breeze_api calls the current request's tenant
+breeze_api = TenantProxy(TenantPool(load_tenant_configs()))
@@ -0,0 +1,231 @@
+import json
+import math
+import os
+import re
+import threading
+from collections import OrderedDict
+from contextvars import ContextVar
+from typing import Any, Dict, Optional, Tuple
+from urllib.parse import parse_qs
+
+from starlette.responses import JSONResponse
+
+from .tenants import RateLimitExceeded, RateLimiter, wait_budget
+
+# Route classes, each with its own concurrency cap and wait budget
+CHECKIN = "checkin"
+READ = "read"
+WRITE = "write"
+HEAVY = "heavy"
+ROUTE_CLASSES = (CHECKIN, READ, WRITE, HEAVY)
+# Requests that are never limited: probes, metrics, docs and admin endpoints
+EXEMPT = "exempt"
+
+API_KEY_HEADER = b"x-api-key"
+CHECKIN_PATH = re.compile(r"^/events/[^/]+/check-(in|out)/")
+# Reads that fan out into many or large Breeze calls, or a lot of local work
+HEAVY_PATH = re.compile(r"^/(batch|people/duplicates|forms/[^/]+/export|campaigns/[^/]+/progress)/?$")
+EXEMPT_PATHS = {"/", "/ready", "/metrics", "/docs", "/docs/oauth2-redirect", "/redoc", "/openapi.json"}
+
+# Client buckets kept; the least recently seen client is dropped beyond this
+MAX_CLIENTS = 10000
+
+# Route class of the request being handled (None outside a request, e.g. background jobs)
+current_route_class: ContextVar[Optional[str]] = ContextVar("current_route_class", default=None)
+
+
+def route_class(method: str, path: str, query_string: bytes = b"") -> str:
+    """Classify a request by method and (tenant-stripped) path."""
+    if path in EXEMPT_PATHS or path.startswith("/admin/"):
+        return EXEMPT
+    if CHECKIN_PATH.match(path):
+        return CHECKIN
+    if HEAVY_PATH.match(path):
+        return HEAVY
+    if method not in ("GET", "HEAD"):
+        return WRITE
+    if path.rstrip("/") == "/people":
+        details = parse_qs(query_string.decode("latin-1")).get("details", [""])[-1]
+        if details.lower() in ("1", "true", "yes"):
+            return HEAVY
+    return READ
+
+
+class ClientQuotas:
+    """
+    Per-client token buckets for inbound requests.
+
+    Clients are identified by their X-API-Key header, or by address when they
+    send none. Every client gets `rate` requests per second with bursts of
+    `burst`, unless `overrides` (keyed by API key) gives it its own
+    `rate_limit` and `burst`; a rate of 0 means unlimited. Unlike the upstream
+    limiter, requests over quota are rejected at once rather than queued.
+    """
+
+    def __init__(self, rate: float = 0.0, burst: Optional[float] = None,
+                 overrides: Optional[Dict[str, Dict[str, Any]]] = None, max_clients: int = MAX_CLIENTS):
+        self.rate = rate
+        self.burst = burst
+        self.overrides = overrides or {}
+        self.max_clients = max_clients
+        self._buckets: "OrderedDict[str, Optional[RateLimiter]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _limits(self, client: str) -> Tuple[float, Optional[float]]:
+        override = self.overrides.get(client.partition(":")[2]) if client.startswith("key:") else None
+        if override is not None:
+            return float(override.get("rate_limit", 0)), override.get("burst")
+        return self.rate, self.burst
+
+    def _bucket(self, client: str) -> Optional[RateLimiter]:
+        with self._lock:
+            if client in self._buckets:
+                self._buckets.move_to_end(client)
+                return self._buckets[client]
+            rate, burst = self._limits(client)
+            bucket = self._buckets[client] = RateLimiter(rate, burst, max_wait=0) if rate else None
+            if len(self._buckets) > self.max_clients:
+                self._buckets.popitem(last=False)
+            return bucket
+
+    def take(self, client: str) -> float:
+        """Take one request from a client's quota; returns 0, or the seconds until it has one again."""
+        bucket = self._bucket(client)
+        if bucket is None:
+            return 0.0
+        try:
+            bucket.reserve()
+        except RateLimitExceeded as e:
+            return e.retry_after
+        return 0.0
+
+
+class AdmissionController:
+    """
+    Decides which requests are let in under load.
+
+    - **quotas**: Per-client request rates
+    - **concurrency**: Most requests of each route class handled at once (0 = unlimited)
+    - **wait_budgets**: Longest a request of each class may wait for an upstream
+        rate limit slot before it is shed with 503 (None = the limiter's max_wait)
+
+    Check-ins are by default uncapped and have no wait budget, so when other
+    classes are shed they keep the worker threads and upstream slots left over.
+    """
+
+    def __init__(self, quotas: ClientQuotas, concurrency: Dict[str, int], wait_budgets: Dict[str, Optional[float]]):
+        self.quotas = quotas
+        self.concurrency = concurrency
+        self.wait_budgets = wait_budgets
+        self.in_flight = {name: 0 for name in ROUTE_CLASSES}
+        self.rejected: Dict[Tuple[str, str], int] = {}
+        self._lock = threading.Lock()
+
+    def _reject(self, route: str, reason: str) -> None:
+        with self._lock:
+            self.rejected[(route, reason)] = self.rejected.get((route, reason), 0) + 1
+
+    def admit(self, route: str, client: str) -> Optional[Tuple[int, str, float]]:
+        """Let a request in, or return the (status, detail, retry_after) it is rejected with."""
+        retry_after = self.quotas.take(client)
+        if retry_after:
+            self._reject(route, "quota")
+            return 429, "Client rate limit exceeded", retry_after
+        with self._lock:
+            limit = self.concurrency.get(route, 0)
+            full = bool(limit) and self.in_flight[route] >= limit
+            if not full:
+                self.in_flight[route] += 1
+        if full:
+            self._reject(route, "concurrency")
+            return 503, f"Too many concurrent {route} requests", 1.0
+        return None
+
+    def release(self, route: str) -> None:
+        with self._lock:
+            self.in_flight[route] -= 1
+
+    def shed(self) -> None:
+        """Count the current request as shed because its upstream wait would exceed its budget."""
+        route = current_route_class.get()
+        if route is not None:
+            self._reject(route, "upstream_wait")
+
+
+def client_id(scope: Dict[str, Any]) -> str:
+    for key, value in scope["headers"]:
+        if key == API_KEY_HEADER:
+            return "key:" + value.decode("latin-1")
+    client = scope.get("client")
+    return "addr:" + (client[0] if client else "unknown")
+
+
+def _retry_after(seconds: float) -> str:
+    return str(max(1, math.ceil(seconds)))
+
+
+class AdmissionMiddleware:
+    """
+    ASGI middleware applying the AdmissionController to every request.
+
+    Rejected requests get a fast 429 (client over quota) or 503 (route class
+    at its concurrency cap) with Retry-After, before any work is done. Admitted
+    requests run with their class's wait budget, so a Breeze call that would
+    queue longer than that for a rate limit slot fails with 503 instead of
+    tying up a worker (cached reads are still served). Sub-requests of
+    /batch run inside the admitted /batch request and are not counted again.
+    """
+
+    def __init__(self, app, controller: AdmissionController):
+        self.app = app
+        self.controller = controller
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or current_route_class.get() is not None:
+            await self.app(scope, receive, send)
+            return
+
+        route = route_class(scope["method"], scope["path"], scope.get("query_string", b""))
+        if route == EXEMPT:
+            await self.app(scope, receive, send)
+            return
+        rejection = self.controller.admit(route, client_id(scope))
+        if rejection is not None:
+            status, detail, retry_after = rejection
+            response = JSONResponse({"detail": detail}, status_code=status,
+                                    headers={"Retry-After": _retry_after(retry_after)})
+            await response(scope, receive, send)
+            return
+
+        route_token = current_route_class.set(route)
+        budget_token = wait_budget.set(self.controller.wait_budgets.get(route))
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            wait_budget.reset(budget_token)
+            current_route_class.reset(route_token)
+            self.controller.release(route)
+
+
+def _limit(name: str, default: int) -> int:
+    return int(os.getenv(f'max_concurrent_{name}', default))
+
+
+def open_controller() -> AdmissionController:
+    """Build the AdmissionController from the client_* and max_concurrent_* settings."""
+    overrides = {}
+    path = os.getenv('client_limits_file')
+    if path:
+        with open(path) as f:
+            overrides = json.load(f)
+    burst = float(os.getenv('client_burst', 0)) or None
+    quotas = ClientQuotas(float(os.getenv('client_rate_limit', 0)), burst, overrides)
+    concurrency = {CHECKIN: _limit(CHECKIN, 0), READ: _limit(READ, 24), WRITE: _limit(WRITE, 8), HEAVY: _limit(HEAVY, 4)}
+    budget = float(os.getenv('upstream_wait_budget', 2))
+    wait_budgets: Dict[str, Optional[float]] = {
+        CHECKIN: None,
+        READ: budget or None,
+        WRITE: budget or None,
+        HEAVY: budget / 2 or None,
+    }
+    return AdmissionController(quotas, concurrency, wait_budgets)
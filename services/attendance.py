@@ -0,0 +1,286 @@
+import logging
+import os
+import sqlite3
+import threading
+import time
+from collections import defaultdict
+from datetime import date, timedelta
+from typing import Any, Callable, Dict, Iterable, List, Optional
+
+from .tenants import current_tenant
+
+logger = logging.getLogger(__name__)
+
+PERIODS = ("week", "month")
+
+
+def period_start(day: str, period: str) -> str:
+    """First day (Monday, or the 1st) of the week or month containing a YYYY-MM-DD date."""
+    d = date.fromisoformat(day[:10])
+    if period == "week":
+        return (d - timedelta(days=d.weekday())).isoformat()
+    return d.replace(day=1).isoformat()
+
+
+def fetch_attendance(api: Any, instance_id: str) -> List[Dict[str, Any]]:
+    """
+    Attendance records for one event instance.
+
+    BreezeApi has no wrapper for Breeze's attendance list endpoint, so it is
+    called through the API's generic request method, passed through the
+    UpstreamClient's hooks as `list_attendance`.
+    """
+    def list_attendance(instance_id: str) -> Any:
+        return api.api._request('/api/events/attendance/list', params={'instance_id': instance_id, 'type': 'person'})
+    return api.call("list_attendance", list_attendance, instance_id) or []
+
+
+class AttendanceStore:
+    """
+    Local SQLite store of who attended which event instance.
+
+    Filled by check-ins and check-outs made through this service (via the
+    UpstreamClient hook) and by a background backfill of recent instances
+    from Breeze. Keeps an attendance counter per instance and, per event
+    series, weekly and monthly totals with first-time attendees, so trend
+    queries never call Breeze. Series totals are rebuilt from the attendance
+    rows the first time they are read after a change.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._db = sqlite3.connect(path, isolation_level=None, check_same_thread=False)
+        self._db.executescript(
+            "CREATE TABLE IF NOT EXISTS instances ("
+            " tenant TEXT NOT NULL, instance_id TEXT NOT NULL, series_id TEXT, name TEXT, start_date TEXT,"
+            " backfilled REAL, PRIMARY KEY (tenant, instance_id));"
+            "CREATE INDEX IF NOT EXISTS instances_series ON instances (tenant, series_id);"
+            "CREATE TABLE IF NOT EXISTS attendance ("
+            " tenant TEXT NOT NULL, instance_id TEXT NOT NULL, person_id TEXT NOT NULL,"
+            " PRIMARY KEY (tenant, instance_id, person_id));"
+            "CREATE TABLE IF NOT EXISTS instance_counts ("
+            " tenant TEXT NOT NULL, instance_id TEXT NOT NULL, attendance INTEGER NOT NULL,"
+            " PRIMARY KEY (tenant, instance_id));"
+            "CREATE TABLE IF NOT EXISTS series_periods ("
+            " tenant TEXT NOT NULL, series_id TEXT NOT NULL, period TEXT NOT NULL, period_start TEXT NOT NULL,"
+            " instances INTEGER NOT NULL, attendance INTEGER NOT NULL, first_time INTEGER NOT NULL,"
+            " PRIMARY KEY (tenant, series_id, period, period_start));"
+            "CREATE TABLE IF NOT EXISTS dirty_series (tenant TEXT NOT NULL, series_id TEXT NOT NULL,"
+            " PRIMARY KEY (tenant, series_id));"
+        )
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def _transaction(self, work: Callable[[], Any]) -> Any:
+        with self._lock:
+            self._db.execute("BEGIN IMMEDIATE")
+            try:
+                result = work()
+            except BaseException:
+                self._db.execute("ROLLBACK")
+                raise
+            self._db.execute("COMMIT")
+            return result
+
+    def _mark_dirty(self, tenant: str, instance_id: str) -> None:
+        self._db.execute(
+            "INSERT OR IGNORE INTO dirty_series SELECT tenant, series_id FROM instances "
+            "WHERE tenant = ? AND instance_id = ? AND series_id IS NOT NULL",
+            (tenant, instance_id),
+        )
+
+    def _count(self, tenant: str, instance_id: str, delta: int) -> None:
+        self._db.execute(
+            "INSERT INTO instance_counts VALUES (?, ?, ?) "
+            "ON CONFLICT (tenant, instance_id) DO UPDATE SET attendance = attendance + excluded.attendance",
+            (tenant, instance_id, delta),
+        )
+        self._mark_dirty(tenant, instance_id)
+
+    def record(self, tenant: str, instance_id: str, person_id: str) -> None:
+        """Record one attendance; recording the same person twice has no effect."""
+        def work():
+            added = self._db.execute(
+                "INSERT OR IGNORE INTO attendance VALUES (?, ?, ?)", (tenant, instance_id, person_id)
+            ).rowcount
+            if added:
+                self._count(tenant, instance_id, 1)
+        self._transaction(work)
+
+    def remove(self, tenant: str, instance_id: str, person_id: str) -> None:
+        def work():
+            removed = self._db.execute(
+                "DELETE FROM attendance WHERE tenant = ? AND instance_id = ? AND person_id = ?",
+                (tenant, instance_id, person_id),
+            ).rowcount
+            if removed:
+                self._count(tenant, instance_id, -1)
+        self._transaction(work)
+
+    def upsert_instances(self, tenant: str, events: Iterable[Dict[str, Any]]) -> None:
+        """Store series, name and date of event instances as returned by get_events."""
+        def work():
+            for event in events:
+                start = event.get("start_datetime") or event.get("start_date")
+                self._db.execute(
+                    "INSERT INTO instances (tenant, instance_id, series_id, name, start_date) VALUES (?, ?, ?, ?, ?) "
+                    "ON CONFLICT (tenant, instance_id) DO UPDATE SET series_id = excluded.series_id, "
+                    "name = excluded.name, start_date = excluded.start_date",
+                    (tenant, str(event["id"]), str(event.get("event_id") or event["id"]), event.get("name"),
+                     start[:10] if start else None),
+                )
+                self._mark_dirty(tenant, str(event["id"]))
+        self._transaction(work)
+
+    def replace_instance(self, tenant: str, instance_id: str, person_ids: Iterable[str]) -> None:
+        """Replace the attendance of one instance with the list Breeze returned."""
+        person_ids = set(person_ids)
+
+        def work():
+            self._db.execute("DELETE FROM attendance WHERE tenant = ? AND instance_id = ?", (tenant, instance_id))
+            self._db.executemany("INSERT INTO attendance VALUES (?, ?, ?)",
+                                 [(tenant, instance_id, person_id) for person_id in person_ids])
+            self._db.execute("INSERT OR REPLACE INTO instance_counts VALUES (?, ?, ?)",
+                             (tenant, instance_id, len(person_ids)))
+            self._db.execute("UPDATE instances SET backfilled = ? WHERE tenant = ? AND instance_id = ?",
+                             (time.time(), tenant, instance_id))
+            self._mark_dirty(tenant, instance_id)
+        self._transaction(work)
+
+    def _rebuild_series(self, tenant: str, series_id: str) -> None:
+        instances = self._db.execute(
+            "SELECT instance_id, start_date FROM instances WHERE tenant = ? AND series_id = ? AND start_date IS NOT NULL",
+            (tenant, series_id),
+        ).fetchall()
+        dates = dict(instances)
+        rows = self._db.execute(
+            "SELECT a.instance_id, a.person_id FROM attendance a JOIN instances i "
+            "ON i.tenant = a.tenant AND i.instance_id = a.instance_id "
+            "WHERE a.tenant = ? AND i.series_id = ? AND i.start_date IS NOT NULL",
+            (tenant, series_id),
+        ).fetchall()
+        first_seen: Dict[str, str] = {}
+        for instance_id, person_id in rows:
+            day = dates[instance_id]
+            if person_id not in first_seen or day < first_seen[person_id]:
+                first_seen[person_id] = day
+
+        self._db.execute("DELETE FROM series_periods WHERE tenant = ? AND series_id = ?", (tenant, series_id))
+        for period in PERIODS:
+            totals = defaultdict(lambda: [0, 0, 0])
+            for day in dates.values():
+                totals[period_start(day, period)][0] += 1
+            for instance_id, _ in rows:
+                totals[period_start(dates[instance_id], period)][1] += 1
+            for day in first_seen.values():
+                totals[period_start(day, period)][2] += 1
+            self._db.executemany(
+                "INSERT INTO series_periods VALUES (?, ?, ?, ?, ?, ?, ?)",
+                [(tenant, series_id, period, start, *counts) for start, counts in totals.items()],
+            )
+
+    def _refresh(self, tenant: str) -> None:
+        def work():
+            dirty = self._db.execute("SELECT series_id FROM dirty_series WHERE tenant = ?", (tenant,)).fetchall()
+            for (series_id,) in dirty:
+                self._rebuild_series(tenant, series_id)
+            self._db.execute("DELETE FROM dirty_series WHERE tenant = ?", (tenant,))
+        self._transaction(work)
+
+    def instance_count(self, instance_id: str) -> int:
+        """Attendance count of one instance for the current tenant."""
+        with self._lock:
+            row = self._db.execute(
+                "SELECT attendance FROM instance_counts WHERE tenant = ? AND instance_id = ?",
+                (current_tenant.get(), instance_id),
+            ).fetchone()
+        return row[0] if row else 0
+
+    def series_trend(self, series_id: str, period: str = "week", start_date: Optional[str] = None,
+                     end_date: Optional[str] = None) -> List[Dict[str, Any]]:
+        """Per-period instances, attendance and first-time attendees of a series for the current tenant."""
+        tenant = current_tenant.get()
+        self._refresh(tenant)
+        query = ("SELECT period_start, instances, attendance, first_time FROM series_periods "
+                 "WHERE tenant = ? AND series_id = ? AND period = ?")
+        params: List[Any] = [tenant, series_id, period]
+        if start_date:
+            query += " AND period_start >= ?"
+            params.append(period_start(start_date, period))
+        if end_date:
+            query += " AND period_start <= ?"
+            params.append(end_date[:10])
+        with self._lock:
+            rows = self._db.execute(query + " ORDER BY period_start", params).fetchall()
+        return [{"period_start": start, "instances": instances, "attendance": attendance, "first_time": first_time}
+                for start, instances, attendance, first_time in rows]
+
+    def hook(self, method: str, params: Dict[str, Any], call: Callable[[], Any]) -> Any:
+        """UpstreamClient hook recording check-ins and check-outs that Breeze accepted."""
+        result = call()
+        if result and method in ("event_check_in", "event_check_out"):
+            try:
+                update = self.record if method == "event_check_in" else self.remove
+                update(current_tenant.get(), str(params["event_instance_id"]), str(params["person_id"]))
+            except Exception:
+                logger.exception("Could not record %s in the attendance store", method)
+        return result
+
+    def backfill(self, tenant: str, api: Any, days: int, refetch_days: int = 14) -> int:
+        """
+        Load instances of the last `days` days and their attendance from Breeze.
+
+        Instances already backfilled are skipped unless they fall within the
+        last `refetch_days` days, where late check-ins are still likely.
+        Returns the number of instances whose attendance was fetched.
+        """
+        today = date.today()
+        token = current_tenant.set(tenant)
+        try:
+            events = api.get_events(start_date=(today - timedelta(days=days)).isoformat(), end_date=today.isoformat())
+            self.upsert_instances(tenant, events)
+            with self._lock:
+                due = self._db.execute(
+                    "SELECT instance_id FROM instances WHERE tenant = ? AND start_date <= ? "
+                    "AND (backfilled IS NULL OR start_date >= ?) ORDER BY start_date",
+                    (tenant, today.isoformat(), (today - timedelta(days=refetch_days)).isoformat()),
+                ).fetchall()
+            for (instance_id,) in due:
+                if self._stop.is_set():
+                    break
+                records = fetch_attendance(api, instance_id)
+                self.replace_instance(tenant, instance_id, [str(r["person_id"]) for r in records if r.get("person_id")])
+            return len(due)
+        finally:
+            current_tenant.reset(token)
+
+    def start(self, tenants: Iterable[str], client: Callable[[str], Any], days: int, interval: float) -> None:
+        """Start a background thread backfilling every tenant now and then every `interval` seconds."""
+        tenants = list(tenants)
+
+        def run():
+            while not self._stop.is_set():
+                for tenant in tenants:
+                    try:
+                        self.backfill(tenant, client(tenant), days)
+                    except Exception:
+                        logger.exception("Attendance backfill failed for tenant %s", tenant)
+                self._stop.wait(interval)
+
+        self._stop.clear()
+        self._thread = threading.Thread(target=run, name="attendance-backfill", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float = 10.0) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+
+
+def open_store() -> Optional[AttendanceStore]:
+    """Open the store if attendance_store is enabled, else return None."""
+    if os.getenv('attendance_store', 'false').lower() not in ('1', 'true', 'yes'):
+        return None
+    return AttendanceStore(os.getenv('attendance_db', 'attendance.sqlite3'))
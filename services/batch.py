@@ -0,0 +1,81 @@
+import asyncio
+from typing import Any, Dict, List, Optional, Tuple
+
+import orjson
+
+from .tenants import TENANT_HEADER, current_tenant
+
+# Sub-request headers that are ignored: the tenant comes from the outer request and bodies are not compressed
+DROPPED_HEADERS = {"accept-encoding", "content-length", "content-type", "host", TENANT_HEADER}
+
+
+async def call(app, root_scope: Dict[str, Any], method: str, path: str,
+               headers: Optional[Dict[str, str]] = None) -> Dict[str, Any]:
+    """
+    Run one sub-request through the ASGI app in-process and collect its response.
+
+    The sub-request goes through the same middleware and routes as a real
+    request, for the tenant of the outer request, so it shares the cache and
+    its single-flight loads. Its body is decoded from JSON when possible.
+    """
+    path, _, query = path.partition("?")
+    request_headers = [(b"host", b"batch"), (TENANT_HEADER.encode(), current_tenant.get().encode())]
+    request_headers += [(name.lower().encode("latin-1"), value.encode("latin-1"))
+                        for name, value in (headers or {}).items() if name.lower() not in DROPPED_HEADERS]
+    scope = {
+        "type": "http",
+        "asgi": root_scope.get("asgi", {"version": "3.0"}),
+        "http_version": root_scope.get("http_version", "1.1"),
+        "method": method,
+        "scheme": root_scope.get("scheme", "http"),
+        "path": path,
+        "raw_path": path.encode(),
+        "root_path": root_scope.get("root_path", ""),
+        "query_string": query.encode(),
+        "headers": request_headers,
+        "client": root_scope.get("client"),
+        "server": root_scope.get("server"),
+    }
+    received = False
+    never = asyncio.Event()
+    status = 500
+    response_headers: List[Tuple[bytes, bytes]] = []
+    chunks: List[bytes] = []
+
+    async def receive():
+        nonlocal received
+        if not received:
+            received = True
+            return {"type": "http.request", "body": b"", "more_body": False}
+        # Streaming responses listen for a disconnect; the in-process client never goes away
+        await never.wait()
+        return {"type": "http.disconnect"}
+
+    async def send(message):
+        nonlocal status, response_headers
+        if message["type"] == "http.response.start":
+            status = message["status"]
+            response_headers = message.get("headers", [])
+        elif message["type"] == "http.response.body":
+            chunks.append(message.get("body", b""))
+
+    await app(scope, receive, send)
+    body = b"".join(chunks)
+    result_headers = {k.decode("latin-1"): v.decode("latin-1") for k, v in response_headers if k != b"content-length"}
+    try:
+        content = orjson.loads(body) if body else None
+    except orjson.JSONDecodeError:
+        content = body.decode("utf-8", errors="replace")
+    return {"status": status, "headers": result_headers, "body": content}
+
+
+async def run(app, root_scope: Dict[str, Any], requests: List[Dict[str, Any]], concurrency: int) -> List[Dict[str, Any]]:
+    """Run sub-requests concurrently, at most `concurrency` at a time, returning results in request order."""
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one(item: Dict[str, Any]) -> Dict[str, Any]:
+        async with semaphore:
+            result = await call(app, root_scope, item["method"], item["path"], item.get("headers"))
+        return {"id": item.get("id"), **result}
+
+    return await asyncio.gather(*(one(item) for item in requests))
@@ -0,0 +1,200 @@
+import itertools
+import os
+import threading
+import time
+from collections import Counter, OrderedDict
+from typing import Any, Callable, Dict, Hashable, NamedTuple, Optional, Tuple
+
+from .tenants import current_tenant
+
+
+class CacheEntry(NamedTuple):
+    expires_at: float
+    value: Any
+    # Unique per stored value; changes whenever the key is refilled
+    version: int
+    # True when an expired entry is served because reloading it failed
+    stale: bool = False
+
+
+class _Flight:
+    """A load in progress, which concurrent misses on the same key wait for."""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.entry: Optional[CacheEntry] = None
+        self.error: Optional[BaseException] = None
+
+
+class TTLCache:
+    """
+    Thread-safe in-memory cache for upstream Breeze reads.
+
+    Entries expire after `ttl` seconds. Keys are tuples whose first element is
+    a namespace (e.g. "form_fields") so whole groups can be invalidated at once.
+    When `scope` is given, every key is stored under the value it returns (the
+    current tenant), so each scope has its own independent set of entries.
+
+    Loads are single-flight: concurrent misses on the same key wait for one
+    call to `loader` and share its result (or its exception).
+
+    Expired entries are kept for another `stale_ttl` seconds. If reloading one
+    fails (Breeze is down, or its circuit is open), get_or_load_entry returns
+    the old value marked stale instead of raising.
+
+    At most `max_entries` entries are kept (0 = unlimited). Beyond that,
+    entries past their stale window are purged, then the least recently used
+    are evicted, so keys built from request parameters cannot grow the cache
+    without bound.
+    """
+
+    def __init__(self, ttl: float = 300.0, scope: Optional[Callable[[], Hashable]] = None, stale_ttl: float = 0.0,
+                 max_entries: int = 0):
+        self.ttl = ttl
+        self.scope = scope
+        self.stale_ttl = stale_ttl
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[Tuple[Hashable, Hashable], CacheEntry]" = OrderedDict()
+        self._next_purge = 0.0
+        self._flights: Dict[Tuple[Hashable, Hashable], _Flight] = {}
+        self._lock = threading.Lock()
+        self._versions = itertools.count(1)
+        # Lookup counts keyed by (namespace, "hit" | "miss" | "stale" | "coalesced")
+        self.stats: Counter = Counter()
+        # Entries dropped to stay within max_entries, by namespace
+        self.evictions: Counter = Counter()
+
+    def _scoped(self, key: Hashable) -> Tuple[Hashable, Hashable]:
+        return (self.scope() if self.scope else None, key)
+
+    def get_entry(self, key: Hashable) -> Optional[CacheEntry]:
+        """Return the live entry for a key, or None if it is missing or expired."""
+        scoped = self._scoped(key)
+        with self._lock:
+            entry = self._entries.get(scoped)
+            if entry is not None and entry.expires_at < time.monotonic():
+                if entry.expires_at + self.stale_ttl < time.monotonic():
+                    del self._entries[scoped]
+                entry = None
+            elif entry is not None:
+                self._entries.move_to_end(scoped)
+            self.stats[(key[0], "miss" if entry is None else "hit")] += 1
+            return entry
+
+    def get_stale_entry(self, key: Hashable) -> Optional[CacheEntry]:
+        """Return an expired entry still within its stale window, marked stale, or None."""
+        with self._lock:
+            entry = self._entries.get(self._scoped(key))
+            if entry is None or entry.expires_at + self.stale_ttl < time.monotonic():
+                return None
+            self.stats[(key[0], "stale")] += 1
+            return entry._replace(stale=True)
+
+    def get(self, key: Hashable) -> Tuple[bool, Any]:
+        """Return (hit, value) for a key, treating expired entries as misses."""
+        entry = self.get_entry(key)
+        if entry is None:
+            return False, None
+        return True, entry.value
+
+    def stats_snapshot(self) -> Dict[Tuple[str, str], int]:
+        with self._lock:
+            return dict(self.stats)
+
+    def evictions_snapshot(self) -> Dict[str, int]:
+        with self._lock:
+            return dict(self.evictions)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def set(self, key: Hashable, value: Any, ttl: Optional[float] = None) -> CacheEntry:
+        expires_at = time.monotonic() + (self.ttl if ttl is None else ttl)
+        scoped = self._scoped(key)
+        with self._lock:
+            entry = self._entries[scoped] = CacheEntry(expires_at, value, next(self._versions))
+            self._entries.move_to_end(scoped)
+            if self.max_entries and len(self._entries) > self.max_entries:
+                self._shrink()
+        return entry
+
+    def _shrink(self) -> None:
+        """Drop entries past their stale window (at most once per ttl), then the least recently used."""
+        now = time.monotonic()
+        if now >= self._next_purge:
+            self._next_purge = now + self.ttl
+            for key in [k for k, e in self._entries.items() if e.expires_at + self.stale_ttl < now]:
+                del self._entries[key]
+                self.evictions[key[1][0]] += 1
+        while len(self._entries) > self.max_entries:
+            key, _ = self._entries.popitem(last=False)
+            self.evictions[key[1][0]] += 1
+
+    def _load(self, key: Hashable, loader: Callable[[], Any], ttl: Optional[float]) -> CacheEntry:
+        scoped = self._scoped(key)
+        with self._lock:
+            flight = self._flights.get(scoped)
+            leader = flight is None
+            if leader:
+                flight = self._flights[scoped] = _Flight()
+            else:
+                self.stats[(key[0], "coalesced")] += 1
+        if not leader:
+            flight.done.wait()
+            if flight.error is not None:
+                raise flight.error
+            return flight.entry
+        try:
+            flight.entry = self.set(key, loader(), ttl)
+            return flight.entry
+        except BaseException as e:
+            flight.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._flights[scoped]
+            flight.done.set()
+
+    def get_or_load_entry(self, key: Hashable, loader: Callable[[], Any], ttl: Optional[float] = None) -> CacheEntry:
+        """
+        Return the cache entry for a key, calling `loader` to fill it on a miss.
+
+        If the loader raises and an expired entry is still within its stale
+        window, that entry is returned with `stale=True` instead.
+        """
+        entry = self.get_entry(key)
+        if entry is None:
+            try:
+                entry = self._load(key, loader, ttl)
+            except Exception:
+                entry = self.get_stale_entry(key)
+                if entry is None:
+                    raise
+        return entry
+
+    def get_or_load(self, key: Hashable, loader: Callable[[], Any], ttl: Optional[float] = None) -> Any:
+        """Return the cached value for a key, calling `loader` to fill it on a miss."""
+        return self.get_or_load_entry(key, loader, ttl).value
+
+    def delete(self, key: Hashable) -> None:
+        scoped = self._scoped(key)
+        with self._lock:
+            self._entries.pop(scoped, None)
+
+    def invalidate(self, namespace: Optional[str] = None) -> None:
+        """Drop every entry, or only the current scope's entries in one namespace."""
+        with self._lock:
+            if namespace is None:
+                self._entries.clear()
+            else:
+                scope = self.scope() if self.scope else None
+                for key in [k for k in self._entries if k[0] == scope and k[1][0] == namespace]:
+                    del self._entries[key]
+
+
+cache = TTLCache(
+    ttl=float(os.getenv('cache_ttl', 300)),
+    scope=current_tenant.get,
+    stale_ttl=float(os.getenv('cache_stale_ttl', 86400)),
+    max_entries=int(os.getenv('cache_max_entries', 10000)),
+)
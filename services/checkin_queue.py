@@ -0,0 +1,270 @@
+import logging
+import os
+import random
+import sqlite3
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional
+
+from .circuit import CircuitOpen
+from .tenants import RateLimitExceeded, current_tenant
+
+logger = logging.getLogger(__name__)
+
+CHECK_IN = "check_in"
+CHECK_OUT = "check_out"
+
+PENDING = "pending"      # waiting to be sent to Breeze
+SENDING = "sending"      # claimed by a flusher
+DONE = "done"            # accepted by Breeze
+FAILED = "failed"        # gave up after max_attempts; see last_error
+CANCELLED = "cancelled"  # checked out again before it was sent
+CHECKED_OUT = "checked_out"  # sent, then undone by a later check-out
+STATES = (PENDING, SENDING, DONE, FAILED, CANCELLED, CHECKED_OUT)
+
+
+class CheckInQueue:
+    """
+    Durable SQLite queue of check-ins waiting to be sent to Breeze.
+
+    Check-ins are acknowledged as soon as they are stored and sent by a
+    background flusher in the order they arrived, through the tenant's rate
+    limited client. A check-in for a person and event instance that is already
+    queued or sent is not queued again. A check-out of a check-in that has not
+    been sent yet cancels it locally; a check-out of one that is being sent is
+    queued behind it. Calls that keep failing are retried with backoff up to
+    `max_attempts` times, then kept as failed for inspection.
+    """
+
+    def __init__(self, path: str, max_attempts: int = 5, batch_size: int = 50, retention: float = 86400.0):
+        self.path = path
+        self.max_attempts = max_attempts
+        self.batch_size = batch_size
+        self.retention = retention
+        self._db = sqlite3.connect(path, isolation_level=None, check_same_thread=False)
+        self._db.row_factory = sqlite3.Row
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS checkins ("
+            "id INTEGER PRIMARY KEY AUTOINCREMENT, tenant TEXT NOT NULL, person_id TEXT NOT NULL, "
+            "event_instance_id TEXT NOT NULL, action TEXT NOT NULL, state TEXT NOT NULL, "
+            "attempts INTEGER NOT NULL DEFAULT 0, last_error TEXT, "
+            "created REAL NOT NULL, updated REAL NOT NULL, next_attempt REAL NOT NULL)"
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS checkins_state ON checkins (state, next_attempt, id)")
+        self._db.execute("CREATE INDEX IF NOT EXISTS checkins_pair ON checkins (tenant, event_instance_id, person_id)")
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def _transaction(self, work: Callable[[], Any]) -> Any:
+        with self._lock:
+            self._db.execute("BEGIN IMMEDIATE")
+            try:
+                result = work()
+            except BaseException:
+                self._db.execute("ROLLBACK")
+                raise
+            self._db.execute("COMMIT")
+            return result
+
+    def _latest(self, tenant: str, person_id: str, event_instance_id: str) -> Optional[sqlite3.Row]:
+        """Most recent queued, in-flight or sent item for a person and event instance."""
+        return self._db.execute(
+            "SELECT * FROM checkins WHERE tenant = ? AND person_id = ? AND event_instance_id = ? "
+            "AND state IN (?, ?, ?) ORDER BY id DESC LIMIT 1",
+            (tenant, person_id, event_instance_id, PENDING, SENDING, DONE),
+        ).fetchone()
+
+    def _insert(self, tenant: str, person_id: str, event_instance_id: str, action: str) -> int:
+        now = time.time()
+        return self._db.execute(
+            "INSERT INTO checkins (tenant, person_id, event_instance_id, action, state, created, updated, next_attempt) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+            (tenant, person_id, event_instance_id, action, PENDING, now, now, now),
+        ).lastrowid
+
+    def check_in(self, person_id: str, event_instance_id: str) -> Dict[str, Any]:
+        """Queue a check-in for the current tenant; returns its queue id and whether it was a duplicate."""
+        tenant = current_tenant.get()
+
+        def work():
+            latest = self._latest(tenant, person_id, event_instance_id)
+            if latest is not None and latest["action"] == CHECK_IN:
+                return {"queued": True, "id": latest["id"], "duplicate": True}
+            return {"queued": True, "id": self._insert(tenant, person_id, event_instance_id, CHECK_IN),
+                    "duplicate": False}
+
+        result = self._transaction(work)
+        self._wake.set()
+        return result
+
+    def check_out(self, person_id: str, event_instance_id: str, send: Callable[[], Any]) -> Any:
+        """
+        Reconcile a check-out with the queue.
+
+        Cancels a check-in that has not been sent yet and queues the check-out
+        behind one that is being sent. Otherwise calls `send` to check out in
+        Breeze directly and marks any sent check-in as checked out.
+        """
+        tenant = current_tenant.get()
+
+        def work():
+            latest = self._latest(tenant, person_id, event_instance_id)
+            if latest is None or latest["state"] == DONE:
+                return False, latest
+            if latest["action"] == CHECK_IN and latest["state"] == PENDING:
+                self._set_state(latest["id"], CANCELLED)
+            elif latest["action"] == CHECK_IN:
+                self._insert(tenant, person_id, event_instance_id, CHECK_OUT)
+            return True, None
+
+        handled, latest = self._transaction(work)
+        if handled:
+            self._wake.set()
+            return True
+        result = send()
+        if result and latest is not None and latest["action"] == CHECK_IN:
+            self._transaction(lambda: self._set_state(latest["id"], CHECKED_OUT))
+        return result
+
+    def _set_state(self, checkin_id: int, state: str, error: Optional[str] = None,
+                   next_attempt: Optional[float] = None, attempted: bool = False) -> None:
+        now = time.time()
+        self._db.execute(
+            "UPDATE checkins SET state = ?, last_error = COALESCE(?, last_error), updated = ?, "
+            "next_attempt = COALESCE(?, next_attempt), attempts = attempts + ? WHERE id = ?",
+            (state, error, now, next_attempt, 1 if attempted else 0, checkin_id),
+        )
+
+    def claim(self) -> List[sqlite3.Row]:
+        """Take the next batch of due items, oldest first, marking them as being sent."""
+        def work():
+            rows = self._db.execute(
+                "SELECT * FROM checkins WHERE state = ? AND next_attempt <= ? ORDER BY id LIMIT ?",
+                (PENDING, time.time(), self.batch_size),
+            ).fetchall()
+            for row in rows:
+                self._set_state(row["id"], SENDING)
+            return rows
+        return self._transaction(work)
+
+    def send(self, row: sqlite3.Row, client: Callable[[str], Any]) -> None:
+        """Send one claimed item to Breeze through the tenant's client and record the outcome."""
+        api = client(row["tenant"])
+        token = current_tenant.set(row["tenant"])
+        try:
+            if row["action"] == CHECK_IN:
+                ok = api.event_check_in(row["person_id"], row["event_instance_id"])
+            else:
+                ok = api.event_check_out(row["person_id"], row["event_instance_id"])
+            if not ok:
+                raise RuntimeError(f"Breeze rejected {row['action']}")
+        except (RateLimitExceeded, CircuitOpen) as e:
+            # Breeze was not called: try again later without using up an attempt
+            self._transaction(lambda: self._set_state(row["id"], PENDING, str(e), time.time() + e.retry_after))
+            return
+        except Exception as e:
+            logger.warning("Check-in queue item %s failed: %s", row["id"], e)
+            attempts = row["attempts"] + 1
+            state = FAILED if attempts >= self.max_attempts else PENDING
+            delay = random.uniform(0, min(300, 2 ** attempts))
+            self._transaction(lambda: self._set_state(row["id"], state, str(e), time.time() + delay, attempted=True))
+            return
+        finally:
+            current_tenant.reset(token)
+
+        def work():
+            self._set_state(row["id"], DONE, attempted=True)
+            if row["action"] == CHECK_OUT:
+                self._db.execute(
+                    "UPDATE checkins SET state = ? WHERE tenant = ? AND person_id = ? AND event_instance_id = ? "
+                    "AND action = ? AND state = ? AND id < ?",
+                    (CHECKED_OUT, row["tenant"], row["person_id"], row["event_instance_id"], CHECK_IN, DONE, row["id"]),
+                )
+        self._transaction(work)
+
+    def flush(self, client: Callable[[str], Any]) -> int:
+        """Send every item that is due; returns how many were sent or attempted."""
+        count = 0
+        while not self._stop.is_set():
+            rows = self.claim()
+            if not rows:
+                break
+            for row in rows:
+                self.send(row, client)
+            count += len(rows)
+        return count
+
+    def _prune(self) -> None:
+        self._transaction(lambda: self._db.execute(
+            "DELETE FROM checkins WHERE state IN (?, ?, ?) AND updated < ?",
+            (DONE, CANCELLED, CHECKED_OUT, time.time() - self.retention),
+        ))
+
+    def start(self, client: Callable[[str], Any], interval: float = 1.0) -> None:
+        """Start the background flusher thread."""
+        # Items claimed by a process that died mid-send go back in the queue
+        self._transaction(lambda: self._db.execute(
+            "UPDATE checkins SET state = ? WHERE state = ? AND updated < ?", (PENDING, SENDING, time.time() - 300)
+        ))
+
+        def run():
+            while not self._stop.is_set():
+                try:
+                    self.flush(client)
+                    self._prune()
+                except Exception:
+                    logger.exception("Check-in queue flush failed")
+                self._wake.wait(interval)
+                self._wake.clear()
+
+        self._stop.clear()
+        self._thread = threading.Thread(target=run, name="checkin-queue", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float = 10.0) -> None:
+        self._stop.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+
+    def backlog(self) -> Dict[str, Dict[str, int]]:
+        """Count queued items by tenant and state."""
+        with self._lock:
+            rows = self._db.execute("SELECT tenant, state, COUNT(*) FROM checkins GROUP BY tenant, state").fetchall()
+        backlog: Dict[str, Dict[str, int]] = {}
+        for tenant, state, count in rows:
+            backlog.setdefault(tenant, {})[state] = count
+        return backlog
+
+    def items(self, state: str, limit: int = 100) -> List[Dict[str, Any]]:
+        """List queued items in one state, oldest first."""
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT * FROM checkins WHERE state = ? ORDER BY id LIMIT ?", (state, limit)
+            ).fetchall()
+        return [dict(row) for row in rows]
+
+    def retry(self, checkin_id: int) -> bool:
+        """Put a failed item back in the queue; returns False if there is no such failed item."""
+        def work():
+            return self._db.execute(
+                "UPDATE checkins SET state = ?, attempts = 0, next_attempt = ? WHERE id = ? AND state = ?",
+                (PENDING, time.time(), checkin_id, FAILED),
+            ).rowcount
+        retried = self._transaction(work) > 0
+        if retried:
+            self._wake.set()
+        return retried
+
+
+def open_queue() -> Optional[CheckInQueue]:
+    """Open the queue if checkin_queue is enabled, else return None."""
+    if os.getenv('checkin_queue', 'false').lower() not in ('1', 'true', 'yes'):
+        return None
+    return CheckInQueue(
+        os.getenv('checkin_queue_db', 'checkins.sqlite3'),
+        max_attempts=int(os.getenv('checkin_queue_max_attempts', 5)),
+    )
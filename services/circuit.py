@@ -0,0 +1,105 @@
+import os
+import threading
+import time
+from typing import Any, Callable, Dict, Optional
+
+from .upstream import is_transient
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class CircuitOpen(Exception):
+    """Raised instead of calling Breeze while a method's circuit is open."""
+
+    def __init__(self, message: str, retry_after: float):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class CircuitBreaker:
+    """
+    Circuit breaker for one upstream method.
+
+    After `failure_threshold` consecutive failures the circuit opens and calls
+    fail immediately with CircuitOpen. Once `reset_timeout` seconds have passed
+    it goes half-open and lets a single probe call through: success closes the
+    circuit, failure opens it for another `reset_timeout`. Calls that succeed
+    but take longer than `slow_call` seconds count as failures, so a hanging
+    upstream trips the breaker as well as a failing one. Only transient errors
+    (see upstream.is_transient) are failures: Breeze rejecting a request, e.g.
+    for an unknown id, shows it is up.
+    """
+
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 30.0, slow_call: float = 10.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.slow_call = slow_call
+        self.state = CLOSED
+        self.failures = 0
+        self._opened_at = 0.0
+        self._probing = False
+        self._lock = threading.Lock()
+
+    def before_call(self) -> bool:
+        """Admit a call or raise CircuitOpen. Returns True if the call is the half-open probe."""
+        with self._lock:
+            if self.state == CLOSED:
+                return False
+            remaining = self._opened_at + self.reset_timeout - time.monotonic()
+            if remaining > 0 or self._probing:
+                raise CircuitOpen("Breeze is unavailable, try again later", retry_after=max(remaining, 1.0))
+            self.state = HALF_OPEN
+            self._probing = True
+            return True
+
+    def record(self, success: bool, probe: bool) -> None:
+        with self._lock:
+            if probe:
+                self._probing = False
+            if success:
+                self.state = CLOSED
+                self.failures = 0
+                return
+            self.failures += 1
+            if probe or self.failures >= self.failure_threshold:
+                self.state = OPEN
+                self._opened_at = time.monotonic()
+
+
+class CircuitBreakers:
+    """
+    A CircuitBreaker per upstream method, usable as an UpstreamClient hook.
+
+    Thresholds default to the circuit_failure_threshold, circuit_reset_timeout
+    and circuit_slow_call settings.
+    """
+
+    def __init__(self, failure_threshold: Optional[int] = None, reset_timeout: Optional[float] = None,
+                 slow_call: Optional[float] = None):
+        self.failure_threshold = failure_threshold or int(os.getenv('circuit_failure_threshold', 5))
+        self.reset_timeout = reset_timeout or float(os.getenv('circuit_reset_timeout', 30))
+        self.slow_call = slow_call or float(os.getenv('circuit_slow_call', 10))
+        self.breakers: Dict[str, CircuitBreaker] = {}
+        self._lock = threading.Lock()
+
+    def breaker(self, method: str) -> CircuitBreaker:
+        with self._lock:
+            breaker = self.breakers.get(method)
+            if breaker is None:
+                breaker = self.breakers[method] = CircuitBreaker(self.failure_threshold, self.reset_timeout, self.slow_call)
+            return breaker
+
+    def hook(self, method: str, params: Dict[str, Any], call: Callable[[], Any]) -> Any:
+        """UpstreamClient hook failing fast while the method's circuit is open."""
+        breaker = self.breaker(method)
+        probe = breaker.before_call()
+        start = time.monotonic()
+        try:
+            result = call()
+        except Exception as e:
+            breaker.record(not is_transient(e) and time.monotonic() - start <= breaker.slow_call, probe)
+            raise
+        breaker.record(time.monotonic() - start <= breaker.slow_call, probe)
+        return result
@@ -0,0 +1,153 @@
+import gzip
+import os
+import zlib
+from typing import Optional
+
+from starlette.datastructures import Headers, MutableHeaders
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# Bodies smaller than this are sent uncompressed
+MINIMUM_SIZE = int(os.getenv('compress_min_size', 1024))
+GZIP_LEVEL = 6
+BROTLI_QUALITY = 5
+
+# Content types worth compressing; everything else (e.g. Parquet) is passed through
+COMPRESSIBLE_TYPES = ("text/", "application/json", "application/xml", "application/javascript")
+
+
+def available_encodings() -> tuple:
+    """Encodings this server can produce, in order of preference."""
+    return ("br", "gzip") if brotli is not None else ("gzip",)
+
+
+def choose_encoding(accept_encoding: Optional[str]) -> Optional[str]:
+    """Pick the preferred encoding the client accepts (q > 0), or None."""
+    if not accept_encoding:
+        return None
+    accepted = set()
+    for part in accept_encoding.split(","):
+        name, _, params = part.strip().partition(";")
+        q = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        if q > 0:
+            accepted.add(name.strip().lower())
+    for encoding in available_encodings():
+        if encoding in accepted or "*" in accepted:
+            return encoding
+    return None
+
+
+def encoded_etag(etag: str, encoding: str) -> str:
+    """
+    ETag of a body's encoded representation: the identity ETag with the encoding appended ('"abc-gzip"').
+
+    Encoded and identity bodies must not share a strong validator (RFC 9110),
+    or caches and Range requests could mix them up.
+    """
+    if not etag.endswith('"'):
+        return etag
+    return f'{etag[:-1]}-{encoding}"'
+
+
+def compress(body: bytes, encoding: str) -> bytes:
+    if encoding == "br":
+        return brotli.compress(body, quality=BROTLI_QUALITY)
+    return gzip.compress(body, compresslevel=GZIP_LEVEL, mtime=0)
+
+
+def _compressible(content_type: str) -> bool:
+    return content_type.startswith(COMPRESSIBLE_TYPES) or content_type.split(";")[0].endswith("+json")
+
+
+class _StreamCompressor:
+    def __init__(self, encoding: str):
+        if encoding == "br":
+            self._compressor = brotli.Compressor(quality=BROTLI_QUALITY)
+            self.process, self.finish = self._compressor.process, self._compressor.finish
+        else:
+            self._compressor = zlib.compressobj(GZIP_LEVEL, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+            self.process, self.finish = self._compressor.compress, self._compressor.flush
+
+
+class CompressionMiddleware:
+    """
+    ASGI middleware compressing responses with brotli (if installed) or gzip.
+
+    Responses under `minimum_size` bytes, responses of non-text content types
+    and responses that already have a Content-Encoding (such as precompressed
+    cached bodies) are sent unchanged. Streaming responses are compressed
+    chunk by chunk. An ETag is given the encoding as a suffix (see encoded_etag).
+    """
+
+    def __init__(self, app, minimum_size: int = MINIMUM_SIZE):
+        self.app = app
+        self.minimum_size = minimum_size
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        encoding = choose_encoding(Headers(scope=scope).get("accept-encoding"))
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+
+        start_message = None
+        compressor: Optional[_StreamCompressor] = None
+        passthrough = False
+
+        async def send_compressed(message):
+            nonlocal start_message, compressor, passthrough
+            if message["type"] == "http.response.start":
+                start_message = message
+                headers = Headers(raw=message["headers"])
+                passthrough = "content-encoding" in headers or not _compressible(headers.get("content-type", ""))
+                return
+            if message["type"] != "http.response.body" or passthrough:
+                if start_message is not None:
+                    await send(start_message)
+                    start_message = None
+                await send(message)
+                return
+
+            body = message.get("body", b"")
+            more_body = message.get("more_body", False)
+            if start_message is not None:
+                headers = MutableHeaders(scope=start_message)
+                if not more_body and len(body) < self.minimum_size:
+                    passthrough = True
+                    await send(start_message)
+                    start_message = None
+                    await send(message)
+                    return
+                headers["Content-Encoding"] = encoding
+                headers.add_vary_header("Accept-Encoding")
+                if "etag" in headers:
+                    headers["ETag"] = encoded_etag(headers["etag"], encoding)
+                if more_body:
+                    del headers["Content-Length"]
+                    compressor = _StreamCompressor(encoding)
+                else:
+                    body = compress(body, encoding)
+                    headers["Content-Length"] = str(len(body))
+                await send(start_message)
+                start_message = None
+                if compressor is None:
+                    await send({"type": "http.response.body", "body": body})
+                    return
+
+            data = compressor.process(body)
+            if not more_body:
+                data += compressor.finish()
+            await send({"type": "http.response.body", "body": data, "more_body": more_body})
+
+        await self.app(scope, receive, send_compressed)
@@ -0,0 +1,186 @@
+import os
+import threading
+import time
+from collections import defaultdict
+from datetime import date, timedelta
+from decimal import Decimal, InvalidOperation
+from typing import Any, Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+from .tenants import current_tenant
+
+
+class Gift(NamedTuple):
+    person_id: str
+    day: str
+    amount: Decimal
+    # (fund_id, amount) for each fund the gift was split across
+    funds: Tuple[Tuple[str, Decimal], ...]
+
+
+def to_decimal(value: Any) -> Decimal:
+    try:
+        return Decimal(str(value or 0).replace(",", ""))
+    except InvalidOperation:
+        return Decimal(0)
+
+
+def _shift(day: str, days: int) -> str:
+    return (date.fromisoformat(day) + timedelta(days=days)).isoformat()
+
+
+def _gift(contribution: Dict[str, Any]) -> Gift:
+    day = str(contribution.get("paid_on") or contribution.get("date") or "")[:10]
+    funds = tuple((str(f.get("fund_id") or f.get("id")), to_decimal(f.get("amount")))
+                  for f in contribution.get("funds") or [])
+    return Gift(str(contribution.get("person_id") or ""), day, to_decimal(contribution.get("amount")), funds)
+
+
+class ContributionLedger:
+    """
+    Local copy of one tenant's contributions, indexed by donor.
+
+    The ledger covers one contiguous date range. Asking for dates outside it
+    fetches only the missing days, in one list_contributions call per side.
+    Once `refresh_interval` seconds have passed, the last `refresh_days` of the
+    range are fetched again and replaced, which picks up gifts entered late,
+    edited or deleted without reloading the whole range.
+    """
+
+    def __init__(self, refresh_interval: float = 300.0, refresh_days: int = 14):
+        self.refresh_interval = refresh_interval
+        self.refresh_days = refresh_days
+        self.start: Optional[str] = None
+        self.end: Optional[str] = None
+        self.refreshed = 0.0
+        self._gifts: Dict[str, Gift] = {}
+        self._by_person: Dict[str, Dict[str, Gift]] = defaultdict(dict)
+        self._lock = threading.Lock()
+        # Held while fetching, so concurrent requests wait for one load instead of repeating it
+        self._loading = threading.Lock()
+
+    def _replace(self, start: str, end: str, contributions: Iterable[Dict[str, Any]]) -> None:
+        with self._lock:
+            for gift_id in [i for i, gift in self._gifts.items() if start <= gift.day <= end]:
+                gift = self._gifts.pop(gift_id)
+                self._by_person[gift.person_id].pop(gift_id, None)
+            for contribution in contributions:
+                gift = _gift(contribution)
+                gift_id = str(contribution.get("id"))
+                self._gifts[gift_id] = gift
+                self._by_person[gift.person_id][gift_id] = gift
+
+    def _windows(self, start: str, end: str) -> List[Tuple[str, str]]:
+        if self.start is None:
+            return [(start, end)]
+        windows = []
+        if start < self.start:
+            windows.append((start, _shift(self.start, -1)))
+        if end > self.end:
+            windows.append((_shift(self.end, 1), end))
+        if time.monotonic() - self.refreshed > self.refresh_interval:
+            recent = max(self.start, _shift(date.today().isoformat(), -self.refresh_days))
+            if recent <= self.end:
+                windows.append((recent, self.end))
+        return windows
+
+    def ensure(self, api: Any, start: str, end: str) -> int:
+        """Make sure the ledger covers start..end (YYYY-MM-DD); returns the number of upstream calls made."""
+        with self._loading:
+            windows = self._windows(start, end)
+            stale = self.start is None or time.monotonic() - self.refreshed > self.refresh_interval
+            for window_start, window_end in windows:
+                self._replace(window_start, window_end,
+                              api.list_contributions(start_date=window_start, end_date=window_end) or [])
+            self.start = min(start, self.start or start)
+            self.end = max(end, self.end or end)
+            if stale:
+                self.refreshed = time.monotonic()
+            return len(windows)
+
+    def invalidate(self) -> None:
+        """Refresh the recent window on the next ensure(), e.g. after a contribution is added."""
+        self.refreshed = 0.0
+
+    def given(self, person_ids: Iterable[str], start: str, end: str,
+              fund_ids: Optional[Iterable[str]] = None) -> Dict[str, Decimal]:
+        """Total given by each person between start and end, optionally only to some funds."""
+        funds = set(fund_ids) if fund_ids else None
+        totals: Dict[str, Decimal] = {}
+        with self._lock:
+            for person_id in person_ids:
+                total = Decimal(0)
+                for gift in self._by_person.get(person_id, {}).values():
+                    if not start <= gift.day <= end:
+                        continue
+                    if funds is None:
+                        total += gift.amount
+                    else:
+                        total += sum((amount for fund_id, amount in gift.funds if fund_id in funds), Decimal(0))
+                totals[person_id] = total
+        return totals
+
+
+class ContributionLedgers:
+    """One ContributionLedger per tenant, created on first use."""
+
+    def __init__(self):
+        self.refresh_interval = float(os.getenv('contribution_refresh_interval', 300))
+        self.refresh_days = int(os.getenv('contribution_refresh_days', 14))
+        self._ledgers: Dict[str, ContributionLedger] = {}
+        self._lock = threading.Lock()
+
+    def ledger(self) -> ContributionLedger:
+        """Ledger of the current request's tenant."""
+        tenant = current_tenant.get()
+        with self._lock:
+            ledger = self._ledgers.get(tenant)
+            if ledger is None:
+                ledger = self._ledgers[tenant] = ContributionLedger(self.refresh_interval, self.refresh_days)
+            return ledger
+
+
+def pledge_list(response: Any) -> Tuple[Dict[str, Any], List[Dict[str, Any]]]:
+    """Split a list_pledges response into the campaign details and its pledges."""
+    if isinstance(response, list):
+        if response and isinstance(response[0], dict) and "pledges" in response[0]:
+            response = response[0]
+        else:
+            return {}, response
+    response = response or {}
+    return {k: v for k, v in response.items() if k != "pledges"}, response.get("pledges") or []
+
+
+def _percent(given: Decimal, pledged: Decimal) -> Optional[float]:
+    return round(float(given / pledged * 100), 1) if pledged else None
+
+
+def pledge_progress(pledges: List[Dict[str, Any]], given: Dict[str, Decimal]) -> Dict[str, Any]:
+    """Per-pledger and total pledged, given, remaining and percent fulfilled, with amounts as strings."""
+    pledged_by_person: Dict[str, Decimal] = defaultdict(Decimal)
+    names: Dict[str, Dict[str, Any]] = {}
+    for pledge in pledges:
+        person_id = str(pledge.get("person_id") or "")
+        pledged_by_person[person_id] += to_decimal(pledge.get("amount"))
+        names.setdefault(person_id, {"first_name": pledge.get("first_name"), "last_name": pledge.get("last_name")})
+
+    rows = []
+    for person_id, pledged in pledged_by_person.items():
+        person_given = given.get(person_id, Decimal(0))
+        rows.append({
+            "person_id": person_id,
+            **names[person_id],
+            "pledged": f"{pledged:.2f}",
+            "given": f"{person_given:.2f}",
+            "remaining": f"{max(pledged - person_given, Decimal(0)):.2f}",
+            "percent_fulfilled": _percent(person_given, pledged),
+        })
+    total_pledged = sum(pledged_by_person.values(), Decimal(0))
+    # Giving beyond a pledge does not count towards other people's pledges
+    total_given = sum((min(given.get(p, Decimal(0)), amount) for p, amount in pledged_by_person.items()), Decimal(0))
+    return {
+        "total_pledged": f"{total_pledged:.2f}",
+        "total_given": f"{total_given:.2f}",
+        "total_remaining": f"{total_pledged - total_given:.2f}",
+        "percent_fulfilled": _percent(total_given, total_pledged),
+        "pledges": rows,
+    }
@@ -0,0 +1,235 @@
+import multiprocessing
+import os
+import re
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
+from difflib import SequenceMatcher
+from itertools import combinations
+from typing import Any, Dict, Iterable, List, NamedTuple, Optional, Set, Tuple
+
+# Selections (see serialization.compile_selector) for the profile fields compared
+CONTACT_FIELDS = ("email.address", "phone.phone_number", "address.street_address", "details.birthdate")
+
+# Name blocks larger than this are skipped: they are too common to tell people apart
+MAX_BLOCK_SIZE = 500
+# Below this many candidate pairs, scoring in worker processes costs more than it saves
+PARALLEL_MIN_PAIRS = 20000
+# Worker processes are started fresh rather than forked: the server's other threads may hold locks a fork would copy
+START_METHOD = "spawn"
+
+CONTACT_REASONS = (("email", "same email"), ("phone", "same phone"),
+                   ("birthdate", "same birthdate"), ("street", "same address"))
+# Most a pair can score from matching first (0.25) and last (0.15) names
+NAME_WEIGHT = 0.4
+
+_SOUNDEX_CODES = {c: str(d) for d, letters in enumerate(
+    ("aeiouyhw", "bfpv", "cgjkqsxz", "dt", "l", "mn", "r")) for c in letters}
+
+
+class PersonRecord(NamedTuple):
+    id: str
+    first_name: str
+    last_name: str
+    email: str
+    phone: str
+    street: str
+    birthdate: str
+
+
+def soundex(name: str) -> str:
+    """American Soundex code of a name (e.g. "Robert" and "Rupert" are both R163)."""
+    letters = [c for c in name.lower() if c.isalpha()]
+    if not letters:
+        return ""
+    code, previous = letters[0].upper(), _SOUNDEX_CODES.get(letters[0], "")
+    for c in letters[1:]:
+        digit = _SOUNDEX_CODES.get(c, "")
+        if digit not in ("", "0") and digit != previous:
+            code += digit
+        if c not in "hw":
+            previous = digit
+    return (code + "000")[:4]
+
+
+def normalize_email(email: Optional[str]) -> str:
+    """Lower-case an address and drop +tags (and dots for Gmail), which all reach the same inbox."""
+    if not email or "@" not in email:
+        return ""
+    local, _, domain = email.strip().lower().rpartition("@")
+    local = local.split("+", 1)[0]
+    if domain in ("gmail.com", "googlemail.com"):
+        local, domain = local.replace(".", ""), "gmail.com"
+    return f"{local}@{domain}"
+
+
+def normalize_phone(phone: Optional[str]) -> str:
+    """Last ten digits of a phone number, ignoring formatting and country code."""
+    digits = re.sub(r"\D", "", phone or "")
+    return digits[-10:] if len(digits) >= 7 else ""
+
+
+def _clean(value: Any) -> str:
+    return " ".join(str(value or "").lower().split())
+
+
+def person_record(person: Dict[str, Any], contact: Dict[str, Any]) -> PersonRecord:
+    """Build the comparison record for a person and the CONTACT_FIELDS selected from their details."""
+    return PersonRecord(
+        id=str(person.get("id")),
+        first_name=_clean(person.get("first_name")),
+        last_name=_clean(person.get("last_name")),
+        email=normalize_email(contact.get("email.address")),
+        phone=normalize_phone(contact.get("phone.phone_number")),
+        street=_clean(contact.get("address.street_address")),
+        birthdate=str(contact.get("details.birthdate") or "")[:10],
+    )
+
+
+def blocking_keys(record: PersonRecord) -> List[str]:
+    """Keys of the blocks a person falls in; only people sharing a block are compared."""
+    keys = []
+    if record.last_name:
+        keys.append(f"name:{soundex(record.last_name)}:{record.first_name[:1]}")
+    if record.email:
+        keys.append(f"email:{record.email}")
+    if record.phone:
+        keys.append(f"phone:{record.phone}")
+    return keys
+
+
+def candidate_pairs(records: Iterable[PersonRecord], max_block_size: int = MAX_BLOCK_SIZE) -> Set[Tuple[int, int]]:
+    """Index pairs of records sharing at least one block."""
+    blocks: Dict[str, List[int]] = defaultdict(list)
+    for index, record in enumerate(records):
+        for key in blocking_keys(record):
+            blocks[key].append(index)
+    pairs: Set[Tuple[int, int]] = set()
+    for key, members in blocks.items():
+        if len(members) < 2 or (len(members) > max_block_size and key.startswith("name:")):
+            continue
+        pairs.update(combinations(members, 2))
+    return pairs
+
+
+def _name_similarity(a: str, b: str) -> float:
+    if not a or not b:
+        return 0.0
+    if a == b:
+        return 1.0
+    # Nicknames and initials: "rob" / "robert", "j" / "john"
+    if a.startswith(b) or b.startswith(a):
+        return 0.8
+    return SequenceMatcher(None, a, b).ratio()
+
+
+def score(a: PersonRecord, b: PersonRecord, min_score: float = 0.0) -> Tuple[float, List[str]]:
+    """
+    Likelihood (0 to 1) that two records are the same person, and the reasons.
+
+    Shared contact details count most, but family members often share an
+    email, phone and address, so clearly different first names or birthdates
+    scale the score down. Pairs whose contact details alone rule out reaching
+    `min_score` return (0, []) without comparing names, which is the slow part.
+    """
+    total = 0.0
+    if a.email and a.email == b.email:
+        total += 0.35
+    if a.phone and a.phone == b.phone:
+        total += 0.25
+    if a.birthdate and a.birthdate == b.birthdate:
+        total += 0.25
+    if a.street and a.street == b.street:
+        total += 0.1
+    if total + NAME_WEIGHT < min_score:
+        return 0.0, []
+    reasons = [reason for field, reason in CONTACT_REASONS if getattr(a, field) and getattr(a, field) == getattr(b, field)]
+    first = _name_similarity(a.first_name, b.first_name)
+    last = _name_similarity(a.last_name, b.last_name)
+    total += 0.25 * first + (NAME_WEIGHT - 0.25) * last
+    if first == 1.0 and last == 1.0:
+        reasons.append("same name")
+    elif first >= 0.8 and last >= 0.8:
+        reasons.append("similar name")
+    if first < 0.5:
+        total *= 0.4
+    if a.birthdate and b.birthdate and a.birthdate != b.birthdate:
+        total *= 0.3
+    return min(round(total, 3), 1.0), reasons
+
+
+# Records being deduplicated, set once in each worker process so chunks only carry index pairs
+_worker_records: List[PersonRecord] = []
+
+
+def _init_worker(records: List[PersonRecord]) -> None:
+    global _worker_records
+    _worker_records = records
+
+
+def _score_chunk(pairs: List[Tuple[int, int]], min_score: float,
+                 records: Optional[List[PersonRecord]] = None) -> List[Tuple[float, str, str, List[str]]]:
+    records = _worker_records if records is None else records
+    matches = []
+    for i, j in pairs:
+        a, b = records[i], records[j]
+        value, reasons = score(a, b, min_score)
+        if value >= min_score:
+            matches.append((value, a.id, b.id, reasons))
+    return matches
+
+
+def find_duplicates(records: List[PersonRecord], min_score: float = 0.5,
+                    workers: Optional[int] = None) -> List[Tuple[float, str, str, List[str]]]:
+    """
+    Score every candidate pair and return (score, id, id, reasons) above min_score, best first.
+
+    Large jobs are split across `workers` processes (default: one per CPU).
+    """
+    pairs = list(candidate_pairs(records))
+    workers = workers or os.cpu_count() or 1
+    if workers == 1 or len(pairs) < PARALLEL_MIN_PAIRS:
+        matches = _score_chunk(pairs, min_score, records)
+    else:
+        size = -(-len(pairs) // (workers * 4))
+        chunks = [pairs[i:i + size] for i in range(0, len(pairs), size)]
+        with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context(START_METHOD),
+                                 initializer=_init_worker, initargs=(records,)) as pool:
+            matches = [m for chunk in pool.map(_score_chunk, chunks, [min_score] * len(chunks)) for m in chunk]
+    matches.sort(key=lambda m: (-m[0], m[1], m[2]))
+    return matches
+
+
+def merge_suggestions(records: List[PersonRecord], matches: List[Tuple[float, str, str, List[str]]],
+                      people: Dict[str, Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """
+    Turn scored pairs into merge suggestions.
+
+    The record with more contact details (then the lower, older ID) is
+    suggested as the one to keep; `person_ids` lists both for the people and
+    family endpoints.
+    """
+    by_id = {record.id: record for record in records}
+
+    def completeness(person_id: str) -> Tuple[int, int]:
+        record = by_id[person_id]
+        filled = sum(1 for value in record[3:] if value)
+        return -filled, int(person_id) if person_id.isdigit() else 0
+
+    suggestions = []
+    for value, a, b, reasons in matches:
+        keep, merge = sorted((a, b), key=completeness)
+        suggestions.append({
+            "score": value,
+            "reasons": reasons,
+            "keep": keep,
+            "merge": merge,
+            "person_ids": [keep, merge],
+            "people": [{
+                "id": person_id,
+                "first_name": people[person_id].get("first_name"),
+                "last_name": people[person_id].get("last_name"),
+                "email": by_id[person_id].email or None,
+                "phone": by_id[person_id].phone or None,
+            } for person_id in (keep, merge)],
+        })
+    return suggestions
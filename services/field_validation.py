@@ -0,0 +1,249 @@
+import re
+from datetime import date, datetime
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import orjson
+
+EMAIL = re.compile(r"^[^@\s]+@[^@\s]+\.[^@\s.]+$")
+PHONE_KEYS = ("phone_mobile", "phone_home", "phone_work")
+ADDRESS_KEYS = ("street_address", "city", "state", "zip")
+ZIP = re.compile(r"^[A-Za-z0-9][A-Za-z0-9 -]{1,9}$")
+DATE_FORMATS = ("%m/%d/%Y", "%Y/%m/%d")
+CHOICE_TYPES = {"dropdown", "radio", "multiple_choice"}
+TEXT_TYPES = {"single_line", "multi_line", "notes", "text"}
+SINGLE_LINE_MAX = 255
+
+# One error: `loc` is the path to the offending value inside fields_json, as in FastAPI's validation errors
+FieldError = Dict[str, Any]
+# Returns the errors of one fields_json entry, with `loc` relative to the entry
+FieldValidator = Callable[[Dict[str, Any]], List[FieldError]]
+
+
+class InvalidFields(Exception):
+    """Raised when fields_json does not match the profile field schema."""
+
+    def __init__(self, errors: List[FieldError]):
+        super().__init__(f"{len(errors)} invalid field(s) in fields_json")
+        self.errors = errors
+
+
+def _error(loc: Tuple, msg: str) -> FieldError:
+    return {"loc": list(loc), "msg": msg}
+
+
+def _details(entry: Dict[str, Any]) -> Tuple[Optional[Dict[str, Any]], List[FieldError]]:
+    details = entry.get("details")
+    if not isinstance(details, dict):
+        return None, [_error(("details",), "details must be an object")]
+    return details, []
+
+
+def _email(entry: Dict[str, Any]) -> List[FieldError]:
+    details, errors = _details(entry)
+    if details is None:
+        return errors
+    address = details.get("address")
+    if not isinstance(address, str) or not EMAIL.match(address.strip()):
+        return [_error(("details", "address"), f"not a valid email address: {address!r}")]
+    return []
+
+
+def _phone(entry: Dict[str, Any]) -> List[FieldError]:
+    details, errors = _details(entry)
+    if details is None:
+        return errors
+    numbers = [key for key in PHONE_KEYS if details.get(key) not in (None, "")]
+    if not numbers:
+        return [_error(("details",), f"at least one of {', '.join(PHONE_KEYS)} is required")]
+    for key in numbers:
+        digits = re.sub(r"[\s().+-]", "", str(details[key]))
+        if not digits.isdigit() or not 7 <= len(digits) <= 15:
+            errors.append(_error(("details", key), f"not a valid phone number: {details[key]!r}"))
+    return errors
+
+
+def _address(entry: Dict[str, Any]) -> List[FieldError]:
+    details, errors = _details(entry)
+    if details is None:
+        return errors
+    if not any(details.get(key) for key in ADDRESS_KEYS):
+        return [_error(("details",), f"at least one of {', '.join(ADDRESS_KEYS)} is required")]
+    for key in ADDRESS_KEYS:
+        if details.get(key) is not None and not isinstance(details[key], str):
+            errors.append(_error(("details", key), "must be a string"))
+    zip_code = details.get("zip")
+    if isinstance(zip_code, str) and zip_code and not ZIP.match(zip_code.strip()):
+        errors.append(_error(("details", "zip"), f"not a valid postal code: {zip_code!r}"))
+    return errors
+
+
+def _parse_date(value: str) -> bool:
+    try:
+        date.fromisoformat(value)
+        return True
+    except ValueError:
+        pass
+    for fmt in DATE_FORMATS:
+        try:
+            datetime.strptime(value, fmt)
+            return True
+        except ValueError:
+            pass
+    return False
+
+
+def _date(entry: Dict[str, Any]) -> List[FieldError]:
+    response = entry.get("response")
+    if not isinstance(response, str) or not _parse_date(response.strip()):
+        return [_error(("response",), f"not a valid date (YYYY-MM-DD or MM/DD/YYYY): {response!r}")]
+    return []
+
+
+def _text(max_length: Optional[int]) -> FieldValidator:
+    def validate(entry: Dict[str, Any]) -> List[FieldError]:
+        response = entry.get("response")
+        if response is not None and not isinstance(response, (str, int, float)):
+            return [_error(("response",), "must be a string")]
+        if max_length is not None and response is not None:
+            text = str(response)
+            if len(text) > max_length or "\n" in text:
+                return [_error(("response",), f"must be a single line of at most {max_length} characters")]
+        return []
+    return validate
+
+
+def _choices(field: Dict[str, Any], many: bool) -> FieldValidator:
+    options = {str(o.get("option_id") or o.get("id")): o.get("name") for o in field.get("options") or []}
+    by_name = {str(name).lower(): option_id for option_id, name in options.items() if name}
+
+    def validate(entry: Dict[str, Any]) -> List[FieldError]:
+        response = entry.get("response")
+        values = response if isinstance(response, list) else [response]
+        if isinstance(response, str) and many:
+            values = [v.strip() for v in response.split(",")]
+        if not many and len(values) != 1:
+            return [_error(("response",), "must be a single option id")]
+        errors = []
+        for i, value in enumerate(values):
+            if str(value) in options:
+                continue
+            loc = ("response", i) if isinstance(response, list) else ("response",)
+            hint = f" (option id {by_name[str(value).lower()]})" if str(value).lower() in by_name else ""
+            errors.append(_error(loc, f"unknown option {value!r}{hint}"))
+        return errors
+    return validate
+
+
+def field_validator(field: Dict[str, Any]) -> Optional[FieldValidator]:
+    """Validator for one profile field, by its field_type; None for types Breeze is left to check."""
+    field_type = field.get("field_type")
+    if field_type == "email":
+        return _email
+    if field_type == "phone":
+        return _phone
+    if field_type == "address":
+        return _address
+    if field_type in ("birthdate", "date"):
+        return _date
+    if field_type in CHOICE_TYPES:
+        return _choices(field, many=False)
+    if field_type == "checkbox":
+        return _choices(field, many=True)
+    if field_type in TEXT_TYPES:
+        return _text(SINGLE_LINE_MAX if field_type == "single_line" else None)
+    return None
+
+
+def _is_empty(entry: Dict[str, Any]) -> bool:
+    """Whether an entry clears its field: no response, or details without any text (flags such as is_private aside)."""
+    details = entry.get("details")
+    if isinstance(details, dict):
+        return not any(isinstance(value, str) and value.strip() for value in details.values())
+    return details in (None, "") and entry.get("response") in (None, "", [])
+
+
+class FieldsSchema:
+    """
+    The profile field schema compiled into one validator per field.
+
+    Build it once per get_profile_fields response; validate() then checks a
+    fields_json payload without calling Breeze. With `allow_empty`, entries
+    that clear a field (no response or detail values) are accepted whatever
+    its type, as updates send them to remove an email, phone or date.
+    """
+
+    def __init__(self, sections: List[Dict[str, Any]]):
+        self.types: Dict[str, str] = {}
+        self.validators: Dict[str, Optional[FieldValidator]] = {}
+        for section in sections or []:
+            for field in section.get("fields") or []:
+                if not field.get("field_id"):
+                    continue
+                field_id = str(field["field_id"])
+                self.types[field_id] = field.get("field_type")
+                self.validators[field_id] = field_validator(field)
+
+    def entry_errors(self, index: int, entry: Any, allow_empty: bool = False) -> List[FieldError]:
+        if not isinstance(entry, dict):
+            return [_error((index,), "each field must be an object")]
+        field_id = entry.get("field_id")
+        if field_id is None:
+            return [_error((index, "field_id"), "field_id is required")]
+        field_id = str(field_id)
+        if field_id not in self.types:
+            return [_error((index, "field_id"), f"unknown profile field {field_id!r}")]
+        field_type = entry.get("field_type")
+        expected = self.types[field_id]
+        if field_type is not None and expected and field_type != expected:
+            return [_error((index, "field_type"), f"field {field_id} is of type {expected!r}, not {field_type!r}")]
+        validate = self.validators[field_id]
+        if validate is None or allow_empty and _is_empty(entry):
+            return []
+        return [_error((index, *error["loc"]), error["msg"]) for error in validate(entry)]
+
+    def errors(self, fields_json: Optional[str], allow_empty: bool = False) -> List[FieldError]:
+        """Every problem with a fields_json string; an empty list when it is valid."""
+        if fields_json is None or not fields_json.strip():
+            return []
+        try:
+            entries = orjson.loads(fields_json)
+        except orjson.JSONDecodeError as e:
+            return [_error((), f"not valid JSON: {e}")]
+        return self.entries_errors(entries, allow_empty)
+
+    def entries_errors(self, entries: Any, allow_empty: bool = False) -> List[FieldError]:
+        """Every problem with an already parsed fields_json array."""
+        if not isinstance(entries, list):
+            return [_error((), "must be a JSON array of fields")]
+        errors = []
+        for index, entry in enumerate(entries):
+            errors.extend(self.entry_errors(index, entry, allow_empty))
+        return errors
+
+    def validate(self, fields_json: Optional[str], allow_empty: bool = False) -> None:
+        """Raise InvalidFields listing every problem with a fields_json string."""
+        errors = self.errors(fields_json, allow_empty)
+        if errors:
+            raise InvalidFields(errors)
+
+    def validate_rows(self, rows: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """
+        Validate person import rows ({first_name, last_name, fields_json}) in one pass.
+
+        fields_json may be a JSON string, as for add_person, or the array itself;
+        any other value is reported as invalid.
+        Returns the invalid rows only, each with its `row` index and errors.
+        """
+        results = []
+        for row_index, row in enumerate(rows):
+            if not isinstance(row, dict):
+                results.append({"row": row_index, "errors": [_error((), "each row must be an object")]})
+                continue
+            errors = [_error((name,), f"{name} is required")
+                      for name in ("first_name", "last_name") if not str(row.get(name) or "").strip()]
+            fields = row.get("fields_json")
+            field_errors = self.errors(fields) if fields is None or isinstance(fields, str) else self.entries_errors(fields)
+            errors += [{"loc": ["fields_json", *error["loc"]], "msg": error["msg"]} for error in field_errors]
+            if errors:
+                results.append({"row": row_index, "errors": errors})
+        return results
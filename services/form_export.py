@@ -0,0 +1,130 @@
+import csv
+import io
+import json
+from typing import Any, Dict, Iterable, Iterator, List, Tuple
+
+# Entry metadata columns written ahead of the form's own fields
+ENTRY_COLUMNS = ["id", "created_on", "person_id"]
+
+
+def field_columns(fields: List[Dict[str, Any]]) -> List[Tuple[str, str]]:
+    """
+    Build the (field_id, header) column list for a form from its field schema.
+
+    Entry responses are keyed by the field's `field_id` when Breeze sends one,
+    otherwise by its `id`.
+    """
+    columns = []
+    for field in fields:
+        field_id = str(field.get("field_id") or field.get("id"))
+        columns.append((field_id, field.get("name") or field_id))
+    return columns
+
+
+def flatten_value(value: Any) -> Any:
+    """Reduce a single response value to a scalar suitable for one table cell."""
+    if value is None or isinstance(value, (str, int, float, bool)):
+        return value
+    if isinstance(value, dict) and ("first_name" in value or "last_name" in value):
+        return " ".join(filter(None, [value.get("first_name"), value.get("last_name")]))
+    return json.dumps(value, separators=(",", ":"))
+
+
+def drain(entries: List[Dict[str, Any]]) -> Iterator[Dict[str, Any]]:
+    """Iterate a list of entries in order, releasing each one once it is consumed."""
+    entries.reverse()
+    while entries:
+        yield entries.pop()
+
+
+def iter_rows(entries: Iterable[Dict[str, Any]], columns: List[Tuple[str, str]]) -> Iterator[List[Any]]:
+    """Pivot form entries into rows, one cell per entry column and form field."""
+    for entry in entries:
+        response = entry.get("response") or {}
+        row = [entry.get(name) for name in ENTRY_COLUMNS]
+        row.extend(flatten_value(response.get(field_id)) for field_id, _ in columns)
+        yield row
+
+
+def stream_csv(entries: Iterable[Dict[str, Any]], columns: List[Tuple[str, str]],
+               chunk_rows: int = 500) -> Iterator[str]:
+    """Yield the CSV export in chunks of `chunk_rows` rows."""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(ENTRY_COLUMNS + [header for _, header in columns])
+    for count, row in enumerate(iter_rows(entries, columns), start=1):
+        writer.writerow(row)
+        if count % chunk_rows == 0:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue()
+
+
+class _ChunkSink:
+    """Write-only file object that hands written bytes back to the caller."""
+
+    def __init__(self):
+        self.closed = False
+        self._chunks: List[bytes] = []
+        self._position = 0
+
+    def write(self, data) -> int:
+        self._chunks.append(bytes(data))
+        self._position += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        return self._position
+
+    def flush(self) -> None:
+        pass
+
+    def close(self) -> None:
+        self.closed = True
+
+    def drain(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks.clear()
+        return data
+
+
+def stream_parquet(entries: Iterable[Dict[str, Any]], columns: List[Tuple[str, str]],
+                   chunk_rows: int = 5000) -> Iterator[bytes]:
+    """
+    Yield the Parquet export one row group at a time.
+
+    Every column is written as a nullable string so that mixed-type responses
+    stay lossless. Requires the optional `pyarrow` package.
+    """
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    names = ENTRY_COLUMNS + [header for _, header in columns]
+    schema = pa.schema([pa.field(name, pa.string()) for name in names])
+    sink = _ChunkSink()
+    writer = pq.ParquetWriter(sink, schema)
+
+    def write_batch(rows: List[List[Any]]) -> None:
+        cells = [[None if value is None else str(value) for value in column] for column in zip(*rows)]
+        writer.write_table(pa.Table.from_arrays([pa.array(c, pa.string()) for c in cells], schema=schema))
+
+    batch: List[List[Any]] = []
+    for row in iter_rows(entries, columns):
+        batch.append(row)
+        if len(batch) == chunk_rows:
+            write_batch(batch)
+            batch = []
+            yield sink.drain()
+    if batch:
+        write_batch(batch)
+    writer.close()
+    yield sink.drain()
+
+
+def parquet_available() -> bool:
+    try:
+        import pyarrow.parquet  # noqa: F401
+    except ImportError:
+        return False
+    return True
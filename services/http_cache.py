@@ -0,0 +1,123 @@
+import hashlib
+import os
+from typing import Any, Callable, Dict, Hashable, NamedTuple, Optional, Tuple
+
+from fastapi import Request
+from fastapi.responses import Response
+
+from . import compression
+from .cache import CacheEntry, cache
+
+# Seconds clients may reuse a response before revalidating it with If-None-Match
+HTTP_MAX_AGE = int(os.getenv('http_max_age', 0))
+# Added to responses served from expired cache entries while Breeze is failing
+STALE_WARNING = '110 - "Response is Stale"'
+# Content encodings whose suffix is stripped from ETags before comparing them
+ENCODINGS = ("br", "gzip")
+
+
+class RenderedBody(NamedTuple):
+    # Version of the cache entry the body was rendered from
+    version: int
+    body: bytes
+    etag: str
+    # Compressed copies of body by content encoding, filled on first request
+    encoded: Dict[str, bytes]
+
+    def encode(self, encoding: str) -> bytes:
+        data = self.encoded.get(encoding)
+        if data is None:
+            data = self.encoded[encoding] = compression.compress(self.body, encoding)
+        return data
+
+
+def make_etag(body: bytes) -> str:
+    """Strong ETag from a hash of the body, so every worker agrees on it."""
+    return '"%s"' % hashlib.blake2b(body, digest_size=16).hexdigest()
+
+
+def _identity_etag(etag: str) -> str:
+    """An ETag without its W/ prefix and any content encoding suffix (see compression.encoded_etag)."""
+    if etag.startswith("W/"):
+        etag = etag[2:]
+    for encoding in ENCODINGS:
+        suffix = f'-{encoding}"'
+        if etag.endswith(suffix):
+            return etag[:-len(suffix)] + '"'
+    return etag
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """
+    Evaluate If-None-Match against an ETag (weak comparison, per RFC 9110).
+
+    ETags of the body's encoded representations match too, so a client that
+    cached the gzip body revalidates it whichever encoding it now accepts.
+    """
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    opaque = _identity_etag(etag)
+    return any(_identity_etag(candidate.strip()) == opaque for candidate in if_none_match.split(","))
+
+
+def cache_headers(etag: str, stale: bool = False) -> dict:
+    headers = {
+        "ETag": etag,
+        "Cache-Control": f"private, max-age={0 if stale else HTTP_MAX_AGE}, must-revalidate",
+        "Vary": "Accept-Encoding",
+    }
+    if stale:
+        headers["Warning"] = STALE_WARNING
+    return headers
+
+
+def rendered(entry: CacheEntry, key: Hashable, render: Callable[[Any], bytes],
+             variant: Tuple = ()) -> RenderedBody:
+    """
+    Return the JSON body for a cache entry, rendering it at most once per version.
+
+    Rendered bodies are kept in the "rendered" cache namespace keyed by the data
+    key plus `variant` (e.g. a field selection), and reused until the data entry
+    is refilled, along with their compressed copies.
+    """
+    rendered_key = ("rendered", key, variant)
+    hit, body = cache.get(rendered_key)
+    if not hit or body.version != entry.version:
+        data = render(entry.value)
+        body = RenderedBody(entry.version, data, make_etag(data), {})
+        cache.set(rendered_key, body)
+    return body
+
+
+def conditional_json(request: Request, key: Hashable, loader: Callable[[], Any],
+                     render: Callable[[Any], bytes], variant: Tuple = ()) -> Response:
+    """
+    Serve a cached read with an ETag, answering a matching If-None-Match with 304.
+
+    If the data has expired and reloading it fails, the last good copy is
+    served with a `Warning: 110` header rather than an error.
+
+    Parameters:
+    - **request**: Incoming request, for its If-None-Match header
+    - **key**: Cache key of the upstream data
+    - **loader**: Fetches the upstream data on a cache miss
+    - **render**: Turns the data into the JSON response body
+    - **variant**: Anything besides the data that changes the body
+    """
+    entry = cache.get_or_load_entry(key, loader)
+    body = rendered(entry, key, render, variant)
+    encoding = compression.choose_encoding(request.headers.get("accept-encoding"))
+    if len(body.body) < compression.MINIMUM_SIZE:
+        encoding = None
+    # Each encoding is its own representation, with its own ETag
+    etag = body.etag if encoding is None else compression.encoded_etag(body.etag, encoding)
+    headers = cache_headers(etag, stale=entry.stale)
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers=headers)
+    if encoding is None:
+        return Response(body.body, media_type="application/json", headers=headers)
+    # Served precompressed; CompressionMiddleware leaves encoded responses alone
+    headers["Content-Encoding"] = encoding
+    return Response(body.encode(encoding), media_type="application/json", headers=headers)
@@ -0,0 +1,133 @@
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Callable, Hashable, Tuple
+
+import orjson
+
+REPLAYED_HEADER = "Idempotent-Replayed"
+MAX_KEY_LENGTH = 255
+
+PENDING = "pending"
+DONE = "done"
+
+
+class IdempotencyError(Exception):
+    """Raised when a request cannot be matched to its Idempotency-Key; `status_code` says why."""
+
+    def __init__(self, message: str, status_code: int):
+        super().__init__(message)
+        self.status_code = status_code
+
+
+def fingerprint(params: Any) -> str:
+    """Hash of a write's parameters, to spot an Idempotency-Key reused for a different request."""
+    return hashlib.sha256(orjson.dumps(params, option=orjson.OPT_SORT_KEYS)).hexdigest()
+
+
+class IdempotencyStore:
+    """
+    SQLite store of write results keyed by Idempotency-Key.
+
+    The first request with a key runs the write and stores its result; repeats
+    with the same parameters get the stored result back without calling Breeze
+    again. A repeat while the first is still running, or with different
+    parameters, is rejected (409 and 422). Failed writes are not stored, so the
+    client can retry them with the same key. Results are kept for `ttl`
+    seconds; a write cut short by a crash keeps its key in progress until then.
+    The database is a local file, so every worker process on the host shares it.
+    """
+
+    def __init__(self, path: str, ttl: float = 86400.0):
+        self.path = path
+        self.ttl = ttl
+        self._db = sqlite3.connect(path, isolation_level=None, check_same_thread=False)
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS results ("
+            "key TEXT PRIMARY KEY, fingerprint TEXT NOT NULL, state TEXT NOT NULL, "
+            "result BLOB, created REAL NOT NULL)"
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS results_created ON results (created)")
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _key(scope: Tuple[Hashable, ...], key: str) -> str:
+        return "\x1f".join(str(part) for part in scope + (key,))
+
+    def begin(self, key: str, request_fingerprint: str) -> Tuple[bool, Any]:
+        """
+        Claim a key for a new write.
+
+        Returns (False, None) if the caller should run the write, or
+        (True, result) if it already completed. Raises IdempotencyError if it
+        is still running or the key was used for different parameters.
+        """
+        now = time.time()
+        with self._lock:
+            self._db.execute("BEGIN IMMEDIATE")
+            try:
+                self._db.execute("DELETE FROM results WHERE created < ?", (now - self.ttl,))
+                row = self._db.execute(
+                    "SELECT fingerprint, state, result FROM results WHERE key = ?", (key,)
+                ).fetchone()
+                if row is None:
+                    self._db.execute(
+                        "INSERT INTO results (key, fingerprint, state, created) VALUES (?, ?, ?, ?)",
+                        (key, request_fingerprint, PENDING, now),
+                    )
+                    return False, None
+            finally:
+                self._db.execute("COMMIT")
+        stored_fingerprint, state, result = row
+        if stored_fingerprint != request_fingerprint:
+            raise IdempotencyError("Idempotency-Key was already used for a different request", status_code=422)
+        if state == PENDING:
+            raise IdempotencyError("A request with this Idempotency-Key is still in progress", status_code=409)
+        return True, orjson.loads(result)
+
+    def complete(self, key: str, result: Any) -> None:
+        with self._lock:
+            self._db.execute(
+                "UPDATE results SET state = ?, result = ? WHERE key = ?", (DONE, orjson.dumps(result), key)
+            )
+
+    def abandon(self, key: str) -> None:
+        with self._lock:
+            self._db.execute("DELETE FROM results WHERE key = ? AND state = ?", (key, PENDING))
+
+    def run(self, scope: Tuple[Hashable, ...], key: str, params: Any, write: Callable[[], Any]) -> Tuple[Any, bool]:
+        """
+        Run `write` at most once per key and parameters.
+
+        Parameters:
+        - **scope**: Tenant and operation the key belongs to
+        - **key**: Client-supplied Idempotency-Key
+        - **params**: Parameters of the write, compared across repeats
+        - **write**: Performs the write and returns its JSON-serializable result
+
+        Returns:
+            (result, replayed) where replayed is True for a stored result
+        """
+        if len(key) > MAX_KEY_LENGTH:
+            raise IdempotencyError(f"Idempotency-Key must be at most {MAX_KEY_LENGTH} characters", status_code=400)
+        stored_key = self._key(scope, key)
+        done, result = self.begin(stored_key, fingerprint(params))
+        if done:
+            return result, True
+        try:
+            result = write()
+        except BaseException:
+            self.abandon(stored_key)
+            raise
+        self.complete(stored_key, result)
+        return result, False
+
+
+def open_store() -> IdempotencyStore:
+    """Open the store named by the idempotency_db setting."""
+    return IdempotencyStore(
+        os.getenv('idempotency_db', 'idempotency.sqlite3'),
+        ttl=float(os.getenv('idempotency_ttl', 86400)),
+    )
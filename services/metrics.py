@@ -0,0 +1,181 @@
+import time
+from typing import Any, Callable, Dict, Tuple
+
+from prometheus_client import CONTENT_TYPE_LATEST, REGISTRY, Counter, Gauge, Histogram, generate_latest
+from prometheus_client.core import CounterMetricFamily, GaugeMetricFamily
+
+from .admission import AdmissionController
+from .cache import cache
+from .circuit import CLOSED, CircuitBreakers
+from .tenants import RateLimiter, current_tenant
+
+REQUEST_LATENCY = Histogram(
+    "http_request_duration_seconds",
+    "Latency of incoming API requests by route template and status code",
+    ["method", "route", "status"],
+)
+REQUESTS_IN_FLIGHT = Gauge(
+    "http_requests_in_flight",
+    "Incoming API requests currently being handled",
+)
+UPSTREAM_LATENCY = Histogram(
+    "breeze_upstream_request_duration_seconds",
+    "Latency of calls to the Breeze API by tenant and BreezeApi method",
+    ["tenant", "method"],
+)
+UPSTREAM_ERRORS = Counter(
+    "breeze_upstream_errors_total",
+    "Failed calls to the Breeze API by tenant, BreezeApi method and exception type",
+    ["tenant", "method", "error"],
+)
+UPSTREAM_IN_FLIGHT = Gauge(
+    "breeze_upstream_in_flight",
+    "Calls to the Breeze API currently waiting on a response",
+    ["tenant", "method"],
+)
+RATE_LIMITER_QUEUE = Gauge(
+    "breeze_rate_limiter_queue_depth",
+    "Calls waiting for an upstream rate limit slot by tenant",
+    ["tenant"],
+)
+
+
+class CacheCollector:
+    """Exports the lookup counters kept by the shared TTL cache at scrape time."""
+
+    def collect(self):
+        family = CounterMetricFamily(
+            "breeze_cache_lookups",
+            "Cache lookups by namespace and result (hit, miss, stale or coalesced into another load)",
+            labels=["namespace", "result"],
+        )
+        for (namespace, result), count in sorted(cache.stats_snapshot().items()):
+            family.add_metric([namespace, result], count)
+        yield family
+        evictions = CounterMetricFamily(
+            "breeze_cache_evictions",
+            "Cache entries dropped by namespace to stay within cache_max_entries",
+            labels=["namespace"],
+        )
+        for namespace, count in sorted(cache.evictions_snapshot().items()):
+            evictions.add_metric([namespace], count)
+        yield evictions
+
+
+REGISTRY.register(CacheCollector())
+
+
+def observe_upstream(method: str, params: Dict[str, Any], call: Callable[[], Any]) -> Any:
+    """UpstreamClient hook recording latency, errors and in-flight calls per tenant and method."""
+    tenant = current_tenant.get()
+    in_flight = UPSTREAM_IN_FLIGHT.labels(tenant, method)
+    in_flight.inc()
+    start = time.perf_counter()
+    try:
+        return call()
+    except Exception as e:
+        UPSTREAM_ERRORS.labels(tenant, method, type(e).__name__).inc()
+        raise
+    finally:
+        UPSTREAM_LATENCY.labels(tenant, method).observe(time.perf_counter() - start)
+        in_flight.dec()
+
+
+class CircuitCollector:
+    """Exports the state of each tenant's per-method circuit breakers at scrape time."""
+
+    def __init__(self, breakers: Dict[str, CircuitBreakers]):
+        self.breakers = breakers
+
+    def collect(self):
+        family = GaugeMetricFamily(
+            "breeze_circuit_open",
+            "1 while calls to a BreezeApi method fail fast (open or half-open circuit), else 0",
+            labels=["tenant", "method"],
+        )
+        for tenant, breakers in sorted(self.breakers.items()):
+            for method, breaker in sorted(breakers.breakers.items()):
+                family.add_metric([tenant, method], 0 if breaker.state == CLOSED else 1)
+        yield family
+
+
+def track_circuit_breakers(breakers: Dict[str, CircuitBreakers]) -> None:
+    """Report the circuit breaker state of every tenant and method at scrape time."""
+    REGISTRY.register(CircuitCollector(breakers))
+
+
+def track_rate_limiters(limiters: Dict[str, RateLimiter]) -> None:
+    """Report each tenant's rate limiter queue depth at scrape time."""
+    for tenant, limiter in limiters.items():
+        RATE_LIMITER_QUEUE.labels(tenant).set_function(lambda limiter=limiter: limiter.waiting)
+
+
+class AdmissionCollector:
+    """Exports in-flight and rejected inbound requests per route class at scrape time."""
+
+    def __init__(self, controller: AdmissionController):
+        self.controller = controller
+
+    def collect(self):
+        in_flight = GaugeMetricFamily(
+            "http_admitted_in_flight",
+            "Admitted requests currently being handled by route class",
+            labels=["route_class"],
+        )
+        for route_class, count in sorted(self.controller.in_flight.items()):
+            in_flight.add_metric([route_class], count)
+        yield in_flight
+        rejected = CounterMetricFamily(
+            "http_requests_rejected",
+            "Requests rejected by admission control by route class and reason (quota, concurrency or upstream_wait)",
+            labels=["route_class", "reason"],
+        )
+        for (route_class, reason), count in sorted(self.controller.rejected.items()):
+            rejected.add_metric([route_class, reason], count)
+        yield rejected
+
+
+def track_admission(controller: AdmissionController) -> None:
+    """Report admission control counters at scrape time."""
+    REGISTRY.register(AdmissionCollector(controller))
+
+
+class MetricsMiddleware:
+    """
+    ASGI middleware timing every HTTP request.
+
+    Requests are labelled with the matched route template (e.g. `/people/{person_id}`)
+    rather than the raw path, so label cardinality stays bounded.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status = 500
+
+        async def send_with_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        REQUESTS_IN_FLIGHT.inc()
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            REQUESTS_IN_FLIGHT.dec()
+            route = scope.get("route")
+            REQUEST_LATENCY.labels(
+                scope["method"], getattr(route, "path", "unmatched"), str(status)
+            ).observe(time.perf_counter() - start)
+
+
+def render() -> Tuple[bytes, str]:
+    """Return the current metrics in Prometheus text format and its content type."""
+    return generate_latest(REGISTRY), CONTENT_TYPE_LATEST
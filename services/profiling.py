@@ -0,0 +1,263 @@
+import cProfile
+import hmac
+import io
+import json
+import marshal
+import os
+import pstats
+import random
+import sys
+import threading
+import time
+import uuid
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Dict, List, Optional, Set
+
+from starlette.concurrency import run_in_threadpool
+
+# Header that requests a profile of the current request, and its accepted values
+PROFILE_HEADER = "x-profile"
+PROFILE_MODES = ("cprofile", "sample")
+# Header carrying the admin token for triggering and reading profiles
+ADMIN_TOKEN_HEADER = "x-admin-token"
+
+FILE_SUFFIXES = {"cprofile": "pstats", "sample": "collapsed"}
+
+
+def is_admin(token: Optional[str], admin_token: Optional[str]) -> bool:
+    """Check a presented admin token against the configured one in constant time."""
+    return bool(token and admin_token and hmac.compare_digest(token, admin_token))
+
+
+class ProfileStore:
+    """
+    Directory of saved request profiles.
+
+    Each profile is a `<id>.pstats` dump (cProfile) or a `<id>.collapsed` file of
+    flamegraph-ready collapsed stacks (sampling), plus a `<id>.json` summary.
+    Only the newest `keep` profiles are retained.
+    """
+
+    def __init__(self, directory: str, keep: int = 100):
+        self.directory = directory
+        self.keep = keep
+
+    def path(self, profile_id: str, suffix: str) -> str:
+        return os.path.join(self.directory, f"{profile_id}.{suffix}")
+
+    def save(self, profile_id: str, mode: str, data: bytes, meta: Dict[str, Any]) -> None:
+        os.makedirs(self.directory, exist_ok=True)
+        with open(self.path(profile_id, FILE_SUFFIXES[mode]), "wb") as f:
+            f.write(data)
+        with open(self.path(profile_id, "json"), "w") as f:
+            json.dump(dict(meta, id=profile_id, mode=mode), f)
+        self._prune()
+
+    def list(self) -> List[Dict[str, Any]]:
+        if not os.path.isdir(self.directory):
+            return []
+        profiles = []
+        for name in os.listdir(self.directory):
+            if name.endswith(".json"):
+                with open(os.path.join(self.directory, name)) as f:
+                    profiles.append(json.load(f))
+        return sorted(profiles, key=lambda p: p["started_at"], reverse=True)
+
+    def get(self, profile_id: str) -> Optional[Dict[str, Any]]:
+        # Profile IDs are uuid hex strings; anything else cannot name a stored file
+        if not profile_id.isalnum():
+            return None
+        try:
+            with open(self.path(profile_id, "json")) as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+
+    def _prune(self) -> None:
+        for meta in self.list()[self.keep:]:
+            for suffix in ("json", FILE_SUFFIXES[meta["mode"]]):
+                try:
+                    os.remove(self.path(meta["id"], suffix))
+                except FileNotFoundError:
+                    pass
+
+
+def pstats_summary(path: str, limit: int = 50, sort: str = "cumulative") -> str:
+    """Render the top `limit` functions of a pstats dump as text."""
+    out = io.StringIO()
+    pstats.Stats(path, stream=out).sort_stats(sort).print_stats(limit)
+    return out.getvalue()
+
+
+class _StackSampler:
+    """Samples a set of threads' Python stacks at a fixed interval into collapsed-stack counts."""
+
+    def __init__(self, thread_id: int, interval: float):
+        self.thread_ids: Set[int] = {thread_id}
+        self.interval = interval
+        self.stacks: Counter = Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def start(self) -> None:
+        self._thread.start()
+
+    def stop(self) -> bytes:
+        self._stop.set()
+        self._thread.join()
+        lines = [f"{stack} {count}" for stack, count in self.stacks.most_common()]
+        return ("\n".join(lines) + "\n").encode()
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            frames = sys._current_frames()
+            for thread_id in list(self.thread_ids):
+                frame = frames.get(thread_id)
+                names = []
+                while frame is not None:
+                    code = frame.f_code
+                    names.append(f"{os.path.basename(code.co_filename)}:{code.co_name}")
+                    frame = frame.f_back
+                if names:
+                    self.stacks[";".join(reversed(names))] += 1
+
+
+class _ActiveProfile:
+    """Profile in progress for one request, extended to the worker threads it uses."""
+
+    def __init__(self, mode: str, sampler: Optional[_StackSampler] = None):
+        self.mode = mode
+        self.loop_thread = threading.get_ident()
+        self.sampler = sampler
+        self.thread_profilers: List[cProfile.Profile] = []
+
+    @contextmanager
+    def attach(self):
+        if self.mode == "sample":
+            thread_id = threading.get_ident()
+            self.sampler.thread_ids.add(thread_id)
+            try:
+                yield
+            finally:
+                self.sampler.thread_ids.discard(thread_id)
+        else:
+            profiler = cProfile.Profile()
+            profiler.enable()
+            try:
+                yield
+            finally:
+                profiler.disable()
+                self.thread_profilers.append(profiler)
+
+
+_active_profile: ContextVar[Optional[_ActiveProfile]] = ContextVar("active_profile", default=None)
+
+
+@contextmanager
+def profile_endpoint(name: str):
+    """
+    InstrumentedRoute wrapper extending a request's profile to the endpoint thread.
+
+    Sync endpoints run in the threadpool, outside the event loop thread that
+    ProfilingMiddleware profiles, so their thread is profiled separately and
+    merged into the same result.
+    """
+    active = _active_profile.get()
+    if active is None or threading.get_ident() == active.loop_thread:
+        yield
+        return
+    with active.attach():
+        yield
+
+
+class ProfilingMiddleware:
+    """
+    ASGI middleware that profiles selected requests.
+
+    A request is profiled when it sends `X-Profile: cprofile|sample` together with
+    a valid `X-Admin-Token`, or at random for a `sample_rate` fraction of requests.
+    Only one request is profiled at a time; the stored profile's ID is returned
+    in the `X-Profile-Id` response header. Profiles are written to the store
+    from the threadpool, off the event loop.
+
+    The event loop thread is shared by every request, so a profile of an async
+    route also contains whatever other requests' coroutines ran on the loop
+    while it was being served. Profiles of sync routes are cleaner: their
+    endpoint thread is profiled on its own (see profile_endpoint).
+    """
+
+    def __init__(self, app, store: ProfileStore, admin_token: Optional[str] = None,
+                 sample_rate: float = 0.0, default_mode: str = "cprofile",
+                 sample_interval: float = 0.005):
+        self.app = app
+        self.store = store
+        self.admin_token = admin_token
+        self.sample_rate = sample_rate
+        self.default_mode = default_mode
+        self.sample_interval = sample_interval
+        self._busy = threading.Lock()
+
+    def _requested_mode(self, scope) -> Optional[str]:
+        headers = dict(scope["headers"])
+        mode = headers.get(PROFILE_HEADER.encode(), b"").decode()
+        if mode and self.admin_token and is_admin(headers.get(ADMIN_TOKEN_HEADER.encode(), b"").decode(), self.admin_token):
+            return mode if mode in PROFILE_MODES else self.default_mode
+        if self.sample_rate and random.random() < self.sample_rate:
+            return self.default_mode
+        return None
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        mode = self._requested_mode(scope)
+        if mode is None or not self._busy.acquire(blocking=False):
+            await self.app(scope, receive, send)
+            return
+
+        profile_id = uuid.uuid4().hex
+        meta = {"method": scope["method"], "path": scope["path"], "started_at": time.time(), "status": None}
+
+        async def send_with_id(message):
+            if message["type"] == "http.response.start":
+                meta["status"] = message["status"]
+                message["headers"] = list(message.get("headers", [])) + [(b"x-profile-id", profile_id.encode())]
+            await send(message)
+
+        start = time.perf_counter()
+        token = None
+        try:
+            if mode == "cprofile":
+                active = _ActiveProfile(mode)
+                token = _active_profile.set(active)
+                profiler = cProfile.Profile()
+                profiler.enable()
+                try:
+                    await self.app(scope, receive, send_with_id)
+                finally:
+                    profiler.disable()
+                    meta["duration"] = time.perf_counter() - start
+                profilers = [profiler] + active.thread_profilers
+                data = await run_in_threadpool(_pstats_bytes, profilers)
+            else:
+                sampler = _StackSampler(threading.get_ident(), self.sample_interval)
+                token = _active_profile.set(_ActiveProfile(mode, sampler))
+                sampler.start()
+                try:
+                    await self.app(scope, receive, send_with_id)
+                finally:
+                    meta["duration"] = time.perf_counter() - start
+                    data = sampler.stop()
+            await run_in_threadpool(self.store.save, profile_id, mode, data, meta)
+        finally:
+            if token is not None:
+                _active_profile.reset(token)
+            self._busy.release()
+
+
+def _pstats_bytes(profilers: List[cProfile.Profile]) -> bytes:
+    # Same format as Stats.dump_stats, so the file loads with pstats or snakeviz
+    stats = pstats.Stats(*profilers)
+    return marshal.dumps(stats.stats)
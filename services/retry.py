@@ -0,0 +1,52 @@
+import os
+import random
+import time
+from typing import Any, Callable, Dict, Optional, Tuple, Type
+
+from .upstream import is_transient
+
+# BreezeApi methods that only read, so repeating them after a failure is harmless
+SAFE_PREFIXES = ("get_", "list_")
+
+
+class RetryPolicy:
+    """
+    Retries failed read-only Breeze calls with jittered exponential backoff.
+
+    Attempt n (from 0) waits a random time between 0 and
+    min(max_delay, base_delay * 2**n) before retrying ("full jitter"), so
+    callers that failed together do not retry together. Writes are never
+    retried here, since a failed response does not prove the write did not
+    land; clients retry them with an Idempotency-Key instead. Only transient
+    failures (see upstream.is_transient) are retried: errors about the
+    request itself, and exceptions in `give_up` (such as an open circuit or a
+    local rate limit rejection), are raised straight away.
+
+    Defaults come from the retry_attempts, retry_base_delay and retry_max_delay
+    settings.
+    """
+
+    def __init__(self, attempts: Optional[int] = None, base_delay: Optional[float] = None,
+                 max_delay: Optional[float] = None, give_up: Tuple[Type[BaseException], ...] = ()):
+        self.attempts = attempts if attempts is not None else int(os.getenv('retry_attempts', 3))
+        self.base_delay = base_delay if base_delay is not None else float(os.getenv('retry_base_delay', 0.2))
+        self.max_delay = max_delay if max_delay is not None else float(os.getenv('retry_max_delay', 2.0))
+        self.give_up = give_up
+
+    def delay(self, attempt: int) -> float:
+        return random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+
+    def hook(self, method: str, params: Dict[str, Any], call: Callable[[], Any]) -> Any:
+        """UpstreamClient hook retrying read-only methods."""
+        if not method.startswith(SAFE_PREFIXES):
+            return call()
+        for attempt in range(self.attempts - 1):
+            try:
+                return call()
+            except self.give_up:
+                raise
+            except Exception as e:
+                if not is_transient(e):
+                    raise
+                time.sleep(self.delay(attempt))
+        return call()
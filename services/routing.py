@@ -0,0 +1,44 @@
+import asyncio
+import functools
+from contextlib import ExitStack
+from typing import Callable, ContextManager, List
+
+from fastapi.routing import APIRoute
+
+# Wrappers take the endpoint name and return a context manager entered around each call
+EndpointWrapper = Callable[[str], ContextManager]
+
+
+class InstrumentedRoute(APIRoute):
+    """
+    Route class that runs every endpoint call inside the registered wrappers.
+
+    Sync endpoints run in FastAPI's threadpool, so wrappers (tracing spans,
+    per-thread profilers) run in the thread that does the endpoint's work.
+    Time in a request outside the endpoint call is parameter validation and
+    response serialization.
+    """
+
+    endpoint_wrappers: List[EndpointWrapper] = []
+
+    def get_route_handler(self):
+        call = self.dependant.call
+        name = call.__name__
+        wrappers = self.endpoint_wrappers
+
+        if asyncio.iscoroutinefunction(call):
+            @functools.wraps(call)
+            async def instrumented(*args, **kwargs):
+                with ExitStack() as stack:
+                    for wrapper in wrappers:
+                        stack.enter_context(wrapper(name))
+                    return await call(*args, **kwargs)
+        else:
+            @functools.wraps(call)
+            def instrumented(*args, **kwargs):
+                with ExitStack() as stack:
+                    for wrapper in wrappers:
+                        stack.enter_context(wrapper(name))
+                    return call(*args, **kwargs)
+        self.dependant.call = instrumented
+        return super().get_route_handler()
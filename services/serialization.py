@@ -0,0 +1,196 @@
+import os
+from functools import lru_cache
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple, Type, Union, get_args, get_origin
+
+import orjson
+from fastapi.responses import ORJSONResponse, Response
+from pydantic import BaseModel, TypeAdapter
+
+# Serve trusted upstream lists through the fast path instead of response_model validation
+TRUSTED_UPSTREAM_JSON = os.getenv('trusted_upstream_json', 'false').lower() in ('1', 'true', 'yes')
+
+
+# Marks a key missing from an upstream record, where None is a value
+_MISSING = object()
+
+
+def _converter(annotation: Any) -> Optional[Callable[[Any], Any]]:
+    """
+    Return a converter matching Pydantic's validation of a field's value, or None to pass it through.
+
+    Breeze sends numbers as strings (e.g. "quantity": "2"), which Pydantic turns
+    into ints and floats. Nested models (alone or in lists) are projected onto
+    their own fields. Other field types are passed through unchanged.
+    """
+    if get_origin(annotation) is Union:
+        args = [arg for arg in get_args(annotation) if arg is not type(None)]
+        annotation = args[0] if len(args) == 1 else None
+    if annotation is int:
+        return lambda value: value if value is None or type(value) is int else int(value)
+    if annotation is float:
+        return lambda value: value if value is None or type(value) is float else float(value)
+    if isinstance(annotation, type) and issubclass(annotation, BaseModel):
+        # Compiled on first use, so models may refer to themselves
+        return lambda value: value if value is None else compile_projection(annotation)(value)
+    if get_origin(annotation) is list and get_args(annotation):
+        convert = _converter(get_args(annotation)[0])
+        if convert is not None:
+            return lambda value: value if value is None else [convert(item) for item in value]
+    return None
+
+
+@lru_cache(maxsize=None)
+def compile_projection(model: Type[BaseModel]) -> Callable[[Dict[str, Any]], Dict[str, Any]]:
+    """
+    Compile a function that projects an upstream dict onto a model's fields.
+
+    The result has the same keys, defaults and numeric coercion as
+    `model.model_validate(item).model_dump(by_alias=True)`, as response_model
+    renders it: fields are read by their alias and written by their
+    serialization alias, excluded fields are left out and nested models are
+    projected in turn. It skips building the model, which is only safe for
+    data that is trusted to already match it.
+    """
+    fields = []
+    for name, field in model.model_fields.items():
+        if field.exclude:
+            continue
+        key = field.validation_alias if isinstance(field.validation_alias, str) else field.alias or name
+        keys = (key, name) if key != name and model.model_config.get("populate_by_name") else (key,)
+        default = None if field.is_required() else field.default
+        fields.append((field.serialization_alias or field.alias or name, keys, default, field.default_factory,
+                       _converter(field.annotation)))
+
+    if all(keys == (out,) and factory is None and convert is None for out, keys, _, factory, convert in fields):
+        plain = tuple((out, default) for out, _, default, _, _ in fields)
+
+        def project(item: Dict[str, Any]) -> Dict[str, Any]:
+            get = item.get
+            return {name: get(name, default) for name, default in plain}
+    else:
+        def project(item: Dict[str, Any]) -> Dict[str, Any]:
+            get = item.get
+            result = {}
+            for out, keys, default, factory, convert in fields:
+                for key in keys:
+                    value = get(key, _MISSING)
+                    if value is not _MISSING:
+                        break
+                if value is _MISSING:
+                    result[out] = default if factory is None else factory()
+                else:
+                    result[out] = value if convert is None else convert(value)
+            return result
+    return project
+
+
+@lru_cache(maxsize=None)
+def _list_adapter(model: Type[BaseModel]) -> TypeAdapter:
+    return TypeAdapter(List[model])
+
+
+def render_list(items: Iterable[Dict[str, Any]], model: Type[BaseModel]) -> bytes:
+    """
+    Render a list of upstream records declared as `List[model]` to JSON bytes.
+
+    Uses the trusted fast path when enabled, otherwise validates the records
+    against the model exactly as response_model would.
+    """
+    if TRUSTED_UPSTREAM_JSON:
+        project = compile_projection(model)
+        return orjson.dumps([project(item) for item in items])
+    adapter = _list_adapter(model)
+    return adapter.dump_json(adapter.validate_python(items), by_alias=True)
+
+
+def list_response(items: Iterable[Dict[str, Any]], model: Type[BaseModel]) -> Union[ORJSONResponse, Iterable]:
+    """
+    Serialize a list of upstream records declared as `List[model]`.
+
+    With trusted_upstream_json enabled the records are projected with a compiled
+    selector and encoded by orjson, bypassing response_model validation.
+    Otherwise they are returned as-is for FastAPI to validate and serialize.
+    """
+    if not TRUSTED_UPSTREAM_JSON:
+        return items
+    project = compile_projection(model)
+    return ORJSONResponse([project(item) for item in items])
+
+
+def parse_fields(fields: Optional[str]) -> Optional[Tuple[str, ...]]:
+    """Split a `fields=` query value into distinct, non-empty field paths."""
+    if not fields:
+        return None
+    return tuple(dict.fromkeys(f.strip() for f in fields.split(",") if f.strip())) or None
+
+
+def _normalize(name: str) -> str:
+    return "_".join(name.lower().split())
+
+
+def profile_field_aliases(sections: List[Dict[str, Any]]) -> Dict[str, Tuple[str, ...]]:
+    """
+    Map profile field names to their location in a person's details.
+
+    Names are lower-cased with spaces replaced by underscores, so the "Email"
+    field can be selected as `email` and "Marital Status" as `marital_status`.
+    """
+    aliases: Dict[str, Tuple[str, ...]] = {}
+    for section in sections or []:
+        for field in section.get("fields") or []:
+            if field.get("name") and field.get("field_id"):
+                aliases.setdefault(_normalize(field["name"]), ("details", str(field["field_id"])))
+    return aliases
+
+
+def _walk(value: Any, segments: Tuple[str, ...]) -> Any:
+    for segment in segments:
+        if isinstance(value, list):
+            if segment.isdigit():
+                index = int(segment)
+                value = value[index] if index < len(value) else None
+                continue
+            # Multi-valued profile fields (emails, phones, addresses) select their first entry
+            value = value[0] if value else None
+        if not isinstance(value, dict):
+            return None
+        value = value.get(segment)
+    return value
+
+
+def compile_selector(fields: Tuple[str, ...],
+                     aliases: Optional[Dict[str, Tuple[str, ...]]] = None) -> Callable[[Dict[str, Any]], Dict[str, Any]]:
+    """
+    Compile a `fields=` selection into a function producing flat dicts.
+
+    Each field is a dotted path into the record (`details.929778337.address`),
+    and the output is keyed by the path as requested. A first segment that is
+    not a key of the record is looked up in `aliases`, so profile fields can be
+    selected by name (`email.address`). Missing values come back as None.
+    """
+    aliases = aliases or {}
+    paths = []
+    for field in fields:
+        segments = tuple(field.split("."))
+        alias = aliases.get(_normalize(segments[0]))
+        paths.append((field, segments, alias + segments[1:] if alias else None))
+
+    def select(item: Dict[str, Any]) -> Dict[str, Any]:
+        return {key: _walk(item, alias_segments if alias_segments and segments[0] not in item else segments)
+                for key, segments, alias_segments in paths}
+    return select
+
+
+def render_selection(items: Union[Dict[str, Any], List[Dict[str, Any]]], fields: Tuple[str, ...],
+                     aliases: Optional[Dict[str, Tuple[str, ...]]] = None) -> bytes:
+    """Apply a `fields=` selection to one record or a list of records and render it as JSON."""
+    select = compile_selector(fields, aliases)
+    if isinstance(items, dict):
+        return orjson.dumps(select(items))
+    return orjson.dumps([select(item) for item in items])
+
+
+def select_response(items: Union[Dict[str, Any], List[Dict[str, Any]]], fields: Tuple[str, ...],
+                    aliases: Optional[Dict[str, Tuple[str, ...]]] = None) -> Response:
+    """Apply a `fields=` selection to one record or a list of records."""
+    return Response(render_selection(items, fields, aliases), media_type="application/json")
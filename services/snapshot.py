@@ -0,0 +1,494 @@
+import logging
+import mmap
+import os
+import struct
+import sys
+import tempfile
+import threading
+import time
+from array import array
+from collections import defaultdict
+from datetime import date, timedelta
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+import orjson
+
+from .tenants import current_tenant
+
+logger = logging.getLogger(__name__)
+
+MAGIC = b"BRZSNAP1"
+# Person keys stored as columns of string ids; everything else goes in the per-person record
+PERSON_COLUMNS = ("id", "first_name", "last_name", "path")
+# Column string id standing for None, so a null name reads back as null rather than ""
+_NONE_ID = 0xFFFFFFFF
+
+# Value encoding: a tag byte followed by its payload; strings are ids into the string table
+_NONE, _FALSE, _TRUE, _INT, _FLOAT, _STR, _LIST, _DICT = b"NFTidslm"
+_U32 = struct.Struct("<I")
+_I64 = struct.Struct("<q")
+_F64 = struct.Struct("<d")
+_HEADER = struct.Struct("<8sI")
+_I64_RANGE = range(-2 ** 63, 2 ** 63)
+
+
+class SnapshotError(Exception):
+    pass
+
+
+class _Encoder:
+    """Builds the string table and the encoded values of one snapshot, interning every string once."""
+
+    def __init__(self):
+        self.ids: Dict[str, int] = {}
+        self.values = bytearray()
+
+    def intern(self, value: str) -> int:
+        string_id = self.ids.get(value)
+        if string_id is None:
+            string_id = self.ids[value] = len(self.ids)
+        return string_id
+
+    def _encode(self, value: Any, out: bytearray) -> None:
+        if value is None:
+            out.append(_NONE)
+        elif value is True:
+            out.append(_TRUE)
+        elif value is False:
+            out.append(_FALSE)
+        elif isinstance(value, int) and value in _I64_RANGE:
+            out.append(_INT)
+            out += _I64.pack(value)
+        elif isinstance(value, float):
+            out.append(_FLOAT)
+            out += _F64.pack(value)
+        elif isinstance(value, dict):
+            out.append(_DICT)
+            out += _U32.pack(len(value))
+            for key, item in value.items():
+                out += _U32.pack(self.intern(str(key)))
+                self._encode(item, out)
+        elif isinstance(value, (list, tuple)):
+            out.append(_LIST)
+            out += _U32.pack(len(value))
+            for item in value:
+                self._encode(item, out)
+        else:
+            out.append(_STR)
+            out += _U32.pack(self.intern(str(value)))
+
+    def encode(self, value: Any) -> int:
+        """Append a value and return its offset in the values section."""
+        offset = len(self.values)
+        self._encode(value, self.values)
+        return offset
+
+    def strings(self) -> Tuple[array, bytes]:
+        offsets, blob = array("I", [0]), bytearray()
+        for value in self.ids:
+            blob += value.encode("utf-8")
+            offsets.append(len(blob))
+        return offsets, bytes(blob)
+
+
+def build_households(people: Iterable[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Group people into households by the family ids in their details."""
+    members: Dict[str, Dict[str, Dict[str, Any]]] = defaultdict(dict)
+    for person in people:
+        person_id = str(person.get("id"))
+        for relative in person.get("family") or []:
+            family_id = relative.get("family_id")
+            if family_id is None:
+                continue
+            household = members[str(family_id)]
+            household.setdefault(person_id, {"person_id": person_id, "role": None})
+            relative_id = str(relative.get("person_id"))
+            household[relative_id] = {"person_id": relative_id, "role": relative.get("role_name")}
+    return [{"id": family_id, "members": list(household.values())} for family_id, household in members.items()]
+
+
+def write_snapshot(path: str, tenant: str, people: List[Dict[str, Any]], **extras: Any) -> int:
+    """
+    Write a snapshot file atomically and return its size in bytes.
+
+    Besides people, a snapshot holds any named values passed as `extras`
+    (tags, households, events, ...), read back with Snapshot.extra().
+
+    The file is written next to `path` and renamed over it, so readers see
+    either the old or the new snapshot, never a partial one. Workers that
+    mapped the old file keep reading it until they reopen.
+    """
+    encoder = _Encoder()
+    columns = {name: array("I") for name in PERSON_COLUMNS}
+    records = array("I")
+    for person in people:
+        for name in PERSON_COLUMNS:
+            columns[name].append(_NONE_ID if person.get(name) is None else encoder.intern(str(person[name])))
+        records.append(encoder.encode({k: v for k, v in person.items() if k not in PERSON_COLUMNS}))
+    extra_offsets = {name: encoder.encode(value) for name, value in extras.items()}
+    string_offsets, string_blob = encoder.strings()
+
+    sections = [("string_offsets", string_offsets.tobytes()), ("strings", string_blob)]
+    sections += [(f"column:{name}", columns[name].tobytes()) for name in PERSON_COLUMNS]
+    sections += [("records", records.tobytes()), ("values", bytes(encoder.values))]
+    layout, position = {}, 0
+    for name, data in sections:
+        layout[name] = (position, len(data))
+        # Keep every section 4-byte aligned so u32 arrays can be cast in place
+        position += len(data) + (-len(data) % 4)
+    header = orjson.dumps({
+        "tenant": tenant,
+        "created_at": time.time(),
+        "byteorder": sys.byteorder,
+        "people": len(people),
+        "strings": len(encoder.ids),
+        "sections": layout,
+        "extras": extra_offsets,
+    })
+    header += b" " * (-(_HEADER.size + len(header)) % 4)
+
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, tmp_path = tempfile.mkstemp(prefix=".snapshot-", dir=directory)
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(_HEADER.pack(MAGIC, len(header)))
+            f.write(header)
+            for _, data in sections:
+                f.write(data)
+                f.write(b"\0" * (-len(data) % 4))
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+    return os.path.getsize(path)
+
+
+class Snapshot:
+    """
+    A snapshot file mapped read-only into memory.
+
+    Nothing is decoded up front: the pages are shared with every other process
+    mapping the same file, and people, tags and households are decoded when
+    accessed. Strings are decoded once per process.
+    """
+
+    def __init__(self, path: str):
+        with open(path, "rb") as f:
+            self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            stat = os.fstat(f.fileno())
+        # Identifies the file mapped; a rewrite replaces it with a new inode
+        self.identity = (stat.st_ino, stat.st_mtime_ns)
+        magic, header_size = _HEADER.unpack_from(self._map, 0)
+        if magic != MAGIC:
+            raise SnapshotError(f"{path} is not a snapshot")
+        header = orjson.loads(self._map[_HEADER.size:_HEADER.size + header_size])
+        if header["byteorder"] != sys.byteorder:
+            raise SnapshotError(f"{path} was written on a {header['byteorder']}-endian machine")
+        self.path = path
+        self.tenant: str = header["tenant"]
+        self.created_at: float = header["created_at"]
+        self._extras: Dict[str, int] = header["extras"]
+        base = _HEADER.size + header_size
+        self._sections = {name: (base + offset, size) for name, (offset, size) in header["sections"].items()}
+        self._view = memoryview(self._map)
+        self._string_offsets = self._u32("string_offsets")
+        self._string_base = self._sections["strings"][0]
+        self._strings: List[Optional[str]] = [None] * header["strings"]
+        self._columns = {name: self._u32(f"column:{name}") for name in PERSON_COLUMNS}
+        self._records = self._u32("records")
+        self._values_base = self._sections["values"][0]
+
+    def _u32(self, name: str) -> memoryview:
+        offset, size = self._sections[name]
+        return self._view[offset:offset + size].cast("I")
+
+    @property
+    def age(self) -> float:
+        return time.time() - self.created_at
+
+    def string(self, string_id: int) -> str:
+        value = self._strings[string_id]
+        if value is None:
+            start = self._string_base + self._string_offsets[string_id]
+            end = self._string_base + self._string_offsets[string_id + 1]
+            value = self._strings[string_id] = str(self._map[start:end], "utf-8")
+        return value
+
+    def _decode(self, position: int) -> Tuple[Any, int]:
+        data = self._map
+        tag = data[position]
+        position += 1
+        if tag == _STR:
+            return self.string(_U32.unpack_from(data, position)[0]), position + 4
+        if tag == _DICT:
+            count = _U32.unpack_from(data, position)[0]
+            position += 4
+            result = {}
+            for _ in range(count):
+                key = self.string(_U32.unpack_from(data, position)[0])
+                result[key], position = self._decode(position + 4)
+            return result, position
+        if tag == _LIST:
+            count = _U32.unpack_from(data, position)[0]
+            position += 4
+            items = []
+            for _ in range(count):
+                item, position = self._decode(position)
+                items.append(item)
+            return items, position
+        if tag == _INT:
+            return _I64.unpack_from(data, position)[0], position + 8
+        if tag == _FLOAT:
+            return _F64.unpack_from(data, position)[0], position + 8
+        if tag == _NONE:
+            return None, position
+        if tag in (_TRUE, _FALSE):
+            return tag == _TRUE, position
+        raise SnapshotError(f"Corrupt value at byte {position - 1} of {self.path}")
+
+    def value(self, offset: int) -> Any:
+        return self._decode(self._values_base + offset)[0]
+
+    def person(self, index: int, details: bool = True) -> Dict[str, Any]:
+        person = {}
+        for name in PERSON_COLUMNS:
+            string_id = self._columns[name][index]
+            person[name] = None if string_id == _NONE_ID else self.string(string_id)
+        if details:
+            person.update(self.value(self._records[index]))
+        return person
+
+    def people(self, details: bool = True) -> "SnapshotPeople":
+        return SnapshotPeople(self, details)
+
+    def extra(self, name: str, default: Any = None) -> Any:
+        """Decode one of the named values the snapshot was written with."""
+        offset = self._extras.get(name)
+        return default if offset is None else self.value(offset)
+
+    @property
+    def tag_folders(self) -> Any:
+        return self.extra("tag_folders")
+
+    @property
+    def tags(self) -> Any:
+        return self.extra("tags")
+
+    @property
+    def households(self) -> Any:
+        return self.extra("households")
+
+    @property
+    def profile_fields(self) -> Any:
+        return self.extra("profile_fields")
+
+    def close(self) -> None:
+        self._view.release()
+        self._map.close()
+
+
+class SnapshotPeople(Sequence):
+    """The people of a snapshot as a read-only list, decoding each person when it is read."""
+
+    def __init__(self, snapshot: Snapshot, details: bool):
+        self.snapshot = snapshot
+        self.details = details
+
+    def __len__(self) -> int:
+        return len(self.snapshot._records)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self.snapshot.person(i, self.details) for i in range(*index.indices(len(self)))]
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError(index)
+        return self.snapshot.person(index, self.details)
+
+
+def fetch_directory(api: Any, event_days: int = 0) -> Dict[str, Any]:
+    """
+    Read what a snapshot holds from Breeze: people (with details), tag folders,
+    tags and profile fields, plus the events from `event_days` before to
+    `event_days` after today.
+    """
+    people = api.get_people(details=True) or []
+    today = date.today()
+    window = [(today - timedelta(days=event_days)).isoformat(), (today + timedelta(days=event_days)).isoformat()]
+    return {
+        "people": people,
+        "tag_folders": api.get_tag_folders(),
+        "tags": api.get_tags(),
+        "households": build_households(people),
+        "profile_fields": api.get_profile_fields(),
+        "events": api.get_events(start_date=window[0], end_date=window[1]) if event_days else [],
+        "events_window": window if event_days else None,
+    }
+
+
+class SnapshotSync:
+    """
+    Keeps one snapshot file per tenant in `directory` and loads them into workers.
+
+    load() maps each tenant's snapshot and passes it to `seed` (which puts it
+    in the cache), so a restarted worker serves the directory straight away;
+    current() is the mapped snapshot cache misses are then loaded from. The
+    background sync re-reads the directory from Breeze every `interval`
+    seconds, rewrites the snapshot and seeds the cache from the new file.
+
+    With several workers only the `leader` syncs; the others check every
+    `poll` seconds for snapshots it rewrote and map those instead, so the
+    directory is read from Breeze once however many workers serve it.
+    """
+
+    def __init__(self, directory: str, interval: float, seed: Callable[[Snapshot], None],
+                 leader: Optional[Any] = None, event_days: int = 0, poll: float = 2.0):
+        self.directory = directory
+        self.interval = interval
+        self.seed = seed
+        self.leader = leader
+        self.event_days = event_days
+        self.poll = poll
+        self.snapshots: Dict[str, Snapshot] = {}
+        # Tenants written to since their snapshot was mapped, whose reads go to Breeze until a newer one is
+        self._outdated: set = set()
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        os.makedirs(directory, exist_ok=True)
+
+    def path(self, tenant: str) -> str:
+        return os.path.join(self.directory, f"{tenant}.snapshot")
+
+    def _install(self, tenant: str, snapshot: Snapshot) -> None:
+        token = current_tenant.set(tenant)
+        try:
+            self.seed(snapshot)
+        finally:
+            current_tenant.reset(token)
+        with self._lock:
+            # The previous snapshot is not closed: cached views may still read from it, and it is unmapped once they are dropped
+            self.snapshots[tenant] = snapshot
+            self._outdated.discard(tenant)
+
+    @property
+    def leading(self) -> bool:
+        return self.leader is None or self.leader.is_leader
+
+    def _changed(self, tenant: str) -> bool:
+        try:
+            stat = os.stat(self.path(tenant))
+        except FileNotFoundError:
+            return False
+        snapshot = self.snapshots.get(tenant)
+        return snapshot is None or snapshot.identity != (stat.st_ino, stat.st_mtime_ns)
+
+    def load(self, tenants: Iterable[str]) -> int:
+        """Map and seed each tenant's snapshot file if it is new or was rewritten; returns how many were loaded."""
+        loaded = 0
+        for tenant in tenants:
+            path = self.path(tenant)
+            if not self._changed(tenant):
+                continue
+            try:
+                self._install(tenant, Snapshot(path))
+                loaded += 1
+            except (OSError, ValueError, KeyError, SnapshotError):
+                logger.exception("Could not load snapshot %s", path)
+        return loaded
+
+    def sync(self, tenant: str, api: Any) -> int:
+        """Rewrite a tenant's snapshot from Breeze and seed the cache from it; returns its size."""
+        token = current_tenant.set(tenant)
+        try:
+            data = fetch_directory(api, self.event_days)
+        finally:
+            current_tenant.reset(token)
+        size = write_snapshot(self.path(tenant), tenant, **data)
+        self._install(tenant, Snapshot(self.path(tenant)))
+        return size
+
+    def _next_due(self, tenants: List[str]) -> float:
+        """Seconds until the oldest tenant snapshot is due for a rewrite (at least one)."""
+        ages = [self.snapshots[t].age if t in self.snapshots else self.interval for t in tenants]
+        return max(1.0, self.interval - max(ages, default=0.0))
+
+    def current(self) -> Optional[Snapshot]:
+        """The current tenant's mapped snapshot, or None if none has been loaded or it is outdated."""
+        tenant = current_tenant.get()
+        if tenant in self._outdated:
+            return None
+        return self.snapshots.get(tenant)
+
+    def invalidate(self) -> None:
+        """Stop serving the current tenant's snapshot after a write through this worker, until a newer one is mapped."""
+        with self._lock:
+            self._outdated.add(current_tenant.get())
+
+    def events(self, start_date: str, end_date: str) -> Optional[List[Dict[str, Any]]]:
+        """
+        Events starting between two dates from the current tenant's snapshot.
+
+        Returns None when the snapshot's event window does not cover the dates,
+        or the snapshot is more than two sync intervals old.
+        """
+        snapshot = self.current()
+        if snapshot is None or snapshot.age > 2 * self.interval:
+            return None
+        window = snapshot.extra("events_window")
+        if not window or start_date < window[0] or end_date > window[1]:
+            return None
+        return [event for event in snapshot.extra("events") or []
+                if start_date <= str(event.get("start_datetime") or "")[:10] <= end_date]
+
+    def start(self, tenants: Iterable[str], client: Callable[[str], Any]) -> None:
+        """
+        Start a background thread that, while this worker leads, syncs every tenant
+        whose snapshot is older than `interval`, and otherwise maps rewritten snapshots.
+        """
+        tenants = list(tenants)
+
+        def run():
+            while not self._stop.is_set():
+                if not self.leading:
+                    self.load(tenants)
+                    self._stop.wait(self.poll)
+                    continue
+                for tenant in tenants:
+                    snapshot = self.snapshots.get(tenant)
+                    if snapshot is not None and snapshot.age < self.interval:
+                        continue
+                    try:
+                        self.sync(tenant, client(tenant))
+                    except Exception:
+                        logger.exception("Snapshot sync failed for tenant %s", tenant)
+                self._stop.wait(self._next_due(tenants))
+
+        self._stop.clear()
+        self._thread = threading.Thread(target=run, name="snapshot-sync", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float = 10.0) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+
+
+def open_sync(seed: Callable[[Snapshot], None], leader: Optional[Any] = None,
+              default_dir: Optional[str] = None) -> Optional[SnapshotSync]:
+    """Create the snapshot sync if snapshot_dir (or `default_dir`) is set, else return None."""
+    directory = os.getenv('snapshot_dir', default_dir)
+    if not directory:
+        return None
+    return SnapshotSync(
+        directory,
+        float(os.getenv('snapshot_interval', 900)),
+        seed,
+        leader=leader,
+        event_days=int(os.getenv('snapshot_event_days', 31)),
+        poll=float(os.getenv('snapshot_poll', 2)),
+    )
@@ -0,0 +1,344 @@
+import csv
+import html
+import io
+import logging
+import multiprocessing
+import os
+import shutil
+import threading
+import time
+import uuid
+import zipfile
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
+from decimal import Decimal
+from typing import Any, Callable, Dict, Iterable, Iterator, List, NamedTuple, Optional, Tuple
+
+import orjson
+
+from .contributions import to_decimal
+from .tenants import current_tenant
+
+logger = logging.getLogger(__name__)
+
+FORMATS = ("html", "csv")
+# Profile field selections (see serialization.compile_selector) making up a donor's mailing address
+ADDRESS_FIELDS = ("address.street_address", "address.city", "address.state", "address.zip")
+# Donors rendered per task sent to a worker process
+CHUNK_SIZE = 50
+# Below this many donors, rendering in worker processes costs more than it saves
+PARALLEL_MIN_DONORS = 200
+# Worker processes are started fresh rather than forked: the server's other threads may hold locks a fork would copy
+START_METHOD = "spawn"
+
+QUEUED = "queued"
+FETCHING = "fetching"
+RENDERING = "rendering"
+DONE = "done"
+FAILED = "failed"
+
+
+class StatementError(Exception):
+    """Raised for unknown statement jobs, or downloads of jobs that have not finished."""
+
+    def __init__(self, message: str, status_code: int):
+        super().__init__(message)
+        self.status_code = status_code
+
+
+class Gift(NamedTuple):
+    day: str
+    amount: Decimal
+    method: str
+    # (fund name, amount) for each fund the gift was split across
+    funds: Tuple[Tuple[str, Decimal], ...]
+
+
+class Donor(NamedTuple):
+    person_id: str
+    name: str
+    # Mailing address lines, if known
+    address: Tuple[str, ...]
+    gifts: Tuple[Gift, ...]
+
+
+def _gift(contribution: Dict[str, Any]) -> Gift:
+    funds = tuple((str(f.get("name") or f.get("fund_id") or f.get("id") or ""), to_decimal(f.get("amount")))
+                  for f in contribution.get("funds") or [])
+    return Gift(
+        day=str(contribution.get("paid_on") or contribution.get("date") or "")[:10],
+        amount=to_decimal(contribution.get("amount")),
+        method=str(contribution.get("method") or contribution.get("method_name") or ""),
+        funds=funds,
+    )
+
+
+def donor_directory(people: Iterable[Dict[str, Any]],
+                    select: Callable[[Dict[str, Any]], Dict[str, Any]]) -> Dict[str, Dict[str, Any]]:
+    """Name and address lines of each person, with `select` picking the ADDRESS_FIELDS from their details."""
+    directory = {}
+    for person in people:
+        address = select(person)
+        city = " ".join(filter(None, [", ".join(filter(None, [address["address.city"], address["address.state"]])),
+                                      address["address.zip"]]))
+        directory[str(person.get("id"))] = {
+            "name": " ".join(filter(None, [person.get("first_name"), person.get("last_name")])),
+            "address": [address["address.street_address"], city],
+        }
+    return directory
+
+
+def group_by_donor(contributions: Iterable[Dict[str, Any]],
+                   people: Optional[Dict[str, Dict[str, Any]]] = None) -> List[Donor]:
+    """
+    Group a year's contributions by person_id in one pass.
+
+    `people` maps person ids to their `name` and `address` lines; otherwise the
+    name on the contribution is used. Gifts are sorted by date and donors by name.
+    """
+    people = people or {}
+    gifts: Dict[str, List[Gift]] = defaultdict(list)
+    names: Dict[str, str] = {}
+    for contribution in contributions:
+        person_id = str(contribution.get("person_id") or "")
+        if not person_id:
+            continue
+        gifts[person_id].append(_gift(contribution))
+        if person_id not in names:
+            names[person_id] = " ".join(filter(None, [contribution.get("first_name"), contribution.get("last_name")]))
+    donors = []
+    for person_id, person_gifts in gifts.items():
+        person = people.get(person_id) or {}
+        donors.append(Donor(
+            person_id=person_id,
+            name=person.get("name") or names[person_id] or f"Person {person_id}",
+            address=tuple(line for line in person.get("address") or () if line),
+            gifts=tuple(sorted(person_gifts)),
+        ))
+    donors.sort(key=lambda donor: (donor.name.lower(), donor.person_id))
+    return donors
+
+
+def fund_totals(donor: Donor) -> Dict[str, Decimal]:
+    totals: Dict[str, Decimal] = defaultdict(Decimal)
+    for gift in donor.gifts:
+        if gift.funds:
+            for fund, amount in gift.funds:
+                totals[fund] += amount
+        else:
+            totals[""] += gift.amount
+    return dict(sorted(totals.items()))
+
+
+def render_html(donor: Donor, year: int, organization: str = "") -> bytes:
+    """A printable giving statement for one donor."""
+    e = html.escape
+    total = sum((gift.amount for gift in donor.gifts), Decimal(0))
+    rows = "".join(
+        f"<tr><td>{e(gift.day)}</td><td>{e(gift.method)}</td>"
+        f"<td>{e(', '.join(fund for fund, _ in gift.funds))}</td><td class=\"amount\">{gift.amount:.2f}</td></tr>"
+        for gift in donor.gifts
+    )
+    funds = "".join(f"<tr><td>{e(fund or 'Unassigned')}</td><td class=\"amount\">{amount:.2f}</td></tr>"
+                    for fund, amount in fund_totals(donor).items())
+    address = "".join(f"<br>{e(line)}" for line in donor.address)
+    return (
+        "<!DOCTYPE html><html><head><meta charset=\"utf-8\">"
+        f"<title>{year} Giving Statement - {e(donor.name)}</title>"
+        "<style>body{font-family:sans-serif;margin:2em}table{border-collapse:collapse;width:100%;margin-bottom:1.5em}"
+        "td,th{border-bottom:1px solid #ccc;padding:4px;text-align:left}.amount{text-align:right}</style></head><body>"
+        f"<h1>{e(organization)}</h1><h2>{year} Giving Statement</h2>"
+        f"<p><strong>{e(donor.name)}</strong>{address}</p>"
+        "<table><tr><th>Date</th><th>Method</th><th>Funds</th><th class=\"amount\">Amount</th></tr>"
+        f"{rows}</table>"
+        "<table><tr><th>Fund</th><th class=\"amount\">Total</th></tr>"
+        f"{funds}<tr><th>Total</th><th class=\"amount\">{total:.2f}</th></tr></table>"
+        "<p>No goods or services were provided in exchange for these contributions.</p>"
+        "</body></html>"
+    ).encode("utf-8")
+
+
+def render_csv(donor: Donor, year: int, organization: str = "") -> bytes:
+    """One row per gift and fund, for importing statements elsewhere."""
+    out = io.StringIO()
+    writer = csv.writer(out)
+    writer.writerow(["person_id", "name", "date", "method", "fund", "amount"])
+    for gift in donor.gifts:
+        for fund, amount in gift.funds or (("", gift.amount),):
+            writer.writerow([donor.person_id, donor.name, gift.day, gift.method, fund, f"{amount:.2f}"])
+    return out.getvalue().encode("utf-8")
+
+
+RENDERERS = {"html": render_html, "csv": render_csv}
+
+
+def _filename(donor: Donor, fmt: str) -> str:
+    safe = "".join(c if c.isalnum() else "-" for c in donor.name).strip("-") or "donor"
+    return f"{fmt}/{safe}-{donor.person_id}.{fmt}"
+
+
+def render_chunk(donors: List[Donor], year: int, formats: Tuple[str, ...],
+                 organization: str = "") -> List[Tuple[str, bytes]]:
+    """Render every statement of a chunk of donors as (archive name, content) pairs."""
+    return [(_filename(donor, fmt), RENDERERS[fmt](donor, year, organization)) for donor in donors for fmt in formats]
+
+
+def render_all(donors: List[Donor], year: int, formats: Tuple[str, ...], organization: str = "",
+               workers: Optional[int] = None) -> Iterator[Tuple[int, List[Tuple[str, bytes]]]]:
+    """
+    Render statements chunk by chunk, yielding (donors rendered, files) in donor order.
+
+    Large jobs are spread over `workers` processes (default: one per CPU).
+    """
+    chunks = [donors[i:i + CHUNK_SIZE] for i in range(0, len(donors), CHUNK_SIZE)]
+    workers = workers or os.cpu_count() or 1
+    if workers == 1 or len(donors) < PARALLEL_MIN_DONORS:
+        for chunk in chunks:
+            yield len(chunk), render_chunk(chunk, year, formats, organization)
+        return
+    with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context(START_METHOD)) as pool:
+        n = len(chunks)
+        results = pool.map(render_chunk, chunks, [year] * n, [formats] * n, [organization] * n)
+        for chunk, files in zip(chunks, results):
+            yield len(chunk), files
+
+
+def summary_csv(donors: List[Donor]) -> bytes:
+    """Every donor's total per fund, for checking the statements against the books."""
+    out = io.StringIO()
+    writer = csv.writer(out)
+    writer.writerow(["person_id", "name", "gifts", "fund", "amount"])
+    for donor in donors:
+        for fund, amount in fund_totals(donor).items():
+            writer.writerow([donor.person_id, donor.name, len(donor.gifts), fund, f"{amount:.2f}"])
+    return out.getvalue().encode("utf-8")
+
+
+class StatementJobs:
+    """
+    Year-end giving statement jobs, kept under `directory`.
+
+    Each job fetches the year's contributions in one list_contributions call,
+    groups them by donor, renders the statements (in worker processes for
+    large jobs) and writes them into a zip archive as they are rendered. Its
+    progress is kept in a status file next to the archive, so any worker
+    process can report on it and serve the download. Finished jobs are
+    deleted `ttl` seconds after they finish, when the next job starts.
+    """
+
+    def __init__(self, directory: str, workers: Optional[int] = None, organization: str = "", ttl: float = 604800.0):
+        self.directory = directory
+        self.workers = workers
+        self.organization = organization
+        self.ttl = ttl
+
+    def _path(self, job_id: str, name: str) -> str:
+        if not job_id.isalnum():
+            raise StatementError(f"Statement job not found: {job_id}", 404)
+        return os.path.join(self.directory, job_id, name)
+
+    def _save(self, job_id: str, status: Dict[str, Any]) -> None:
+        path = self._path(job_id, "status.json")
+        with open(path + ".tmp", "wb") as f:
+            f.write(orjson.dumps(status))
+        os.replace(path + ".tmp", path)
+
+    def status(self, job_id: str) -> Dict[str, Any]:
+        """Status of a job of the current tenant: state, donors rendered out of the total, and any error."""
+        try:
+            with open(self._path(job_id, "status.json"), "rb") as f:
+                status = orjson.loads(f.read())
+        except FileNotFoundError:
+            raise StatementError(f"Statement job not found: {job_id}", 404)
+        if status["tenant"] != current_tenant.get():
+            raise StatementError(f"Statement job not found: {job_id}", 404)
+        return status
+
+    def archive(self, job_id: str) -> str:
+        """Path of a finished job's zip archive."""
+        status = self.status(job_id)
+        if status["state"] != DONE:
+            raise StatementError(f"Statement job {job_id} is {status['state']}", 409)
+        return self._path(job_id, "statements.zip")
+
+    def expire(self) -> int:
+        """Delete the jobs of every tenant that finished (or started) more than `ttl` seconds ago; returns how many were deleted."""
+        try:
+            job_ids = os.listdir(self.directory)
+        except FileNotFoundError:
+            return 0
+        cutoff = time.time() - self.ttl
+        expired = 0
+        for job_id in job_ids:
+            path = os.path.join(self.directory, job_id)
+            try:
+                with open(os.path.join(path, "status.json"), "rb") as f:
+                    status = orjson.loads(f.read())
+                # A job still unfinished after `ttl` was interrupted by a restart
+                finished_at = status["finished_at"] or status["created_at"]
+            except (OSError, ValueError, KeyError):
+                # Without a readable status, judge by the directory's age
+                finished_at = os.path.getmtime(path) if os.path.isdir(path) else None
+            if finished_at is not None and finished_at < cutoff:
+                shutil.rmtree(path, ignore_errors=True)
+                expired += 1
+        return expired
+
+    def start(self, year: int, formats: Tuple[str, ...], fetch: Callable[[str, str], List[Dict[str, Any]]],
+              people: Callable[[], Dict[str, Dict[str, Any]]]) -> Dict[str, Any]:
+        """
+        Start a statement job for the current tenant in a background thread.
+
+        - **fetch**: Returns the contributions between two dates (one bulk call)
+        - **people**: Returns donor names and addresses by person id
+        """
+        self.expire()
+        job_id = uuid.uuid4().hex
+        os.makedirs(os.path.join(self.directory, job_id))  # also creates the statement directory on first use
+        status = {"id": job_id, "tenant": current_tenant.get(), "year": year, "formats": list(formats),
+                  "state": QUEUED, "donors": None, "rendered": 0, "contributions": None,
+                  "error": None, "created_at": time.time(), "finished_at": None}
+        self._save(job_id, status)
+        thread = threading.Thread(target=self._run, args=(status, fetch, people),
+                                  name=f"statements-{job_id}", daemon=True)
+        thread.start()
+        return status
+
+    def _run(self, status: Dict[str, Any], fetch: Callable[[str, str], List[Dict[str, Any]]],
+             people: Callable[[], Dict[str, Dict[str, Any]]]) -> None:
+        job_id, year, formats = status["id"], status["year"], tuple(status["formats"])
+        token = current_tenant.set(status["tenant"])
+        try:
+            status["state"] = FETCHING
+            self._save(job_id, status)
+            contributions = fetch(f"{year}-01-01", f"{year}-12-31") or []
+            donors = group_by_donor(contributions, people())
+            status.update(state=RENDERING, donors=len(donors), contributions=len(contributions))
+            self._save(job_id, status)
+
+            path = self._path(job_id, "statements.zip")
+            with zipfile.ZipFile(path + ".tmp", "w", zipfile.ZIP_DEFLATED) as archive:
+                for rendered, files in render_all(donors, year, formats, self.organization, self.workers):
+                    for name, content in files:
+                        archive.writestr(name, content)
+                    status["rendered"] += rendered
+                    self._save(job_id, status)
+                archive.writestr("summary.csv", summary_csv(donors))
+            os.replace(path + ".tmp", path)
+            status["state"] = DONE
+        except Exception as e:
+            logger.exception("Statement job %s failed", job_id)
+            status.update(state=FAILED, error=str(e))
+        finally:
+            current_tenant.reset(token)
+            status["finished_at"] = time.time()
+            self._save(job_id, status)
+
+
+def open_jobs() -> StatementJobs:
+    return StatementJobs(
+        os.getenv('statement_dir', 'statements'),
+        workers=int(os.getenv('statement_workers', 0)) or None,
+        organization=os.getenv('statement_organization', ''),
+        ttl=float(os.getenv('statement_ttl', 604800)),
+    )
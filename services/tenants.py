@@ -0,0 +1,224 @@
+import json
+import os
+import threading
+import time
+from contextvars import ContextVar
+from typing import Any, Callable, Dict, Iterable, Optional
+
+from starlette.responses import JSONResponse
+
+from .circuit import CircuitBreakers, CircuitOpen
+from .retry import RetryPolicy
+from .upstream import UpstreamClient, UpstreamHook
+from .workers import WORKERS
+
+DEFAULT_TENANT = "default"
+# Tenants are selected by this header or by a /t/{tenant}/ path prefix
+TENANT_HEADER = "x-breeze-tenant"
+TENANT_PATH_PREFIX = "/t/"
+
+# Tenant of the request being handled; scopes cache keys and picks the Breeze client
+current_tenant: ContextVar[str] = ContextVar("current_tenant", default=DEFAULT_TENANT)
+# Longest the current request may wait for an upstream rate limit slot (None: the limiter's max_wait)
+wait_budget: ContextVar[Optional[float]] = ContextVar("wait_budget", default=None)
+
+
+class UnknownTenant(Exception):
+    pass
+
+
+class RateLimitExceeded(Exception):
+    """Raised when a call cannot get an upstream rate limit slot within its wait budget."""
+
+    def __init__(self, message: str, retry_after: float):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class Overloaded(RateLimitExceeded):
+    """Raised instead when the wait would exceed the current request's wait_budget, so the request is shed."""
+
+
+class RateLimiter:
+    """
+    Token bucket for one Breeze account, shared by every thread calling it.
+
+    Allows `rate` calls per second with bursts of up to `burst`. Callers over
+    budget reserve the next free slot and sleep until it comes up, so they are
+    served in arrival order. A call is rejected with RateLimitExceeded instead
+    if it would wait more than `max_wait` seconds or `max_waiting` callers are
+    already queued, so a noisy tenant cannot tie up every worker thread.
+    Requests with a shorter wait_budget (see services.admission) are shed with
+    Overloaded once the queue ahead of them is longer than their budget, which
+    keeps the rest of the queue for requests without one, such as check-ins.
+    """
+
+    def __init__(self, rate: float, burst: Optional[float] = None, max_wait: float = 10.0, max_waiting: int = 20):
+        self.rate = rate
+        self.burst = burst or max(1.0, rate)
+        self.max_wait = max_wait
+        self.max_waiting = max_waiting
+        self.waiting = 0
+        self._tokens = self.burst
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def reserve(self) -> float:
+        """Take a slot and return how long to wait for it, or raise RateLimitExceeded."""
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            if self._tokens >= 1:
+                self._tokens -= 1
+                return 0.0
+            wait = (1 - self._tokens) / self.rate
+            budget = wait_budget.get()
+            if budget is not None and wait > budget:
+                raise Overloaded("Breeze is busy, request shed", retry_after=wait)
+            if wait > self.max_wait or self.waiting >= self.max_waiting:
+                raise RateLimitExceeded("Upstream rate limit exceeded", retry_after=wait)
+            self._tokens -= 1
+            self.waiting += 1
+            return wait
+
+    def acquire(self) -> None:
+        wait = self.reserve()
+        if wait:
+            try:
+                time.sleep(wait)
+            finally:
+                with self._lock:
+                    self.waiting -= 1
+
+    def hook(self, method: str, params: Dict[str, Any], call: Callable[[], Any]) -> Any:
+        """UpstreamClient hook taking a slot before each call."""
+        self.acquire()
+        return call()
+
+
+def load_tenant_configs() -> Dict[str, Dict[str, Any]]:
+    """
+    Read the Breeze accounts this deployment serves.
+
+    The `breeze_url`/`api_key` settings define the "default" tenant. A JSON file
+    named by `tenants_file` can add more, keyed by tenant name:
+
+        {"north": {"breeze_url": "https://north.breezechms.com", "api_key": "...",
+                   "rate_limit": 5, "burst": 10}}
+    """
+    configs: Dict[str, Dict[str, Any]] = {}
+    if os.getenv('breeze_url'):
+        configs[DEFAULT_TENANT] = {"breeze_url": os.getenv('breeze_url'), "api_key": os.getenv('api_key')}
+    path = os.getenv('tenants_file')
+    if path:
+        with open(path) as f:
+            configs.update(json.load(f))
+    if not configs:
+        # Keep the single-account behaviour: BreezeApi reports the missing settings
+        configs[DEFAULT_TENANT] = {"breeze_url": None, "api_key": None}
+    return configs
+
+
+class TenantPool:
+    """
+    One UpstreamClient per tenant, each with its own rate limiter and circuit breakers.
+
+    Read-only calls are retried outside the limiter and breakers, so every
+    attempt takes a rate limit slot and counts towards the circuit. With
+    several worker processes each gets an equal share of a tenant's rate limit.
+
+    Parameters:
+    - **configs**: Tenant settings from load_tenant_configs()
+    - **hooks**: UpstreamClient hooks added to every tenant's client, after its retries, rate limiter and circuit breakers
+    - **api_factory**: Builds the API object for a tenant (defaults to BreezeApi)
+    """
+
+    def __init__(self, configs: Dict[str, Dict[str, Any]], hooks: Iterable[UpstreamHook] = (),
+                 api_factory: Optional[Callable[..., Any]] = None):
+        if api_factory is None:
+            from pyBreezeChMS.breeze.breeze import BreezeApi
+            api_factory = BreezeApi
+        default_rate = float(os.getenv('breeze_rate_limit', 0))
+        self.clients: Dict[str, UpstreamClient] = {}
+        self.limiters: Dict[str, RateLimiter] = {}
+        self.breakers: Dict[str, CircuitBreakers] = {}
+        retry = RetryPolicy(give_up=(RateLimitExceeded, CircuitOpen))
+        for name, config in configs.items():
+            client = UpstreamClient(api_factory(breeze_url=config["breeze_url"], api_key=config["api_key"]))
+            client.add_hook(retry.hook)
+            rate = float(config.get("rate_limit", default_rate)) / WORKERS
+            if rate:
+                limiter = self.limiters[name] = RateLimiter(rate, config.get("burst"))
+                client.add_hook(limiter.hook)
+            # Inside the limiter, so time spent waiting for a slot never counts as a slow call
+            breakers = self.breakers[name] = CircuitBreakers()
+            client.add_hook(breakers.hook)
+            for hook in hooks:
+                client.add_hook(hook)
+            self.clients[name] = client
+
+    @property
+    def names(self):
+        return self.clients.keys()
+
+    def client(self, name: Optional[str] = None) -> UpstreamClient:
+        """Return the client for a tenant, by default the current request's tenant."""
+        name = name or current_tenant.get()
+        try:
+            return self.clients[name]
+        except KeyError:
+            raise UnknownTenant(f"Unknown tenant: {name}")
+
+
+class TenantProxy:
+    """Stands in for a single BreezeApi, forwarding each call to the current tenant's client."""
+
+    def __init__(self, pool: TenantPool):
+        self.pool = pool
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self.pool.client(), name)
+
+
+class TenantMiddleware:
+    """
+    ASGI middleware selecting the tenant for each request.
+
+    The tenant comes from a `/t/{tenant}/` path prefix, which is stripped before
+    routing, or else from the `X-Breeze-Tenant` header, or else `default`.
+    Requests for tenants that are not configured get a 404.
+    """
+
+    def __init__(self, app, tenants: Iterable[str], default: str = DEFAULT_TENANT):
+        self.app = app
+        self.tenants = set(tenants)
+        self.default = default
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        tenant = None
+        if scope["path"].startswith(TENANT_PATH_PREFIX):
+            tenant, _, rest = scope["path"][len(TENANT_PATH_PREFIX):].partition("/")
+            # Rewritten in place so outer middleware sees the routed path too
+            scope["path"] = "/" + rest
+            scope["raw_path"] = scope["path"].encode()
+        if not tenant:
+            for key, value in scope["headers"]:
+                if key == TENANT_HEADER.encode():
+                    tenant = value.decode("latin-1")
+                    break
+        tenant = tenant or self.default
+
+        if tenant not in self.tenants:
+            response = JSONResponse({"detail": f"Unknown tenant: {tenant}"}, status_code=404)
+            await response(scope, receive, send)
+            return
+        token = current_tenant.set(tenant)
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            current_tenant.reset(token)
@@ -0,0 +1,127 @@
+import os
+from typing import Any, Callable, Dict, Optional
+
+from opentelemetry import propagate, trace
+from opentelemetry.sdk.resources import Resource
+from opentelemetry.sdk.trace import TracerProvider
+from opentelemetry.sdk.trace.export import BatchSpanProcessor, ConsoleSpanExporter, SpanExporter
+from opentelemetry.sdk.trace.sampling import ParentBased, TraceIdRatioBased
+
+tracer = trace.get_tracer("breeze-service")
+
+# Longest parameter value attached to an upstream span
+MAX_ATTRIBUTE_LENGTH = 256
+
+
+def _console_exporter() -> SpanExporter:
+    return ConsoleSpanExporter()
+
+
+def _file_exporter() -> SpanExporter:
+    # One JSON document per line so the file can be tailed or loaded with jq
+    out = open(os.getenv('trace_file', 'traces.jsonl'), 'a')
+    return ConsoleSpanExporter(out=out, formatter=lambda span: span.to_json(indent=None) + "\n")
+
+
+def _otlp_exporter() -> SpanExporter:
+    from opentelemetry.exporter.otlp.proto.http.trace_exporter import OTLPSpanExporter
+    return OTLPSpanExporter()
+
+
+EXPORTERS: Dict[str, Callable[[], SpanExporter]] = {
+    "console": _console_exporter,
+    "file": _file_exporter,
+    "otlp": _otlp_exporter,
+}
+
+
+def register_exporter(name: str, factory: Callable[[], SpanExporter]) -> None:
+    """Make a span exporter selectable through the `trace_exporter` setting."""
+    EXPORTERS[name] = factory
+
+
+def setup_tracing(exporter: Optional[str] = None, sample_rate: Optional[float] = None) -> bool:
+    """
+    Install the tracer provider if an exporter is configured.
+
+    Parameters:
+    - **exporter**: Name of a registered exporter; defaults to the `trace_exporter` setting
+    - **sample_rate**: Fraction of new traces to record; defaults to the `trace_sample_rate` setting
+
+    Returns:
+        True if tracing was enabled. With no exporter every span is a no-op.
+    """
+    exporter = exporter or os.getenv('trace_exporter', 'none')
+    if exporter == 'none':
+        return False
+    if sample_rate is None:
+        sample_rate = float(os.getenv('trace_sample_rate', 0.1))
+
+    provider = TracerProvider(
+        resource=Resource.create({"service.name": "breeze-service"}),
+        sampler=ParentBased(TraceIdRatioBased(sample_rate)),
+    )
+    provider.add_span_processor(BatchSpanProcessor(EXPORTERS[exporter]()))
+    trace.set_tracer_provider(provider)
+    return True
+
+
+def _attribute(value: Any) -> Any:
+    if isinstance(value, (bool, int, float)):
+        return value
+    if isinstance(value, (list, tuple)):
+        value = ",".join(map(str, value))
+    return str(value)[:MAX_ATTRIBUTE_LENGTH]
+
+
+def trace_upstream(method: str, params: Dict[str, Any], call: Callable[[], Any]) -> Any:
+    """UpstreamClient hook wrapping each Breeze call in a child span."""
+    span = tracer.start_span(f"breeze.{method}")
+    if span.is_recording():
+        span.set_attribute("breeze.method", method)
+        for name, value in params.items():
+            if value is not None:
+                span.set_attribute(f"breeze.param.{name}", _attribute(value))
+    with trace.use_span(span, end_on_exit=True):
+        return call()
+
+
+def endpoint_span(name: str):
+    """InstrumentedRoute wrapper opening a span around the endpoint function."""
+    return tracer.start_as_current_span(f"endpoint.{name}")
+
+
+class TracingMiddleware:
+    """ASGI middleware opening a server span for every HTTP request."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        headers = {k.decode("latin-1"): v.decode("latin-1") for k, v in scope["headers"]}
+        span = tracer.start_span(
+            f"{scope['method']} {scope['path']}",
+            context=propagate.extract(headers),
+            kind=trace.SpanKind.SERVER,
+        )
+        recording = span.is_recording()
+        if recording:
+            span.set_attribute("http.method", scope["method"])
+            span.set_attribute("http.target", scope["path"])
+
+        async def send_with_status(message):
+            if recording and message["type"] == "http.response.start":
+                span.set_attribute("http.status_code", message["status"])
+            await send(message)
+
+        # Unsampled spans are still made current so upstream spans inherit the decision
+        with trace.use_span(span, end_on_exit=True):
+            await self.app(scope, receive, send_with_status)
+            route = scope.get("route")
+            if recording and route is not None:
+                span.set_attribute("http.route", route.path)
+                span.update_name(f"{scope['method']} {route.path}")
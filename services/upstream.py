@@ -0,0 +1,89 @@
+import functools
+import inspect
+import re
+from typing import Any, Callable, Dict, List, Optional
+
+# A hook wraps one upstream call: hook(method, params, call) -> call()
+UpstreamHook = Callable[[str, Dict[str, Any], Callable[[], Any]], Any]
+
+# HTTP statuses of failed Breeze calls that may succeed if repeated: timeouts, throttling and server errors
+TRANSIENT_STATUSES = {408, 425, 429, 500, 502, 503, 504}
+# Breeze error messages reporting throttling or a temporary outage rather than a problem with the request
+TRANSIENT_MESSAGE = re.compile(r"timed? ?out|rate limit|too many requests|temporarily|try again|unavailable", re.I)
+
+
+def _status(value: Any) -> Optional[int]:
+    status = getattr(getattr(value, "response", None), "status_code", None) or getattr(value, "status_code", None)
+    return status if isinstance(status, int) else None
+
+
+def is_transient(error: BaseException) -> bool:
+    """
+    Whether a failed Breeze call might succeed if it is repeated.
+
+    True for connection errors and timeouts (requests' exceptions are
+    OSErrors), 5xx, 408 and 429 responses and Breeze throttling the account,
+    including when BreezeError wraps them. False for errors about the request
+    itself, such as an unknown person id or invalid parameters.
+    """
+    causes = [error, error.__cause__, error.__context__, *error.args]
+    for cause in causes:
+        status = _status(cause)
+        if status is not None:
+            return status in TRANSIENT_STATUSES
+    if any(isinstance(cause, OSError) for cause in causes):
+        return True
+    return bool(TRANSIENT_MESSAGE.search(str(error)))
+
+
+class UpstreamClient:
+    """
+    Proxy around BreezeApi that passes every method call through a chain of hooks.
+
+    Hooks receive the method name, the bound call parameters and a zero-argument
+    `call` that performs the rest of the chain. They are applied in the order
+    they were added, so the first hook added is the outermost.
+    """
+
+    def __init__(self, api: Any):
+        self.api = api
+        self.hooks: List[UpstreamHook] = []
+        self._signatures: Dict[str, inspect.Signature] = {}
+
+    def add_hook(self, hook: UpstreamHook) -> None:
+        self.hooks.append(hook)
+
+    def __getattr__(self, name: str) -> Any:
+        attr = getattr(self.api, name)
+        if name.startswith("_") or not callable(attr):
+            return attr
+
+        @functools.wraps(attr)
+        def method(*args, **kwargs):
+            return self._invoke(name, attr, args, kwargs)
+        return method
+
+    def call(self, name: str, func: Callable, *args, **kwargs) -> Any:
+        """
+        Call `func` through the hooks as the upstream method `name`.
+
+        For Breeze endpoints BreezeApi has no method for, so they are still
+        rate limited, retried and observed like any other call.
+        """
+        return self._invoke(name, func, args, kwargs)
+
+    def _bind(self, name: str, func: Callable, args: tuple, kwargs: dict) -> Dict[str, Any]:
+        signature = self._signatures.get(name)
+        if signature is None:
+            signature = self._signatures[name] = inspect.signature(func)
+        try:
+            return dict(signature.bind_partial(*args, **kwargs).arguments)
+        except TypeError:
+            return dict(kwargs)
+
+    def _invoke(self, name: str, func: Callable, args: tuple, kwargs: dict) -> Any:
+        params = self._bind(name, func, args, kwargs)
+        call = functools.partial(func, *args, **kwargs)
+        for hook in reversed(self.hooks):
+            call = functools.partial(hook, name, params, call)
+        return call()
@@ -0,0 +1,95 @@
+import asyncio
+import logging
+import time
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+from .tenants import current_tenant
+
+logger = logging.getLogger(__name__)
+
+# A warm-up job fills one cache entry and may return further jobs that depend on its result
+WarmUpJob = Tuple[str, Callable[[], Optional[Iterable["WarmUpJob"]]]]
+
+
+class WarmUp:
+    """
+    Preloads the cache for every tenant before the service reports ready.
+
+    Jobs run in worker threads, at most `concurrency` at a time, through the
+    same rate limited clients as requests. A job may return follow-up jobs
+    (e.g. volunteer roles for the events it loaded), which are queued once it
+    finishes. Failed jobs are logged and skipped; warm-up counts as finished
+    when every job has run or after `timeout` seconds, whichever is first.
+    """
+
+    def __init__(self, jobs: Callable[[], List[WarmUpJob]], concurrency: int = 4, timeout: float = 60.0):
+        self.jobs = jobs
+        self.concurrency = concurrency
+        self.timeout = timeout
+        self.ready = False
+        self.started: Optional[float] = None
+        self.finished: Optional[float] = None
+        self.completed = 0
+        self.failed: List[str] = []
+        self.timed_out = False
+
+    def _run_job(self, tenant: str, name: str, job: Callable[[], Any]) -> List[WarmUpJob]:
+        token = current_tenant.set(tenant)
+        try:
+            return list(job() or [])
+        finally:
+            current_tenant.reset(token)
+
+    async def _warm(self, tenants: Iterable[str]) -> None:
+        semaphore = asyncio.Semaphore(self.concurrency)
+        pending: set = set()
+
+        def schedule(tenant: str, jobs: Iterable[WarmUpJob]) -> None:
+            for name, job in jobs:
+                pending.add(asyncio.ensure_future(run(tenant, name, job)))
+
+        async def run(tenant: str, name: str, job: Callable[[], Any]) -> None:
+            async with semaphore:
+                try:
+                    follow_up = await asyncio.to_thread(self._run_job, tenant, name, job)
+                except Exception as e:
+                    logger.warning("Warm-up of %s for tenant %s failed: %s", name, tenant, e)
+                    self.failed.append(f"{tenant}:{name}")
+                    return
+            self.completed += 1
+            schedule(tenant, follow_up)
+
+        for tenant in tenants:
+            token = current_tenant.set(tenant)
+            try:
+                schedule(tenant, self.jobs())
+            finally:
+                current_tenant.reset(token)
+        try:
+            while pending:
+                done, _ = await asyncio.wait(pending)
+                pending.difference_update(done)
+        finally:
+            for task in pending:
+                task.cancel()
+
+    async def run(self, tenants: Iterable[str]) -> None:
+        """Warm the cache for each tenant, then mark the service ready."""
+        self.started = time.monotonic()
+        try:
+            await asyncio.wait_for(self._warm(tenants), self.timeout)
+        except asyncio.TimeoutError:
+            self.timed_out = True
+            logger.warning("Cache warm-up did not finish within %ss", self.timeout)
+        finally:
+            self.finished = time.monotonic()
+            self.ready = True
+
+    def status(self) -> Dict[str, Any]:
+        return {
+            "status": "ready" if self.ready else "warming",
+            "completed": self.completed,
+            "failed": self.failed,
+            "timed_out": self.timed_out,
+            "duration": None if self.finished is None else round(self.finished - self.started, 3),
+        }
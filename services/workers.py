@@ -0,0 +1,100 @@
+import logging
+import os
+import threading
+from typing import Callable, List, Optional
+
+try:
+    import fcntl
+except ImportError:  # Windows: only single-worker mode is supported
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+# Worker processes serving requests (uvicorn --workers); each runs its own copy of main.app
+WORKERS = int(os.getenv('workers', 1))
+
+
+class SyncLeader:
+    """
+    Elects the one worker process that runs the background jobs talking to Breeze.
+
+    With several workers, each tries to take an exclusive lock on `path`; the
+    one that gets it is the leader until it exits, when the lock is released
+    and another worker takes over within `poll` seconds. Followers keep
+    serving requests from the read models the leader writes. With no `path`
+    (a single worker) the process is always the leader.
+    """
+
+    def __init__(self, path: Optional[str] = None, poll: float = 5.0):
+        self.path = path
+        self.poll = poll
+        self.is_leader = False
+        self._file = None
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._on_elected: List[Callable[[], None]] = []
+
+    def try_acquire(self) -> bool:
+        """Become the leader if no other worker is; returns whether this process is the leader."""
+        if self.is_leader:
+            return True
+        if self.path is None or fcntl is None:
+            self.is_leader = True
+            return True
+        f = open(self.path, "a+")
+        try:
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            f.close()
+            return False
+        f.seek(0)
+        f.truncate()
+        f.write(f"{os.getpid()}\n")
+        f.flush()
+        self._file = f
+        self.is_leader = True
+        return True
+
+    def _elected(self) -> None:
+        logger.info("Worker %s is now running the Breeze sync jobs", os.getpid())
+        for callback in self._on_elected:
+            try:
+                callback()
+            except Exception:
+                logger.exception("Starting a sync job failed")
+
+    def start(self, on_elected: Callable[[], None]) -> None:
+        """Call `on_elected` once this process becomes the leader: now, or when the current leader exits."""
+        self._on_elected.append(on_elected)
+        if self.try_acquire():
+            self._elected()
+            return
+
+        def run():
+            while not self._stop.wait(self.poll):
+                if self.try_acquire():
+                    self._elected()
+                    return
+
+        self._stop.clear()
+        self._thread = threading.Thread(target=run, name="sync-leader", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float = 10.0) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+        if self._file is not None:
+            # Closing the file releases the lock for the next worker
+            self._file.close()
+            self._file = None
+        self.is_leader = False
+
+
+def open_leader(directory: Optional[str]) -> SyncLeader:
+    """Leader election through a lock file in `directory` when running several workers."""
+    if WORKERS <= 1 or not directory:
+        return SyncLeader()
+    os.makedirs(directory, exist_ok=True)
+    return SyncLeader(os.path.join(directory, "sync.lock"))
@@ -0,0 +1,57 @@
+import importlib
+import os
+
+import pytest
+
+from bench.fake_breeze import FakeBreezeApi
+
+
+class FakeApi(FakeBreezeApi):
+    """The benchmark's fake Breeze without latency, recording the writes made through it."""
+
+    def __init__(self, **kwargs):
+        super().__init__(**{"people": 50, "events": 10, "contributions": 200, "latency": 0, "jitter": 0, **kwargs})
+        self.writes = []
+
+    def add_person(self, first_name, last_name, fields_json=None):
+        self.writes.append(("add_person", first_name, last_name, fields_json))
+        return {"id": "999", "first_name": first_name, "last_name": last_name}
+
+    def update_person(self, person_id, fields_json):
+        self.writes.append(("update_person", person_id, fields_json))
+        return {"id": person_id}
+
+
+@pytest.fixture(scope="session")
+def main(tmp_path_factory):
+    """The service module, imported once with its local stores in a temporary directory."""
+    pytest.importorskip("pyBreezeChMS.breeze.breeze")
+    directory = tmp_path_factory.mktemp("service")
+    os.environ.update({
+        "breeze_url": "https://test.breezechms.com",
+        "api_key": "test",
+        "warmup": "false",
+        "idempotency_db": str(directory / "idempotency.sqlite3"),
+        "statement_dir": str(directory / "statements"),
+        "profile_dir": str(directory / "profiles"),
+    })
+    return importlib.import_module("main")
+
+
+@pytest.fixture
+def fake(main):
+    """A fresh fake Breeze behind the default tenant, with an empty cache."""
+    api = FakeApi()
+    client = main.tenant_pool.client(main.tenants.DEFAULT_TENANT)
+    previous, client.api = client.api, api
+    main.cache.invalidate()
+    yield api
+    client.api = previous
+    main.cache.invalidate()
+
+
+@pytest.fixture
+def client(main, fake):
+    from fastapi.testclient import TestClient
+    with TestClient(main.app) as test_client:
+        yield test_client
@@ -0,0 +1,132 @@
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from services import admission, tenants
+
+
+@pytest.mark.parametrize("method, path, query, expected", [
+    ("GET", "/ready", b"", admission.EXEMPT),
+    ("POST", "/admin/cache/invalidate", b"", admission.EXEMPT),
+    ("POST", "/events/93210000/check-in/157857", b"", admission.CHECKIN),
+    ("POST", "/events/93210000/check-out/157857", b"", admission.CHECKIN),
+    ("POST", "/batch", b"", admission.HEAVY),
+    ("GET", "/people/duplicates", b"", admission.HEAVY),
+    ("GET", "/forms/12/export", b"", admission.HEAVY),
+    ("GET", "/people/", b"details=true", admission.HEAVY),
+    ("GET", "/people/", b"details=false", admission.READ),
+    ("GET", "/people/157857", b"details=true", admission.READ),
+    ("POST", "/people/", b"", admission.WRITE),
+    ("DELETE", "/tags/1", b"", admission.WRITE),
+])
+def test_route_class(method, path, query, expected):
+    assert admission.route_class(method, path, query) == expected
+
+
+def test_quotas_allow_bursts_then_report_retry_after():
+    quotas = admission.ClientQuotas(rate=1, burst=2)
+    assert quotas.take("addr:1") == 0 and quotas.take("addr:1") == 0
+    assert 0 < quotas.take("addr:1") <= 1
+    # Other clients have their own bucket
+    assert quotas.take("addr:2") == 0
+
+
+def test_quotas_overrides_and_unlimited_clients():
+    quotas = admission.ClientQuotas(rate=1, burst=1, overrides={"vip": {"rate_limit": 0}, "slow": {"rate_limit": 1}})
+    assert all(quotas.take("key:vip") == 0 for _ in range(100))
+    assert quotas.take("key:slow") == 0 and quotas.take("key:slow") > 0
+    assert all(admission.ClientQuotas().take("addr:1") == 0 for _ in range(100))
+
+
+def test_quotas_forget_least_recent_clients():
+    quotas = admission.ClientQuotas(rate=1, burst=1, max_clients=2)
+    quotas.take("addr:1")
+    quotas.take("addr:2")
+    quotas.take("addr:3")
+    # addr:1 was dropped, so it starts over with a full bucket
+    assert quotas.take("addr:1") == 0
+
+
+def controller(rate=0.0, read=2):
+    return admission.AdmissionController(
+        admission.ClientQuotas(rate=rate, burst=1),
+        {admission.READ: read, admission.CHECKIN: 0},
+        {admission.READ: 0.5, admission.CHECKIN: None},
+    )
+
+
+def test_controller_caps_concurrency_per_class():
+    admission_controller = controller(read=2)
+    assert admission_controller.admit(admission.READ, "addr:1") is None
+    assert admission_controller.admit(admission.READ, "addr:1") is None
+    assert admission_controller.admit(admission.READ, "addr:1")[0] == 503
+    assert admission_controller.admit(admission.CHECKIN, "addr:1") is None
+    admission_controller.release(admission.READ)
+    assert admission_controller.admit(admission.READ, "addr:1") is None
+    assert admission_controller.rejected == {(admission.READ, "concurrency"): 1}
+
+
+def test_controller_rejects_clients_over_quota():
+    admission_controller = controller(rate=1)
+    assert admission_controller.admit(admission.READ, "addr:1") is None
+    status, _, retry_after = admission_controller.admit(admission.READ, "addr:1")
+    assert status == 429 and retry_after > 0
+    # Quota rejections do not take a concurrency slot
+    assert admission_controller.in_flight[admission.READ] == 1
+    assert admission_controller.rejected == {(admission.READ, "quota"): 1}
+
+
+def test_wait_budget_sheds_queued_upstream_calls():
+    limiter = tenants.RateLimiter(rate=1, burst=1)
+    limiter.reserve()
+    token = tenants.wait_budget.set(0.1)
+    try:
+        with pytest.raises(tenants.Overloaded):
+            limiter.reserve()
+    finally:
+        tenants.wait_budget.reset(token)
+
+
+@pytest.fixture
+def admitted():
+    admission_controller = controller(rate=1, read=1)
+    app = FastAPI()
+    app.add_middleware(admission.AdmissionMiddleware, controller=admission_controller)
+
+    @app.get("/people/")
+    def people():
+        return {"route_class": admission.current_route_class.get(), "wait_budget": tenants.wait_budget.get()}
+
+    @app.get("/ready")
+    def ready():
+        return {"status": "ready"}
+
+    with TestClient(app) as client:
+        yield client, admission_controller
+
+
+def test_middleware_sets_route_class_and_wait_budget(admitted):
+    client, admission_controller = admitted
+    response = client.get("/people/", headers={"X-API-Key": "a"})
+    assert response.json() == {"route_class": admission.READ, "wait_budget": 0.5}
+    assert admission_controller.in_flight[admission.READ] == 0
+
+
+def test_middleware_rejects_over_quota_with_429(admitted):
+    client, _ = admitted
+    assert client.get("/people/", headers={"X-API-Key": "a"}).status_code == 200
+    response = client.get("/people/", headers={"X-API-Key": "a"})
+    assert response.status_code == 429
+    assert int(response.headers["Retry-After"]) >= 1
+    assert client.get("/people/", headers={"X-API-Key": "b"}).status_code == 200
+    # Exempt routes are never limited
+    assert client.get("/ready", headers={"X-API-Key": "a"}).status_code == 200
+
+
+def test_middleware_sheds_full_route_class_with_503(admitted):
+    client, admission_controller = admitted
+    admission_controller.in_flight[admission.READ] = 1
+    response = client.get("/people/", headers={"X-API-Key": "a"})
+    assert response.status_code == 503
+    assert response.headers["Retry-After"] == "1"
+    assert admission_controller.rejected == {(admission.READ, "concurrency"): 1}
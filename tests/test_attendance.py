@@ -0,0 +1,87 @@
+import pytest
+
+from services import attendance
+from services.tenants import DEFAULT_TENANT
+
+# Two instances of series "400" a week apart (Sundays), one of series "401"
+EVENTS = [
+    {"id": "1", "event_id": "400", "name": "Sunday Service", "start_datetime": "2024-03-03 09:00:00"},
+    {"id": "2", "event_id": "400", "name": "Sunday Service", "start_datetime": "2024-03-10 09:00:00"},
+    {"id": "3", "event_id": "401", "name": "Youth Group", "start_datetime": "2024-03-06 18:00:00"},
+]
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = attendance.AttendanceStore(str(tmp_path / "attendance.sqlite3"))
+    store.upsert_instances(DEFAULT_TENANT, EVENTS)
+    return store
+
+
+def test_period_start():
+    assert attendance.period_start("2024-03-06", "week") == "2024-03-04"
+    assert attendance.period_start("2024-03-06 18:00:00", "month") == "2024-03-01"
+
+
+def test_record_is_idempotent_and_remove_decrements(store):
+    store.record(DEFAULT_TENANT, "1", "p1")
+    store.record(DEFAULT_TENANT, "1", "p1")
+    store.record(DEFAULT_TENANT, "1", "p2")
+    assert store.instance_count("1") == 2
+    store.remove(DEFAULT_TENANT, "1", "p1")
+    store.remove(DEFAULT_TENANT, "1", "p1")
+    assert store.instance_count("1") == 1
+    assert store.instance_count("missing") == 0
+
+
+def test_series_trend_counts_first_time_attendees(store):
+    store.replace_instance(DEFAULT_TENANT, "1", ["p1", "p2"])
+    store.replace_instance(DEFAULT_TENANT, "2", ["p1", "p3"])
+    store.replace_instance(DEFAULT_TENANT, "3", ["p4"])
+    assert store.series_trend("400", "week") == [
+        {"period_start": "2024-02-26", "instances": 1, "attendance": 2, "first_time": 2},
+        {"period_start": "2024-03-04", "instances": 1, "attendance": 2, "first_time": 1},
+    ]
+    assert store.series_trend("400", "month") == [
+        {"period_start": "2024-03-01", "instances": 2, "attendance": 4, "first_time": 3},
+    ]
+
+
+def test_series_trend_rebuilds_after_changes_and_filters_dates(store):
+    store.replace_instance(DEFAULT_TENANT, "1", ["p1"])
+    assert store.series_trend("400", "week")[0]["attendance"] == 1
+    store.record(DEFAULT_TENANT, "1", "p2")
+    store.record(DEFAULT_TENANT, "2", "p2")
+    assert [p["attendance"] for p in store.series_trend("400", "week")] == [2, 1]
+    # start_date is widened to the start of its week
+    assert [p["period_start"] for p in store.series_trend("400", "week", start_date="2024-03-05")] == ["2024-03-04"]
+    assert [p["period_start"] for p in store.series_trend("400", "week", end_date="2024-03-03")] == ["2024-02-26"]
+
+
+def test_series_trend_is_per_tenant(store):
+    store.record(DEFAULT_TENANT, "1", "p1")
+    store.upsert_instances("other", EVENTS)
+    store.record("other", "1", "p1")
+    store.record("other", "1", "p2")
+    assert store.series_trend("400", "month")[0]["attendance"] == 1
+
+
+@pytest.fixture
+def enabled_store(main, store, monkeypatch):
+    monkeypatch.setattr(main, "attendance_store", store)
+    return store
+
+
+@pytest.mark.parametrize("query", ["start_date=03/01/2024", "end_date=2024-13-01", "start_date=soon"])
+def test_series_endpoint_rejects_bad_dates(client, enabled_store, query):
+    response = client.get(f"/events/series/400/attendance?{query}")
+    assert response.status_code == 422
+
+
+def test_series_endpoint_filters_by_date(client, enabled_store):
+    enabled_store.replace_instance(DEFAULT_TENANT, "1", ["p1"])
+    enabled_store.replace_instance(DEFAULT_TENANT, "2", ["p2"])
+    response = client.get("/events/series/400/attendance?period=week&start_date=2024-03-05&end_date=2024-03-31")
+    assert response.status_code == 200
+    assert [p["period_start"] for p in response.json()] == ["2024-03-04"]
+    assert client.get("/events/series/400/attendance?period=year").status_code == 422
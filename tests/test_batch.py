@@ -0,0 +1,42 @@
+import pytest
+
+
+def test_batch_runs_sub_requests_in_order(client, fake):
+    person = fake.people[0]
+    response = client.post("/batch", json={"requests": [
+        {"id": "people", "path": "/people/?limit=5"},
+        {"id": "me", "path": f"/people/{person['id']}?fields=first_name"},
+        {"id": "missing", "path": "/no-such-route"},
+    ]})
+    assert response.status_code == 200
+    people, me, missing = response.json()
+    assert people["id"] == "people" and people["status"] == 200 and len(people["body"]) == 5
+    assert me["id"] == "me" and me["status"] == 200 and me["body"]["first_name"] == person["first_name"]
+    assert missing["status"] == 404
+    assert "etag" in people["headers"]
+
+
+def test_batch_sub_requests_share_the_cache(client, fake):
+    requests = [{"id": str(i), "path": "/people/"} for i in range(5)]
+    results = client.post("/batch", json={"requests": requests}).json()
+    assert {r["status"] for r in results} == {200}
+    assert fake.calls == 1
+
+
+def test_batch_sub_requests_honour_if_none_match(client):
+    etag = client.get("/people/").headers["ETag"]
+    result, = client.post("/batch", json={"requests": [{"path": "/people/", "headers": {"If-None-Match": etag}}]}).json()
+    assert result["status"] == 304 and result["body"] is None
+
+
+@pytest.mark.parametrize("path", ["people/", "/batch", "/batch/", "/batch?x=1", "/t/other/people/", "/t/default/batch"])
+def test_batch_rejects_invalid_paths(client, fake, path):
+    response = client.post("/batch", json={"requests": [{"path": "/people/"}, {"path": path}]})
+    assert response.status_code == 422
+    assert fake.calls == 0
+
+
+def test_batch_rejects_writes_and_oversized_batches(client, main):
+    assert client.post("/batch", json={"requests": [{"method": "POST", "path": "/people/"}]}).status_code == 422
+    requests = [{"path": "/people/"}] * (main.BATCH_MAX_REQUESTS + 1)
+    assert client.post("/batch", json={"requests": requests}).status_code == 422
@@ -0,0 +1,74 @@
+import threading
+import time
+
+from services.cache import TTLCache
+
+
+def test_least_recently_used_entries_are_evicted():
+    cache = TTLCache(ttl=60, max_entries=3)
+    for i in range(3):
+        cache.set(("people", i), i)
+    assert cache.get(("people", 0)) == (True, 0)
+    cache.set(("rendered", "a"), "a")
+    assert len(cache) == 3
+    assert cache.get(("people", 1)) == (False, None)
+    assert cache.get(("people", 0)) == (True, 0)
+    assert cache.evictions_snapshot() == {"people": 1}
+
+
+def test_entries_past_their_stale_window_go_first():
+    cache = TTLCache(ttl=60, stale_ttl=0, max_entries=3)
+    cache.set(("people", "dead"), 1, ttl=-1)
+    cache.set(("people", "live"), 2)
+    cache.set(("tags", None), 3)
+    cache.set(("events", None), 4)
+    # The expired entry was purged, so the older live entries are kept
+    assert cache.get(("people", "live")) == (True, 2)
+    assert cache.get(("tags", None)) == (True, 3)
+    assert cache.get_stale_entry(("people", "dead")) is None
+
+
+def test_unlimited_by_default():
+    cache = TTLCache(ttl=60)
+    for i in range(1000):
+        cache.set(("rendered", i), i)
+    assert len(cache) == 1000
+
+
+def test_scopes_share_the_limit():
+    scope = threading.local()
+    cache = TTLCache(ttl=60, scope=lambda: getattr(scope, "tenant", None), max_entries=2)
+    for tenant in ("north", "south", "east"):
+        scope.tenant = tenant
+        cache.set(("people",), tenant)
+    assert len(cache) == 2
+    scope.tenant = "north"
+    assert cache.get(("people",)) == (False, None)
+
+
+def test_stale_entry_served_when_reload_fails():
+    cache = TTLCache(ttl=60, stale_ttl=60)
+    cache.set(("people",), "old", ttl=-1)
+
+    def failing():
+        raise ConnectionError("refused")
+
+    entry = cache.get_or_load_entry(("people",), failing)
+    assert (entry.value, entry.stale) == ("old", True)
+
+
+def test_concurrent_misses_share_one_load():
+    cache, calls, started = TTLCache(ttl=60), [], threading.Event()
+
+    def load():
+        calls.append(1)
+        started.set()
+        time.sleep(0.05)
+        return "people"
+
+    threads = [threading.Thread(target=cache.get_or_load, args=(("people",), load)) for _ in range(5)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(calls) == 1
@@ -0,0 +1,147 @@
+import time
+
+import pytest
+
+from services import checkin_queue
+from services.checkin_queue import CheckInQueue
+from services.tenants import RateLimitExceeded, current_tenant
+
+
+class FakeApi:
+    def __init__(self, fail=None):
+        self.calls = []
+        self.fail = fail
+
+    def event_check_in(self, person_id, event_instance_id):
+        self.calls.append(("check_in", person_id, event_instance_id, current_tenant.get()))
+        if self.fail:
+            raise self.fail
+        return True
+
+    def event_check_out(self, person_id, event_instance_id):
+        self.calls.append(("check_out", person_id, event_instance_id, current_tenant.get()))
+        return True
+
+
+@pytest.fixture
+def path(tmp_path):
+    return str(tmp_path / "checkins.sqlite3")
+
+
+@pytest.fixture
+def tenant():
+    token = current_tenant.set("north")
+    yield "north"
+    current_tenant.reset(token)
+
+
+def states(queue):
+    return [(item["person_id"], item["action"], item["state"])
+            for state in checkin_queue.STATES for item in queue.items(state)]
+
+
+def test_enqueue_then_drain(path, tenant):
+    queue, api = CheckInQueue(path), FakeApi()
+    first = queue.check_in("1", "e1")
+    queue.check_in("2", "e1")
+    assert first == {"queued": True, "id": first["id"], "duplicate": False}
+    assert queue.backlog() == {"north": {checkin_queue.PENDING: 2}}
+    assert api.calls == []
+
+    assert queue.flush(lambda name: api) == 2
+    # Sent in arrival order, through the tenant the check-in was queued for
+    assert api.calls == [("check_in", "1", "e1", "north"), ("check_in", "2", "e1", "north")]
+    assert queue.backlog() == {"north": {checkin_queue.DONE: 2}}
+    assert queue.flush(lambda name: api) == 0
+
+
+def test_duplicates_are_suppressed(path, tenant):
+    queue, api = CheckInQueue(path), FakeApi()
+    first = queue.check_in("1", "e1")
+    replay = queue.check_in("1", "e1")
+    assert replay == {"queued": True, "id": first["id"], "duplicate": True}
+    queue.flush(lambda name: api)
+    # Still a duplicate once sent, so a client replaying its request does not check in twice
+    assert queue.check_in("1", "e1")["duplicate"]
+    queue.flush(lambda name: api)
+    assert len(api.calls) == 1
+    # Another instance, or another tenant, is not a duplicate
+    assert not queue.check_in("1", "e2")["duplicate"]
+    token = current_tenant.set("south")
+    try:
+        assert not queue.check_in("1", "e1")["duplicate"]
+    finally:
+        current_tenant.reset(token)
+
+
+def test_check_out_cancels_unsent_check_in(path, tenant):
+    queue, api = CheckInQueue(path), FakeApi()
+    queue.check_in("1", "e1")
+    assert queue.check_out("1", "e1", send=lambda: pytest.fail("Breeze should not be called")) is True
+    queue.flush(lambda name: api)
+    assert api.calls == []
+    assert states(queue) == [("1", checkin_queue.CHECK_IN, checkin_queue.CANCELLED)]
+
+
+def test_check_out_of_sent_check_in(path, tenant):
+    queue, api = CheckInQueue(path), FakeApi()
+    queue.check_in("1", "e1")
+    queue.flush(lambda name: api)
+    assert queue.check_out("1", "e1", send=lambda: api.event_check_out("1", "e1")) is True
+    assert states(queue) == [("1", checkin_queue.CHECK_IN, checkin_queue.CHECKED_OUT)]
+    # Checked out, so checking in again is queued
+    assert not queue.check_in("1", "e1")["duplicate"]
+
+
+def test_in_flight_rows_recovered_after_restart(path, tenant):
+    queue = CheckInQueue(path)
+    queue.check_in("1", "e1")
+    assert len(queue.claim()) == 1
+    # The process dies mid-send: the row stays claimed
+    assert queue.backlog() == {"north": {checkin_queue.SENDING: 1}}
+    queue._db.execute("UPDATE checkins SET updated = ?", (time.time() - 600,))
+
+    restarted, api = CheckInQueue(path), FakeApi()
+    restarted.start(lambda name: api, interval=0.01)
+    try:
+        deadline = time.time() + 5
+        while restarted.backlog() != {"north": {checkin_queue.DONE: 1}} and time.time() < deadline:
+            time.sleep(0.01)
+    finally:
+        restarted.stop()
+    assert restarted.backlog() == {"north": {checkin_queue.DONE: 1}}
+    assert api.calls == [("check_in", "1", "e1", "north")]
+
+
+def test_recently_claimed_rows_are_left_to_their_sender(path, tenant):
+    queue = CheckInQueue(path)
+    queue.check_in("1", "e1")
+    queue.claim()
+    restarted = CheckInQueue(path)
+    restarted.start(lambda name: FakeApi(), interval=0.01)
+    restarted.stop()
+    assert restarted.backlog() == {"north": {checkin_queue.SENDING: 1}}
+
+
+def test_failures_are_retried_then_kept(path, tenant):
+    queue, api = CheckInQueue(path, max_attempts=2), FakeApi(fail=ConnectionError("refused"))
+    item = queue.check_in("1", "e1")
+    for _ in range(2):
+        queue._db.execute("UPDATE checkins SET next_attempt = 0")
+        queue.flush(lambda name: api)
+    [failed] = queue.items(checkin_queue.FAILED)
+    assert (failed["attempts"], failed["last_error"]) == (2, "refused")
+
+    api.fail = None
+    assert queue.retry(item["id"])
+    queue.flush(lambda name: api)
+    assert queue.backlog() == {"north": {checkin_queue.DONE: 1}}
+
+
+def test_rate_limited_sends_do_not_use_an_attempt(path, tenant):
+    queue, api = CheckInQueue(path), FakeApi(fail=RateLimitExceeded("slow down", retry_after=60))
+    queue.check_in("1", "e1")
+    queue.flush(lambda name: api)
+    [pending] = queue.items(checkin_queue.PENDING)
+    assert pending["attempts"] == 0
+    assert pending["next_attempt"] > time.time() + 30
@@ -0,0 +1,43 @@
+import pytest
+
+from services.circuit import OPEN, CLOSED, CircuitBreakers, CircuitOpen
+
+
+class BreezeError(Exception):
+    pass
+
+
+def raising(error):
+    def call():
+        raise error
+    return call
+
+
+def test_transient_failures_open_the_circuit():
+    breakers = CircuitBreakers(failure_threshold=2, reset_timeout=30)
+    for _ in range(2):
+        with pytest.raises(ConnectionError):
+            breakers.hook("get_people", {}, raising(ConnectionError("refused")))
+    assert breakers.breaker("get_people").state == OPEN
+    with pytest.raises(CircuitOpen):
+        breakers.hook("get_people", {}, lambda: [])
+
+
+def test_request_errors_do_not_open_the_circuit():
+    breakers = CircuitBreakers(failure_threshold=2, reset_timeout=30)
+    for _ in range(5):
+        with pytest.raises(BreezeError):
+            breakers.hook("get_person_details", {}, raising(BreezeError("Person not found")))
+    assert breakers.breaker("get_person_details").state == CLOSED
+    assert breakers.hook("get_person_details", {}, lambda: {"id": "1"}) == {"id": "1"}
+
+
+def test_request_error_resets_consecutive_failures():
+    breakers = CircuitBreakers(failure_threshold=2, reset_timeout=30)
+    with pytest.raises(ConnectionError):
+        breakers.hook("get_people", {}, raising(ConnectionError()))
+    with pytest.raises(BreezeError):
+        breakers.hook("get_people", {}, raising(BreezeError("Invalid parameters")))
+    with pytest.raises(ConnectionError):
+        breakers.hook("get_people", {}, raising(ConnectionError()))
+    assert breakers.breaker("get_people").state == CLOSED
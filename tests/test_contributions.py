@@ -0,0 +1,106 @@
+from datetime import date, timedelta
+from decimal import Decimal
+
+import pytest
+
+from services import contributions
+
+CONTRIBUTIONS = [
+    {"id": "1", "person_id": "p1", "date": "2024-01-10", "amount": "100.00",
+     "funds": [{"fund_id": "f1", "amount": "60.00"}, {"fund_id": "f2", "amount": "40.00"}]},
+    {"id": "2", "person_id": "p1", "date": "2024-02-10", "amount": "1,000.00", "funds": [{"fund_id": "f1", "amount": "1,000.00"}]},
+    {"id": "3", "person_id": "p2", "date": "2024-03-10", "amount": "25.00", "funds": [{"fund_id": "f2", "amount": "25.00"}]},
+]
+
+
+class RecordingApi:
+    def __init__(self, contributions):
+        self.contributions = contributions
+        self.calls = []
+
+    def list_contributions(self, start_date, end_date):
+        self.calls.append((start_date, end_date))
+        return [c for c in self.contributions if start_date <= c["date"] <= end_date]
+
+
+def test_ledger_fetches_only_missing_days():
+    api = RecordingApi(CONTRIBUTIONS)
+    ledger = contributions.ContributionLedger(refresh_interval=3600)
+    assert ledger.ensure(api, "2024-02-01", "2024-02-28") == 1
+    assert ledger.ensure(api, "2024-02-05", "2024-02-20") == 0
+    assert ledger.ensure(api, "2024-01-01", "2024-03-31") == 2
+    assert api.calls == [("2024-02-01", "2024-02-28"), ("2024-01-01", "2024-01-31"), ("2024-02-29", "2024-03-31")]
+    assert ledger.given(["p1", "p2", "p3"], "2024-01-01", "2024-03-31") == {
+        "p1": Decimal("1100.00"), "p2": Decimal("25.00"), "p3": Decimal(0)}
+
+
+def test_ledger_given_by_fund_and_date():
+    ledger = contributions.ContributionLedger()
+    ledger.ensure(RecordingApi(CONTRIBUTIONS), "2024-01-01", "2024-12-31")
+    assert ledger.given(["p1", "p2"], "2024-01-01", "2024-12-31", ["f2"]) == {"p1": Decimal("40.00"), "p2": Decimal("25.00")}
+    assert ledger.given(["p1"], "2024-02-01", "2024-12-31") == {"p1": Decimal("1000.00")}
+
+
+def test_ledger_refresh_replaces_recent_gifts():
+    today = date.today()
+    recent = [{"id": "9", "person_id": "p1", "date": (today - timedelta(days=1)).isoformat(), "amount": "10"}]
+    api = RecordingApi(recent)
+    ledger = contributions.ContributionLedger(refresh_interval=3600, refresh_days=7)
+    start = (today - timedelta(days=30)).isoformat()
+    ledger.ensure(api, start, today.isoformat())
+    # The gift was deleted in Breeze and a new one entered
+    api.contributions = [dict(recent[0], id="10", amount="15")]
+    assert ledger.ensure(api, start, today.isoformat()) == 0
+    ledger.invalidate()
+    assert ledger.ensure(api, start, today.isoformat()) == 1
+    assert api.calls[-1] == ((today - timedelta(days=7)).isoformat(), today.isoformat())
+    assert ledger.given(["p1"], start, today.isoformat()) == {"p1": Decimal("15")}
+
+
+@pytest.mark.parametrize("response, expected", [
+    ({"id": "c1", "name": "Roof", "pledges": [{"person_id": "p1"}]}, ({"id": "c1", "name": "Roof"}, [{"person_id": "p1"}])),
+    ([{"id": "c1", "pledges": [{"person_id": "p1"}]}], ({"id": "c1"}, [{"person_id": "p1"}])),
+    ([{"person_id": "p1"}], ({}, [{"person_id": "p1"}])),
+    (None, ({}, [])),
+])
+def test_pledge_list(response, expected):
+    assert contributions.pledge_list(response) == expected
+
+
+def test_pledge_progress_caps_giving_at_each_pledge():
+    pledges = [
+        {"person_id": "p1", "first_name": "Ann", "last_name": "Lee", "amount": "500"},
+        {"person_id": "p2", "first_name": "Bo", "last_name": "Day", "amount": "200"},
+        {"person_id": "p2", "amount": "100"},
+    ]
+    progress = contributions.pledge_progress(pledges, {"p1": Decimal("1100"), "p2": Decimal("75")})
+    assert (progress["total_pledged"], progress["total_given"], progress["total_remaining"]) == ("800.00", "575.00", "225.00")
+    assert progress["percent_fulfilled"] == 71.9
+    p1, p2 = progress["pledges"]
+    assert (p1["given"], p1["remaining"], p1["percent_fulfilled"]) == ("1100.00", "0.00", 220.0)
+    assert (p2["first_name"], p2["pledged"], p2["remaining"]) == ("Bo", "300.00", "225.00")
+    assert contributions.pledge_progress([], {})["percent_fulfilled"] is None
+
+
+@pytest.fixture
+def pledges(fake, monkeypatch):
+    person = fake.people[0]
+    campaign = {"id": "c1", "name": "Roof", "campaign_start_date": f"{date.today().year}-01-01",
+                "pledges": [{"person_id": person["id"], "amount": "100000"}]}
+    monkeypatch.setattr(fake, "list_pledges", lambda campaign_id: campaign, raising=False)
+    return person
+
+
+@pytest.mark.parametrize("query", ["start_date=01/01/2024", "end_date=tomorrow"])
+def test_progress_endpoint_rejects_bad_dates(client, pledges, query):
+    assert client.get(f"/campaigns/c1/progress?{query}").status_code == 422
+
+
+def test_progress_endpoint(client, fake, pledges, main):
+    main.contribution_ledgers._ledgers.clear()
+    response = client.get("/campaigns/c1/progress")
+    assert response.status_code == 200
+    body = response.json()
+    expected = sum(Decimal(c["amount"]) for c in fake.contributions
+                   if c["person_id"] == pledges["id"] and c["date"] <= date.today().isoformat())
+    assert (body["name"], body["total_pledged"], body["total_given"]) == ("Roof", "100000.00", f"{expected:.2f}")
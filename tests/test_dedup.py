@@ -0,0 +1,99 @@
+from services import dedup
+
+
+def record(person_id, first, last, email="", phone="", street="", birthdate=""):
+    contact = {"email.address": email, "phone.phone_number": phone,
+               "address.street_address": street, "details.birthdate": birthdate}
+    return dedup.person_record({"id": person_id, "first_name": first, "last_name": last}, contact)
+
+
+RECORDS = [
+    record(1, "Ann", "Lee", "ann@gmail.com", "555-123-4567", "1 Main St", "1980-01-01"),
+    # Ann again, with the same details formatted differently
+    record(2, "ANN", " lee ", "A.n.n+church@googlemail.com", "+1 (555) 123 4567", "1  Main St", "1980-01-01T00:00:00"),
+    # Her son, sharing the family email, phone and address
+    record(3, "Bob", "Lee", "ann@gmail.com", "5551234567", "1 Main St", "2010-05-05"),
+    record(4, "Rob", "Smith", phone="555 987 6543"),
+    record(5, "Robert", "Smith", phone="(555) 987-6543"),
+    record(6, "Cy", "Young"),
+]
+
+
+def test_soundex():
+    assert dedup.soundex("Robert") == dedup.soundex("Rupert") == "R163"
+    assert dedup.soundex("Ashcraft") == "A261"
+    assert dedup.soundex("Lee") == "L000"
+    assert dedup.soundex("") == ""
+
+
+def test_normalizers():
+    assert dedup.normalize_email(" J.Doe+news@GoogleMail.com") == "jdoe@gmail.com"
+    assert dedup.normalize_email("j.doe+news@example.org") == "j.doe@example.org"
+    assert dedup.normalize_email("not an address") == ""
+    assert dedup.normalize_phone("+1 (555) 123-4567") == "5551234567"
+    assert dedup.normalize_phone("123") == ""
+
+
+def test_score_same_person():
+    value, reasons = dedup.score(RECORDS[0], RECORDS[1])
+    assert value == 1.0
+    assert reasons == ["same email", "same phone", "same birthdate", "same address", "same name"]
+
+
+def test_score_family_member_is_low():
+    value, reasons = dedup.score(RECORDS[0], RECORDS[2])
+    assert value < 0.2
+    assert "same email" in reasons and "same name" not in reasons
+
+
+def test_score_nickname():
+    assert dedup.score(RECORDS[3], RECORDS[4]) == (0.6, ["same phone", "similar name"])
+
+
+def test_score_skips_names_below_min_score():
+    assert dedup.score(RECORDS[3], RECORDS[5], min_score=0.5) == (0.0, [])
+
+
+def test_candidate_pairs_share_a_block():
+    pairs = dedup.candidate_pairs(RECORDS)
+    assert {(0, 1), (0, 2), (1, 2), (3, 4)} <= pairs
+    assert not any(5 in pair for pair in pairs)
+    # Oversized name blocks are skipped, but contact blocks are not
+    assert dedup.candidate_pairs(RECORDS[3:5], max_block_size=1) == {(0, 1)}
+    same_name = [record(i, "Ann", "Lee") for i in range(3)]
+    assert dedup.candidate_pairs(same_name, max_block_size=2) == set()
+
+
+def test_find_duplicates_ranks_best_first():
+    matches = dedup.find_duplicates(RECORDS, min_score=0.5, workers=1)
+    assert [(value, a, b) for value, a, b, _ in matches] == [(1.0, "1", "2"), (0.6, "4", "5")]
+    everything = dedup.find_duplicates(RECORDS, min_score=0.0, workers=1)
+    assert [m[0] for m in everything] == sorted((m[0] for m in everything), reverse=True)
+    assert {m[1:3] for m in everything[2:]} == {("1", "3"), ("2", "3")}
+
+
+def test_find_duplicates_in_worker_processes(monkeypatch):
+    monkeypatch.setattr(dedup, "PARALLEL_MIN_PAIRS", 1)
+    records = RECORDS * 3
+    assert dedup.find_duplicates(records, min_score=0.5, workers=2) == dedup.find_duplicates(records, 0.5, workers=1)
+
+
+def test_merge_suggestions_keep_the_more_complete_record():
+    records = RECORDS + [record(7, "Cy", "Young", email="cy@example.org")]
+    matches = [(0.9, "6", "7", ["same name"]), (1.0, "2", "1", ["same name"])]
+    people = {r.id: {"first_name": r.first_name, "last_name": r.last_name} for r in records}
+    first, second = dedup.merge_suggestions(records, matches, people)
+    assert (first["keep"], first["merge"]) == ("7", "6")
+    assert first["people"][0]["email"] == "cy@example.org" and first["people"][1]["email"] is None
+    # Equally complete: the older (lower) ID is kept
+    assert second["person_ids"] == ["1", "2"]
+
+
+def test_endpoint_suggests_duplicates(client, fake):
+    twin = dict(fake.people[0], id="999999")
+    fake.people.append(twin)
+    response = client.get("/people/duplicates?min_score=0.9")
+    assert response.status_code == 200
+    suggestion = next(s for s in response.json() if "999999" in s["person_ids"])
+    assert suggestion["keep"] == fake.people[0]["id"]
+    assert suggestion["score"] == 1.0
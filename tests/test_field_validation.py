@@ -0,0 +1,140 @@
+import orjson
+import pytest
+
+from bench.fake_breeze import ADDRESS_FIELD, EMAIL_FIELD, PHONE_FIELD
+from services.field_validation import FieldsSchema, InvalidFields
+
+SECTIONS = [{"id": "1", "name": "Main", "fields": [
+    {"field_id": EMAIL_FIELD, "name": "Email", "field_type": "email"},
+    {"field_id": PHONE_FIELD, "name": "Phone", "field_type": "phone"},
+    {"field_id": ADDRESS_FIELD, "name": "Address", "field_type": "address"},
+    {"field_id": "4", "name": "Birthdate", "field_type": "birthdate"},
+    {"field_id": "5", "name": "Color", "field_type": "dropdown", "options": [{"option_id": "10", "name": "Red"}]},
+    {"field_id": "6", "name": "Gifts", "field_type": "checkbox",
+     "options": [{"option_id": "20", "name": "Music"}, {"option_id": "21", "name": "Teaching"}]},
+    {"field_id": "7", "name": "Nickname", "field_type": "single_line"},
+    {"field_id": "8", "name": "Photo", "field_type": "image"},
+]}]
+
+
+@pytest.fixture(scope="module")
+def schema():
+    return FieldsSchema(SECTIONS)
+
+
+def dumps(entries):
+    return orjson.dumps(entries).decode()
+
+
+def test_valid_fields(schema):
+    assert schema.errors(dumps([
+        {"field_id": EMAIL_FIELD, "field_type": "email", "response": "true",
+         "details": {"address": "zoe@example.org", "is_private": 1}},
+        {"field_id": PHONE_FIELD, "details": {"phone_mobile": "(555) 123-4567"}},
+        {"field_id": ADDRESS_FIELD, "details": {"street_address": "1 Oceanic Way", "zip": "62701"}},
+        {"field_id": "4", "response": "03/09/1980"},
+        {"field_id": "5", "response": "10"},
+        {"field_id": "6", "response": ["20", "21"]},
+        {"field_id": "7", "response": "Zo"},
+        {"field_id": "8", "response": {"left": "to Breeze"}},
+    ])) == []
+    assert schema.errors(None) == []
+    assert schema.errors("  ") == []
+
+
+@pytest.mark.parametrize("entry,loc,message", [
+    ({"field_id": EMAIL_FIELD, "details": {"address": "not-an-email"}}, [0, "details", "address"], "valid email"),
+    ({"field_id": EMAIL_FIELD, "details": "zoe@example.org"}, [0, "details"], "must be an object"),
+    ({"field_id": PHONE_FIELD, "details": {"phone_home": "12"}}, [0, "details", "phone_home"], "valid phone"),
+    ({"field_id": PHONE_FIELD, "details": {}}, [0, "details"], "at least one of"),
+    ({"field_id": ADDRESS_FIELD, "details": {"zip": "!!"}}, [0, "details", "zip"], "postal code"),
+    ({"field_id": "4", "response": "1980-13-40"}, [0, "response"], "valid date"),
+    ({"field_id": "5", "response": "Red"}, [0, "response"], "option id 10"),
+    ({"field_id": "5", "response": ["10", "10"]}, [0, "response"], "single option"),
+    ({"field_id": "6", "response": ["20", "99"]}, [0, "response", 1], "unknown option"),
+    ({"field_id": "7", "response": "x" * 256}, [0, "response"], "single line"),
+    ({"field_id": "404", "response": "x"}, [0, "field_id"], "unknown profile field"),
+    ({"field_id": EMAIL_FIELD, "field_type": "phone"}, [0, "field_type"], "is of type 'email'"),
+    ({"response": "x"}, [0, "field_id"], "required"),
+    ("x", [0], "must be an object"),
+])
+def test_invalid_fields(schema, entry, loc, message):
+    [error] = schema.errors(dumps([entry]))
+    assert error["loc"] == loc
+    assert message in error["msg"]
+
+
+def test_invalid_json(schema):
+    assert schema.errors("[{")[0]["msg"].startswith("not valid JSON")
+    assert schema.errors('{"field_id": "7"}') == [{"loc": [], "msg": "must be a JSON array of fields"}]
+
+
+def test_validate_raises_every_error(schema):
+    with pytest.raises(InvalidFields) as error:
+        schema.validate(dumps([{"field_id": "4", "response": "soon"}, {"field_id": "5", "response": "99"}]))
+    assert [e["loc"] for e in error.value.errors] == [[0, "response"], [1, "response"]]
+
+
+def test_empty_values_allowed_only_when_clearing(schema):
+    cleared = dumps([
+        {"field_id": EMAIL_FIELD, "field_type": "email", "response": "true", "details": {"address": "", "is_private": 1}},
+        {"field_id": PHONE_FIELD, "details": {"phone_mobile": ""}},
+        {"field_id": ADDRESS_FIELD, "details": {}},
+        {"field_id": "4", "response": ""},
+        {"field_id": "5", "response": None},
+    ])
+    assert len(schema.errors(cleared)) == 5
+    assert schema.errors(cleared, allow_empty=True) == []
+    # Non-empty values are still checked, and unknown fields still rejected
+    assert len(schema.errors(dumps([{"field_id": EMAIL_FIELD, "details": {"address": "nope"}},
+                                    {"field_id": "404", "response": ""}]), allow_empty=True)) == 2
+
+
+def test_validate_rows(schema):
+    rows = [
+        {"first_name": "Zoe", "last_name": "W", "fields_json": [{"field_id": "4", "response": "1980-03-09"}]},
+        {"first_name": "Zoe", "last_name": "W", "fields_json": dumps([{"field_id": "4", "response": "soon"}])},
+        {"first_name": "", "last_name": "W"},
+        {"first_name": "Zoe", "last_name": "W", "fields_json": {"a": 1}},
+        {"first_name": "Zoe", "last_name": "W", "fields_json": 5},
+        {"first_name": "Zoe", "last_name": "W", "fields_json": None},
+        "not a row",
+    ]
+    assert schema.validate_rows(rows) == [
+        {"row": 1, "errors": [{"loc": ["fields_json", 0, "response"],
+                               "msg": "not a valid date (YYYY-MM-DD or MM/DD/YYYY): 'soon'"}]},
+        {"row": 2, "errors": [{"loc": ["first_name"], "msg": "first_name is required"}]},
+        {"row": 3, "errors": [{"loc": ["fields_json"], "msg": "must be a JSON array of fields"}]},
+        {"row": 4, "errors": [{"loc": ["fields_json"], "msg": "must be a JSON array of fields"}]},
+        {"row": 6, "errors": [{"loc": [], "msg": "each row must be an object"}]},
+    ]
+
+
+def test_add_person_rejects_invalid_fields(client, fake):
+    response = client.post("/people", params={
+        "first_name": "Zoe", "last_name": "W",
+        "fields_json": dumps([{"field_id": EMAIL_FIELD, "details": {"address": "nope"}}]),
+    })
+    assert response.status_code == 422
+    assert response.json()["detail"][0]["loc"] == ["query", "fields_json", 0, "details", "address"]
+    assert fake.writes == []
+
+
+def test_update_person_can_clear_fields(client, fake):
+    cleared = dumps([{"field_id": EMAIL_FIELD, "field_type": "email", "response": "", "details": {"address": ""}}])
+    response = client.put("/people/157857", params={"fields_json": cleared})
+    assert response.status_code == 200
+    assert fake.writes == [("update_person", "157857", cleared)]
+    invalid = dumps([{"field_id": EMAIL_FIELD, "details": {"address": "nope"}}])
+    assert client.put("/people/157857", params={"fields_json": invalid}).status_code == 422
+
+
+def test_validate_endpoint_reports_bad_rows(client):
+    response = client.post("/people/validate", json={"rows": [
+        {"first_name": "Zoe", "last_name": "W", "fields_json": {"a": 1}},
+        {"first_name": "Zoe", "last_name": "W", "fields_json": 5},
+        {"first_name": "Zoe", "last_name": "W"},
+    ]})
+    assert response.status_code == 200
+    assert response.json()["valid"] == 1
+    assert [row["row"] for row in response.json()["errors"]] == [0, 1]
@@ -0,0 +1,108 @@
+import pytest
+from fastapi import FastAPI
+from fastapi.responses import PlainTextResponse, Response
+from fastapi.testclient import TestClient
+
+from services import compression, http_cache
+
+BODY = b'{"id": "1"}' * 200
+
+
+def test_make_etag_is_strong_and_stable():
+    etag = http_cache.make_etag(BODY)
+    assert etag.startswith('"') and etag.endswith('"')
+    assert etag == http_cache.make_etag(BODY)
+    assert etag != http_cache.make_etag(BODY + b" ")
+
+
+def test_encoded_etag_appends_encoding():
+    etag = http_cache.make_etag(BODY)
+    assert compression.encoded_etag(etag, "gzip") == etag[:-1] + '-gzip"'
+    assert compression.encoded_etag(etag, "br") == etag[:-1] + '-br"'
+
+
+@pytest.mark.parametrize("if_none_match", [
+    '"abc"', 'W/"abc"', '"abc-gzip"', '"abc-br"', 'W/"abc-gzip"', '"other", "abc-gzip"', "*",
+])
+def test_etag_matches_any_representation(if_none_match):
+    assert http_cache.etag_matches(if_none_match, '"abc"')
+    if if_none_match != "*":
+        assert http_cache.etag_matches(if_none_match, '"abc-br"')
+
+
+@pytest.mark.parametrize("if_none_match", [None, "", '"abd"', '"abc-deflate"', '"other", "xyz-gzip"'])
+def test_etag_matches_rejects_other_bodies(if_none_match):
+    assert not http_cache.etag_matches(if_none_match, '"abc"')
+
+
+def test_cache_headers():
+    headers = http_cache.cache_headers('"abc"')
+    assert headers["ETag"] == '"abc"'
+    assert headers["Vary"] == "Accept-Encoding"
+    assert "Warning" not in headers
+    stale = http_cache.cache_headers('"abc"', stale=True)
+    assert stale["Warning"] == http_cache.STALE_WARNING
+    assert "max-age=0" in stale["Cache-Control"]
+
+
+@pytest.fixture
+def compressed_app():
+    app = FastAPI()
+    app.add_middleware(compression.CompressionMiddleware, minimum_size=100)
+
+    @app.get("/large")
+    def large():
+        return Response(BODY, media_type="application/json", headers={"ETag": '"large"'})
+
+    @app.get("/small")
+    def small():
+        return PlainTextResponse("small", headers={"ETag": '"small"'})
+
+    @app.get("/binary")
+    def binary():
+        return Response(BODY, media_type="application/vnd.apache.parquet")
+
+    return TestClient(app)
+
+
+def test_middleware_compresses_and_suffixes_etag(compressed_app):
+    response = compressed_app.get("/large", headers={"Accept-Encoding": "gzip"})
+    assert response.headers["Content-Encoding"] == "gzip"
+    assert response.headers["ETag"] == '"large-gzip"'
+    assert "Accept-Encoding" in response.headers["Vary"]
+    assert response.content == BODY
+
+
+def test_middleware_leaves_small_binary_and_identity_responses_alone(compressed_app):
+    small = compressed_app.get("/small", headers={"Accept-Encoding": "gzip"})
+    assert "content-encoding" not in small.headers and small.headers["ETag"] == '"small"'
+    binary = compressed_app.get("/binary", headers={"Accept-Encoding": "gzip"})
+    assert "content-encoding" not in binary.headers
+    identity = compressed_app.get("/large", headers={"Accept-Encoding": "identity"})
+    assert "content-encoding" not in identity.headers and identity.headers["ETag"] == '"large"'
+
+
+def test_choose_encoding():
+    assert compression.choose_encoding(None) is None
+    assert compression.choose_encoding("gzip;q=0") is None
+    assert compression.choose_encoding("deflate, gzip;q=0.5") == "gzip"
+    assert compression.choose_encoding("*") == compression.available_encodings()[0]
+
+
+def test_cached_responses_get_an_etag_per_encoding(client):
+    identity = client.get("/people/", headers={"Accept-Encoding": "identity"})
+    encoded = client.get("/people/", headers={"Accept-Encoding": "gzip"})
+    assert identity.status_code == encoded.status_code == 200
+    assert encoded.headers["Content-Encoding"] == "gzip"
+    assert encoded.headers["ETag"] == compression.encoded_etag(identity.headers["ETag"], "gzip")
+    assert encoded.content == identity.content
+
+
+def test_cached_responses_revalidate_across_encodings(client):
+    encoded = client.get("/people/", headers={"Accept-Encoding": "gzip"})
+    etag = encoded.headers["ETag"]
+    for accept in ("gzip", "identity"):
+        response = client.get("/people/", headers={"Accept-Encoding": accept, "If-None-Match": etag})
+        assert response.status_code == 304
+    assert client.get("/people/", headers={"If-None-Match": '"stale"'}).status_code == 200
+
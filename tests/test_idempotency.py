@@ -0,0 +1,93 @@
+import threading
+
+import pytest
+
+from services.idempotency import MAX_KEY_LENGTH, IdempotencyError, IdempotencyStore
+
+SCOPE = ("north", "add_person")
+
+
+@pytest.fixture
+def store(tmp_path):
+    return IdempotencyStore(str(tmp_path / "idempotency.sqlite3"))
+
+
+def counting(result):
+    calls = []
+
+    def write():
+        calls.append(1)
+        return result
+    return write, calls
+
+
+def test_repeat_replays_stored_response(store):
+    write, calls = counting({"id": "99", "first_name": "Zoë"})
+    params = {"first_name": "Zoë", "last_name": "W"}
+    assert store.run(SCOPE, "key-1", params, write) == ({"id": "99", "first_name": "Zoë"}, False)
+    # Same parameters in another order: the stored response comes back without writing again
+    assert store.run(SCOPE, "key-1", dict(reversed(params.items())), write) == ({"id": "99", "first_name": "Zoë"}, True)
+    assert len(calls) == 1
+
+
+def test_stored_response_survives_restart(store, tmp_path):
+    store.run(SCOPE, "key-1", {"a": 1}, lambda: "pay1")
+    reopened = IdempotencyStore(store.path)
+    assert reopened.run(SCOPE, "key-1", {"a": 1}, lambda: pytest.fail("replay expected")) == ("pay1", True)
+
+
+def test_key_reused_with_different_body(store):
+    store.run(SCOPE, "key-1", {"amount": 10}, lambda: "pay1")
+    with pytest.raises(IdempotencyError) as error:
+        store.run(SCOPE, "key-1", {"amount": 20}, lambda: pytest.fail("must not write"))
+    assert error.value.status_code == 422
+
+
+def test_keys_are_scoped(store):
+    store.run(SCOPE, "key-1", {"amount": 10}, lambda: "pay1")
+    assert store.run(("south", "add_person"), "key-1", {"amount": 20}, lambda: "pay2") == ("pay2", False)
+    assert store.run(("north", "add_contribution"), "key-1", {"amount": 20}, lambda: "pay3") == ("pay3", False)
+
+
+def test_collision_while_in_progress(store):
+    started, release = threading.Event(), threading.Event()
+    results = []
+
+    def slow_write():
+        started.set()
+        release.wait(5)
+        return "pay1"
+
+    first = threading.Thread(target=lambda: results.append(store.run(SCOPE, "key-1", {"a": 1}, slow_write)))
+    first.start()
+    try:
+        assert started.wait(5)
+        with pytest.raises(IdempotencyError) as error:
+            store.run(SCOPE, "key-1", {"a": 1}, lambda: pytest.fail("must not write"))
+        assert error.value.status_code == 409
+    finally:
+        release.set()
+        first.join(5)
+    assert results == [("pay1", False)]
+    assert store.run(SCOPE, "key-1", {"a": 1}, lambda: pytest.fail("replay expected")) == ("pay1", True)
+
+
+def test_failed_write_frees_the_key(store):
+    def failing():
+        raise ConnectionError("refused")
+
+    with pytest.raises(ConnectionError):
+        store.run(SCOPE, "key-1", {"a": 1}, failing)
+    assert store.run(SCOPE, "key-1", {"a": 1}, lambda: "pay1") == ("pay1", False)
+
+
+def test_expired_results_are_forgotten(tmp_path):
+    store = IdempotencyStore(str(tmp_path / "idempotency.sqlite3"), ttl=-1)
+    store.run(SCOPE, "key-1", {"a": 1}, lambda: "pay1")
+    assert store.run(SCOPE, "key-1", {"a": 2}, lambda: "pay2") == ("pay2", False)
+
+
+def test_key_length_is_limited(store):
+    with pytest.raises(IdempotencyError) as error:
+        store.run(SCOPE, "k" * (MAX_KEY_LENGTH + 1), {}, lambda: None)
+    assert error.value.status_code == 400
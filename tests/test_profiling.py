@@ -0,0 +1,63 @@
+import pstats
+import threading
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from services import profiling
+
+TOKEN = "secret"
+
+
+def test_store_keeps_newest_profiles(tmp_path):
+    store = profiling.ProfileStore(str(tmp_path), keep=2)
+    for i in range(3):
+        store.save(f"p{i}", "sample", b"a;b 1\n", {"started_at": float(i)})
+    assert [p["id"] for p in store.list()] == ["p2", "p1"]
+    assert store.get("p0") is None
+    assert store.get("p2")["mode"] == "sample"
+    assert store.get("../p2") is None
+    assert sorted(path.name for path in tmp_path.iterdir()) == ["p1.collapsed", "p1.json", "p2.collapsed", "p2.json"]
+
+
+@pytest.fixture
+def profiled(tmp_path):
+    store = profiling.ProfileStore(str(tmp_path))
+    app = FastAPI()
+    app.add_middleware(profiling.ProfilingMiddleware, store=store, admin_token=TOKEN)
+    loop_threads, saved_on = [], []
+    save = store.save
+
+    def save_and_record(*args):
+        saved_on.append(threading.current_thread())
+        save(*args)
+
+    store.save = save_and_record
+
+    @app.get("/work")
+    async def work():
+        loop_threads.append(threading.current_thread())
+        return sum(range(1000))
+
+    with TestClient(app) as client:
+        yield client, store, loop_threads, saved_on
+
+
+@pytest.mark.parametrize("mode", profiling.PROFILE_MODES)
+def test_middleware_saves_requested_profiles_off_the_loop(profiled, mode):
+    client, store, loop_threads, saved_on = profiled
+    response = client.get("/work", headers={"X-Profile": mode, "X-Admin-Token": TOKEN})
+    assert response.status_code == 200
+    meta = store.get(response.headers["X-Profile-Id"])
+    assert meta["mode"] == mode and meta["path"] == "/work" and meta["status"] == 200
+    assert saved_on and saved_on[0] is not loop_threads[0]
+    if mode == "cprofile":
+        pstats.Stats(store.path(meta["id"], "pstats"))
+
+
+def test_middleware_requires_admin_token(profiled):
+    client, store, _, _ = profiled
+    assert "X-Profile-Id" not in client.get("/work", headers={"X-Profile": "cprofile"}).headers
+    assert "X-Profile-Id" not in client.get("/work", headers={"X-Profile": "cprofile", "X-Admin-Token": "x"}).headers
+    assert store.list() == []
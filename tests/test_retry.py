@@ -0,0 +1,66 @@
+import pytest
+
+from services.retry import RetryPolicy
+from services.upstream import is_transient
+
+
+class BreezeError(Exception):
+    pass
+
+
+class Response:
+    def __init__(self, status_code):
+        self.status_code = status_code
+
+
+def failing(*errors):
+    calls = []
+
+    def call():
+        calls.append(1)
+        if len(calls) <= len(errors):
+            raise errors[len(calls) - 1]
+        return "ok"
+    return call, calls
+
+
+@pytest.mark.parametrize("error", [
+    ConnectionError("connection refused"),
+    TimeoutError(),
+    BreezeError(ConnectionError("Unable to connect")),
+    BreezeError(Response(502)),
+    BreezeError(Response(429)),
+    BreezeError("Rate limit exceeded, try again later"),
+])
+def test_transient_errors(error):
+    assert is_transient(error)
+
+
+@pytest.mark.parametrize("error", [
+    BreezeError("Person not found"),
+    BreezeError({"errors": "Invalid parameters"}),
+    BreezeError(Response(404)),
+    ValueError("bad id"),
+])
+def test_request_errors_are_not_transient(error):
+    assert not is_transient(error)
+
+
+def test_retries_transient_failures():
+    call, calls = failing(ConnectionError(), BreezeError(Response(503)))
+    assert RetryPolicy(attempts=3, base_delay=0).hook("get_people", {}, call) == "ok"
+    assert len(calls) == 3
+
+
+def test_request_errors_are_raised_at_once():
+    call, calls = failing(BreezeError("Person not found"))
+    with pytest.raises(BreezeError):
+        RetryPolicy(attempts=3, base_delay=0).hook("get_person_details", {}, call)
+    assert len(calls) == 1
+
+
+def test_writes_are_not_retried():
+    call, calls = failing(ConnectionError())
+    with pytest.raises(ConnectionError):
+        RetryPolicy(attempts=3, base_delay=0).hook("add_person", {}, call)
+    assert len(calls) == 1
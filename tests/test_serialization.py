@@ -0,0 +1,107 @@
+import asyncio
+from typing import Any, Dict, List, Optional
+
+import pytest
+from fastapi.responses import JSONResponse
+from fastapi.routing import serialize_response
+from fastapi.utils import create_response_field
+from pydantic import BaseModel, Field
+
+from services import serialization
+
+
+class Person(BaseModel):
+    id: str
+    first_name: Optional[str] = None
+    last_name: Optional[str] = None
+    email_address: Optional[str] = None
+
+
+class VolunteerRole(BaseModel):
+    id: Optional[str] = None
+    name: str
+    quantity: Optional[int] = None
+
+
+class FormEntry(BaseModel):
+    id: str
+    form_id: str
+    created_on: Optional[str] = None
+    person_id: Optional[str] = None
+    response: Optional[Dict[str, Any]] = None
+
+
+class Fund(BaseModel):
+    id: str
+    name: Optional[str] = None
+    amount: Optional[float] = None
+
+
+class Gift(BaseModel):
+    id: str
+    amount: float = 0.0
+    method: Optional[str] = Field(None, alias="method_name")
+    batch: Optional[str] = Field(None, serialization_alias="batch_number")
+    secret: Optional[str] = Field(None, exclude=True)
+    tags: List[str] = Field(default_factory=list)
+    fund: Optional[Fund] = None
+    funds: List[Fund] = []
+
+
+CASES = [
+    (Person, [
+        {"id": "1", "first_name": "Zoë", "last_name": "Washburne", "email_address": "zoe@example.org", "path": "x"},
+        {"id": "2", "first_name": None},
+        {"id": "3", "details": {"929778337": [{"address": "a@b.c"}]}},
+    ]),
+    (VolunteerRole, [
+        {"id": "1", "name": "Greeter", "quantity": "2"},
+        {"name": "Usher", "quantity": 3},
+        {"id": None, "name": "Nursery", "quantity": None},
+    ]),
+    (FormEntry, [
+        {"id": "1", "form_id": "15326", "created_on": "2021-03-09 13:04:02", "person_id": None,
+         "response": {"45": {"first_name": "Zoe", "last_name": "Washburne"}, "46": "zoe@example.org", "47": ["Red", 1]}},
+        {"id": "2", "form_id": "15326"},
+    ]),
+    (Gift, [
+        {"id": "1", "amount": "12.5", "method_name": "Check", "batch": "7", "secret": "hidden", "tags": ["a"],
+         "fund": {"id": "f1", "name": "General", "amount": "12.5", "extra": True},
+         "funds": [{"id": "f1", "amount": 10}, {"id": "f2", "name": None, "amount": "2.5", "note": "x"}]},
+        {"id": "2", "amount": 3, "fund": None},
+        {"id": "3"},
+    ]),
+]
+
+
+def response_model_body(model, items) -> bytes:
+    """What FastAPI returns for `items` from an endpoint declared with response_model=List[model]."""
+    field = create_response_field(name="Response", type_=List[model])
+    content = asyncio.run(serialize_response(field=field, response_content=items))
+    return JSONResponse(content).body
+
+
+@pytest.fixture(params=[False, True], ids=["validated", "trusted"])
+def trusted(request, monkeypatch):
+    monkeypatch.setattr(serialization, "TRUSTED_UPSTREAM_JSON", request.param)
+    return request.param
+
+
+@pytest.mark.parametrize("model,items", CASES, ids=[model.__name__ for model, _ in CASES])
+def test_render_list_matches_response_model(trusted, model, items):
+    assert serialization.render_list(items, model) == response_model_body(model, items)
+
+
+@pytest.mark.parametrize("model,items", CASES, ids=[model.__name__ for model, _ in CASES])
+def test_list_response_matches_response_model(trusted, model, items):
+    response = serialization.list_response(items, model)
+    body = response.body if trusted else response_model_body(model, response)
+    assert body == response_model_body(model, items)
+
+
+@pytest.mark.parametrize("model,items", CASES, ids=[model.__name__ for model, _ in CASES])
+def test_projection_matches_model_dump(model, items):
+    project = serialization.compile_projection(model)
+    assert [project(item) for item in items] == [
+        model.model_validate(item).model_dump(mode="json", by_alias=True) for item in items
+    ]
@@ -0,0 +1,104 @@
+import os
+
+import pytest
+
+from services import snapshot
+from services.tenants import current_tenant
+
+PEOPLE = [
+    {"id": "1", "first_name": "Ann", "last_name": "Lee", "path": "img/1.jpg",
+     "details": {"929778337": [{"address": "ann@example.org"}], "age": 41, "score": 2.5, "member": True,
+                 "notes": None, "nested": {"tags": ["a", "b"], "empty": {}}},
+     "family": [{"family_id": "f1", "person_id": "2", "role_name": "Spouse"}]},
+    {"id": "2", "first_name": "Bo", "last_name": None, "path": "",
+     "details": {"929778337": [], "member": False, "big": -2 ** 40, "unicode": "Zoë 日本"},
+     "family": [{"family_id": "f1", "person_id": "1", "role_name": "Head"}]},
+    {"id": "3", "first_name": "Cy", "last_name": "Lee", "path": "x"},
+]
+TAGS = [{"id": "t1", "name": "Choir", "folder_id": "1"}]
+TAG_FOLDERS = [{"id": "1", "name": "Groups", "parent_id": "0"}]
+
+
+def write(tmp_path, **extras):
+    path = str(tmp_path / "default.snapshot")
+    snapshot.write_snapshot(path, "default", PEOPLE, tags=TAGS, tag_folders=TAG_FOLDERS,
+                            households=snapshot.build_households(PEOPLE), **extras)
+    return path
+
+
+def test_round_trip(tmp_path):
+    snap = snapshot.Snapshot(write(tmp_path))
+    assert snap.tenant == "default"
+    people = snap.people(details=True)
+    assert len(people) == 3
+    assert list(people) == PEOPLE
+    assert people[-1] == PEOPLE[-1]
+    assert people[1:] == PEOPLE[1:]
+    assert list(snap.people(details=False)) == [
+        {"id": p["id"], "first_name": p["first_name"], "last_name": p["last_name"], "path": p["path"]}
+        for p in PEOPLE
+    ]
+    assert snap.tags == TAGS
+    assert snap.tag_folders == TAG_FOLDERS
+    assert snap.households == [{"id": "f1", "members": [{"person_id": "1", "role": "Head"},
+                                                        {"person_id": "2", "role": "Spouse"}]}]
+    assert snap.profile_fields is None
+    assert snap.extra("missing", []) == []
+    with pytest.raises(IndexError):
+        people[3]
+
+
+def test_none_and_empty_columns_round_trip(tmp_path):
+    path = str(tmp_path / "none.snapshot")
+    people = [{"id": "1", "first_name": None, "last_name": "", "path": None},
+              {"id": "2", "first_name": "", "last_name": None, "path": ""}]
+    snapshot.write_snapshot(path, "default", people)
+    snap = snapshot.Snapshot(path)
+    # None and "" are different values, as they are in Breeze's own responses
+    assert list(snap.people(details=False)) == people
+    assert snap.people()[0]["first_name"] is None and snap.people()[1]["first_name"] == ""
+
+
+def test_extras_and_empty_directory(tmp_path):
+    path = str(tmp_path / "empty.snapshot")
+    events = [{"id": "e1", "start_datetime": "2026-10-18 09:00:00"}]
+    snapshot.write_snapshot(path, "other", [], events=events, events_window=["2026-10-01", "2026-10-31"])
+    snap = snapshot.Snapshot(path)
+    assert len(snap.people()) == 0
+    assert snap.extra("events") == events
+    assert snap.extra("events_window") == ["2026-10-01", "2026-10-31"]
+
+
+def test_rejects_other_files(tmp_path):
+    path = tmp_path / "bad.snapshot"
+    path.write_bytes(b"NOTASNAP" + bytes(16))
+    with pytest.raises(snapshot.SnapshotError):
+        snapshot.Snapshot(str(path))
+
+
+def test_rewrite_is_atomic(tmp_path):
+    path = write(tmp_path)
+    old = snapshot.Snapshot(path)
+    snapshot.write_snapshot(path, "default", PEOPLE[:1])
+    # The old mapping keeps reading the replaced file; a new one sees the rewrite
+    assert len(old.people()) == 3
+    assert len(snapshot.Snapshot(path).people()) == 1
+    assert os.listdir(tmp_path) == ["default.snapshot"]
+
+
+def test_sync_serves_current_snapshot(tmp_path):
+    seeded = []
+    sync = snapshot.SnapshotSync(str(tmp_path), 900, seeded.append)
+    write(tmp_path)
+    assert sync.load(["default"]) == 1
+    assert sync.load(["default"]) == 0
+    token = current_tenant.set("default")
+    try:
+        assert sync.current() is seeded[0]
+        sync.invalidate()
+        assert sync.current() is None
+        snapshot.write_snapshot(sync.path("default"), "default", PEOPLE[:1])
+        assert sync.load(["default"]) == 1
+        assert len(sync.current().people()) == 1
+    finally:
+        current_tenant.reset(token)
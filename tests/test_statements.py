@@ -0,0 +1,159 @@
+import io
+import os
+import threading
+import time
+import zipfile
+from decimal import Decimal
+
+import pytest
+
+from services import statements
+from services.tenants import current_tenant
+
+CONTRIBUTIONS = [
+    {"person_id": "2", "first_name": "Bo", "last_name": "Day", "date": "2024-03-01", "amount": "30.00",
+     "method": "Cash", "funds": [{"name": "General", "amount": "20.00"}, {"name": "Missions", "amount": "10.00"}]},
+    {"person_id": "1", "first_name": "Ann", "last_name": "Lee", "date": "2024-02-01", "amount": "15.50",
+     "method": "Check", "funds": [{"name": "General", "amount": "15.50"}]},
+    {"person_id": "2", "first_name": "Bo", "last_name": "Day", "date": "2024-01-15", "amount": "5.00",
+     "method": "Cash", "funds": []},
+    {"person_id": "", "first_name": "Anonymous", "date": "2024-01-01", "amount": "100.00"},
+]
+PEOPLE = {"1": {"name": "Ann Lee", "address": ["1 Main St", "Springfield, IL 62701", ""]}}
+
+
+def donors():
+    return statements.group_by_donor(CONTRIBUTIONS, PEOPLE)
+
+
+def test_group_by_donor_sorts_donors_and_gifts():
+    ann, bo = donors()
+    assert (ann.person_id, ann.name, ann.address) == ("1", "Ann Lee", ("1 Main St", "Springfield, IL 62701"))
+    # Without a directory entry the name on the contribution is used
+    assert (bo.person_id, bo.name, bo.address) == ("2", "Bo Day", ())
+    assert [gift.day for gift in bo.gifts] == ["2024-01-15", "2024-03-01"]
+    assert bo.gifts[1].funds == (("General", Decimal("20.00")), ("Missions", Decimal("10.00")))
+    assert statements.fund_totals(bo) == {"": Decimal("5.00"), "General": Decimal("20.00"), "Missions": Decimal("10.00")}
+
+
+def test_render_csv_has_a_row_per_gift_and_fund():
+    rows = statements.render_csv(donors()[1], 2024).decode().splitlines()
+    assert rows == [
+        "person_id,name,date,method,fund,amount",
+        "2,Bo Day,2024-01-15,Cash,,5.00",
+        "2,Bo Day,2024-03-01,Cash,General,20.00",
+        "2,Bo Day,2024-03-01,Cash,Missions,10.00",
+    ]
+
+
+def test_render_html_escapes_and_totals():
+    donor, = [d for d in statements.group_by_donor(CONTRIBUTIONS, {"2": {"name": "<Bo> & Co"}}) if d.person_id == "2"]
+    page = statements.render_html(donor, 2024, organization="First Church").decode()
+    assert "&lt;Bo&gt; &amp; Co" in page and "<Bo>" not in page
+    assert "First Church" in page and "2024 Giving Statement" in page
+    assert '<th class="amount">35.00</th>' in page
+    assert "Unassigned" in page
+
+
+def test_render_all_in_worker_processes(monkeypatch):
+    many = [donor._replace(person_id=str(i)) for i in range(30) for donor in donors()]
+    serial = list(statements.render_all(many, 2024, statements.FORMATS, workers=1))
+    monkeypatch.setattr(statements, "CHUNK_SIZE", 7)
+    monkeypatch.setattr(statements, "PARALLEL_MIN_DONORS", 1)
+    parallel = list(statements.render_all(many, 2024, statements.FORMATS, workers=2))
+    assert sum(count for count, _ in parallel) == len(many)
+    assert [f for _, files in parallel for f in files] == [f for _, files in serial for f in files]
+
+
+@pytest.fixture
+def jobs(tmp_path):
+    token = current_tenant.set("default")
+    yield statements.StatementJobs(str(tmp_path / "statements"), workers=1, organization="First Church")
+    current_tenant.reset(token)
+
+
+def wait(jobs, job_id, timeout=10.0):
+    deadline = time.monotonic() + timeout
+    while jobs.status(job_id)["state"] not in (statements.DONE, statements.FAILED):
+        assert time.monotonic() < deadline, "statement job did not finish"
+        time.sleep(0.01)
+    return jobs.status(job_id)
+
+
+def test_job_renders_an_archive(jobs):
+    fetched = []
+
+    def fetch(start, end):
+        fetched.append((start, end))
+        return CONTRIBUTIONS
+
+    job = jobs.start(2024, statements.FORMATS, fetch, lambda: PEOPLE)
+    status = wait(jobs, job["id"])
+    assert fetched == [("2024-01-01", "2024-12-31")]
+    assert (status["state"], status["donors"], status["rendered"], status["contributions"]) == (statements.DONE, 2, 2, 4)
+    with zipfile.ZipFile(jobs.archive(job["id"])) as archive:
+        assert sorted(archive.namelist()) == ["csv/Ann-Lee-1.csv", "csv/Bo-Day-2.csv", "html/Ann-Lee-1.html",
+                                              "html/Bo-Day-2.html", "summary.csv"]
+        summary = archive.read("summary.csv").decode()
+    assert "1,Ann Lee,1,General,15.50" in summary
+
+
+def test_job_is_private_to_its_tenant(jobs):
+    job = jobs.start(2024, ("csv",), lambda start, end: CONTRIBUTIONS, lambda: {})
+    wait(jobs, job["id"])
+    token = current_tenant.set("other")
+    try:
+        with pytest.raises(statements.StatementError) as error:
+            jobs.status(job["id"])
+        assert error.value.status_code == 404
+    finally:
+        current_tenant.reset(token)
+
+
+def test_unfinished_and_failed_jobs(jobs):
+    release = threading.Event()
+
+    def slow_fetch(start, end):
+        release.wait(10)
+        return CONTRIBUTIONS
+
+    job = jobs.start(2024, ("csv",), slow_fetch, lambda: {})
+    with pytest.raises(statements.StatementError) as error:
+        jobs.archive(job["id"])
+    assert error.value.status_code == 409
+    release.set()
+    assert wait(jobs, job["id"])["state"] == statements.DONE
+
+    def broken_fetch(start, end):
+        raise RuntimeError("Breeze is down")
+
+    failed = wait(jobs, jobs.start(2024, ("csv",), broken_fetch, lambda: {})["id"])
+    assert (failed["state"], failed["error"]) == (statements.FAILED, "Breeze is down")
+    for job_id in ("missing", "../etc"):
+        with pytest.raises(statements.StatementError):
+            jobs.status(job_id)
+
+
+def test_expire_deletes_old_jobs(jobs):
+    job = jobs.start(2024, ("csv",), lambda start, end: [], lambda: {})
+    wait(jobs, job["id"])
+    stray = os.path.join(jobs.directory, "stray")
+    os.makedirs(stray)
+    assert jobs.expire() == 0
+    jobs.ttl = -1
+    assert jobs.expire() == 2
+    assert os.listdir(jobs.directory) == []
+
+
+def test_statement_endpoints(client):
+    assert client.post("/contributions/statements").status_code == 422
+    assert client.post("/contributions/statements?year=2024&format=pdf").status_code == 422
+    assert client.get("/contributions/statements/0123abcd").status_code == 404
+    job = client.post("/contributions/statements?year=2024&format=csv").json()
+    deadline = time.monotonic() + 10
+    while client.get(f"/contributions/statements/{job['id']}").json()["state"] not in (statements.DONE, statements.FAILED):
+        assert time.monotonic() < deadline
+        time.sleep(0.01)
+    response = client.get(f"/contributions/statements/{job['id']}/download")
+    assert response.status_code == 200
+    assert "summary.csv" in zipfile.ZipFile(io.BytesIO(response.content)).namelist()
@@ -0,0 +1,72 @@
+import asyncio
+import threading
+import time
+
+from services import warmup
+from services.tenants import current_tenant
+
+
+def run(warm_up, tenants=("default",)):
+    asyncio.run(warm_up.run(list(tenants)))
+    return warm_up
+
+
+def test_runs_jobs_and_follow_ups_per_tenant():
+    loaded = []
+    lock = threading.Lock()
+
+    def job(name):
+        def load():
+            with lock:
+                loaded.append((current_tenant.get(), name))
+        return load
+
+    def events():
+        job("events")()
+        return [("roles:1", job("roles:1")), ("roles:2", job("roles:2"))]
+
+    warm_up = run(warmup.WarmUp(lambda: [("fields", job("fields")), ("events", events)]), ["a", "b"])
+    assert warm_up.ready and warm_up.status()["status"] == "ready"
+    assert warm_up.completed == 8 and warm_up.failed == []
+    assert sorted(loaded) == sorted((tenant, name) for tenant in "ab" for name in ("fields", "events", "roles:1", "roles:2"))
+
+
+def test_failed_jobs_are_skipped():
+    def broken():
+        raise RuntimeError("Breeze is down")
+
+    warm_up = run(warmup.WarmUp(lambda: [("tags", broken), ("fields", lambda: None)]))
+    assert warm_up.ready
+    assert warm_up.completed == 1 and warm_up.failed == ["default:tags"]
+
+
+def test_concurrency_is_bounded():
+    active, peak = 0, 0
+    lock = threading.Lock()
+
+    def job():
+        nonlocal active, peak
+        with lock:
+            active += 1
+            peak = max(peak, active)
+        time.sleep(0.02)
+        with lock:
+            active -= 1
+
+    run(warmup.WarmUp(lambda: [(str(i), job) for i in range(8)], concurrency=2))
+    assert peak == 2
+
+
+def test_times_out_but_reports_ready():
+    warm_up = warmup.WarmUp(lambda: [("slow", lambda: time.sleep(0.5))], timeout=0.05)
+    assert warm_up.status()["status"] == "warming"
+    run(warm_up)
+    status = warm_up.status()
+    assert status["status"] == "ready" and status["timed_out"] and status["duration"] < 0.5
+
+
+def test_followers_do_not_warm_from_breeze(main, monkeypatch):
+    monkeypatch.setattr(main.sync_leader, "is_leader", False)
+    assert main.warm_up_jobs() == []
+    monkeypatch.setattr(main.sync_leader, "is_leader", True)
+    assert [name for name, _ in main.warm_up_jobs()] == ["profile_fields", "tag_folders", "events"]
@@ -0,0 +1,62 @@
+import threading
+
+from services import workers
+
+
+def test_single_worker_is_always_leader():
+    leader = workers.SyncLeader()
+    elected = []
+    leader.start(lambda: elected.append(True))
+    assert leader.is_leader and elected == [True]
+    leader.stop()
+    assert not leader.is_leader
+
+
+def test_one_leader_per_lock_file(tmp_path):
+    path = str(tmp_path / "sync.lock")
+    first, second = workers.SyncLeader(path), workers.SyncLeader(path)
+    try:
+        assert first.try_acquire()
+        assert not second.try_acquire()
+        assert first.try_acquire()
+        assert (tmp_path / "sync.lock").read_text().strip().isdigit()
+    finally:
+        first.stop()
+        second.stop()
+
+
+def test_follower_takes_over_when_leader_stops(tmp_path):
+    path = str(tmp_path / "sync.lock")
+    first, second = workers.SyncLeader(path, poll=0.01), workers.SyncLeader(path, poll=0.01)
+    elected = threading.Event()
+    try:
+        first.start(lambda: None)
+        second.start(elected.set)
+        assert first.is_leader and not second.is_leader
+        assert not elected.wait(0.1)
+        first.stop()
+        assert elected.wait(5)
+        assert second.is_leader
+    finally:
+        first.stop()
+        second.stop()
+
+
+def test_failing_callback_does_not_stop_election(tmp_path):
+    leader = workers.SyncLeader(str(tmp_path / "sync.lock"))
+    calls = []
+
+    def broken():
+        raise RuntimeError("boom")
+
+    leader._on_elected.append(broken)
+    leader.start(lambda: calls.append(True))
+    assert leader.is_leader and calls == [True]
+    leader.stop()
+
+
+def test_open_leader(tmp_path, monkeypatch):
+    assert workers.open_leader(str(tmp_path)).path is None
+    monkeypatch.setattr(workers, "WORKERS", 4)
+    assert workers.open_leader(str(tmp_path / "snapshots")).path == str(tmp_path / "snapshots" / "sync.lock")
+    assert workers.open_leader(None).path is None